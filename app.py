@@ -1,8 +1,11 @@
 import streamlit as st
 import os
-import time
-from transcription import Transcriber
-import audio_downloader
+from daemon import connect_transcriber
+from cache import TranscriptionCache, DecodedAudioStore
+from jobs import JobExecutor
+import profiling
+from progress import RealtimeFactorStore
+from search_index import SearchIndex
 import tempfile
 from datetime import datetime
 from pathlib import Path
@@ -16,6 +19,32 @@ st.set_page_config(
     layout="wide"
 )
 
+# Output format dropdown labels mapped to the formats they produce
+FORMAT_OPTIONS = {
+    "All Formats": ['txt', 'srt', 'json'],
+    "Text Only": ['txt'],
+    "SRT Only": ['srt'],
+    "JSON Only": ['json'],
+    "Text + JSON": ['txt', 'json'],
+    "SRT + JSON": ['srt', 'json'],
+    "NDJSON Only": ['ndjson'],
+    "WebVTT Only": ['vtt'],
+}
+
+# How batch downloads are stored before transcription
+AUDIO_DOWNLOAD_OPTIONS = {
+    "MP3 (keep audio)": 'mp3',
+    "16 kHz PCM (faster, no MP3)": 'pcm',
+}
+
+DOWNLOAD_LABELS = {
+    'txt': "📄 Download Transcript (TXT)",
+    'srt': "🎬 Download Subtitles (SRT)",
+    'json': "📊 Download Transcript (JSON)",
+    'ndjson': "🧾 Download Segments (NDJSON)",
+    'vtt': "🎬 Download Subtitles (WebVTT)",
+}
+
 def save_uploaded_file(uploaded_file, output_dir=None):
     """Save uploaded file to a temporary location or specified directory and return the path"""
     try:
@@ -151,6 +180,73 @@ def select_csv_native():
         st.error(f"Error opening file picker: {str(e)}")
         return None
 
+@st.cache_resource
+def get_transcriber():
+    """One transcriber per server process, shared by every session and rerun"""
+    return connect_transcriber(cache=TranscriptionCache(), audio_store=DecodedAudioStore(),
+                               realtime_factors=RealtimeFactorStore(), search_index=SearchIndex())
+
+@st.cache_resource
+def get_executor():
+    """Background job executor shared by every session, so work survives reruns"""
+    profiling.enable_from_env()
+    return JobExecutor(get_transcriber())
+
+def submit_job(executor, kind, params):
+    job_id = executor.submit(kind, params)
+    st.session_state.job_ids.insert(0, job_id)
+    st.toast(f"🚀 Queued: {params['title']}")
+
+def render_job(job):
+    """Status, progress and results of one background job"""
+    title = job.params.get('title', job.id)
+    if job.active:
+        st.info(f"⏳ {title}: {job.message}")
+        st.progress(job.progress)
+    elif job.status == 'failed':
+        st.error(f"❌ {title}: {job.error}")
+    elif job.kind == 'batch':
+        result = job.result
+        st.success(f"📁 {title}: processed {result['successful']} files successfully, {result['failed']} failed, "
+                   f"{result['skipped']} already done. Files saved to: {result['output_path']}")
+    else:
+        st.success(f"✨ {title}: transcription completed! Files saved to: {job.result['output_path']}")
+        st.text_area("Full Transcript", job.result['text'], height=300, key=f"transcript_{job.id}")
+        # Offered from what the job wrote, so refreshes never reopen the files
+        contents = job.contents
+        for fmt, path in job.result['outputs'].items():
+            if contents and fmt in contents:
+                st.download_button(DOWNLOAD_LABELS[fmt], contents[fmt], file_name=os.path.basename(path),
+                                   key=f"download_{job.id}_{fmt}")
+            else:
+                st.caption(f"Saved to {path}")
+    if getattr(job, 'profile', None):
+        with st.expander("Profile"):
+            st.code(job.profile, language=None)
+    if job.started_at:
+        caption = f"⏱️ {'Elapsed' if job.active else 'Total'} time: {format_time(job.elapsed)}"
+        if job.active and getattr(job, 'eta', None) is not None:
+            caption += f" · Remaining: ~{format_time(job.eta)}"
+        st.caption(caption)
+
+@st.fragment(run_every=2)
+def render_jobs(executor):
+    """Jobs of this session first, then recent jobs from other sessions; refreshes itself"""
+    st.subheader("Jobs")
+    jobs = [executor.get(job_id) for job_id in st.session_state.job_ids]
+    jobs = [job for job in jobs if job]
+    if not jobs:
+        st.write("No jobs submitted in this session yet.")
+    for job in jobs:
+        with st.container(border=True):
+            render_job(job)
+    
+    others = [job for job in executor.list_jobs(limit=20) if job.id not in st.session_state.job_ids]
+    if others:
+        with st.expander(f"Recent jobs from other sessions ({len(others)})"):
+            for job in others:
+                render_job(job)
+
 def main():
     st.title("MeseleEkonomi Transcribe 🎙️")
     st.write("Transcribe audio from local files or YouTube videos")
@@ -165,10 +261,8 @@ def main():
     if 'selected_csv' not in st.session_state:
         st.session_state.selected_csv = None
 
-    # Status containers
-    status_container = st.empty()
-    progress_container = st.empty()
-    time_container = st.empty()
+    if 'job_ids' not in st.session_state:
+        st.session_state.job_ids = []
 
     st.subheader("Settings")
     
@@ -209,8 +303,22 @@ def main():
     
     with col3:
         output_format = st.selectbox("Output Format", 
-                                    ["All Formats", "Text Only", "SRT Only", "JSON Only", "Text + JSON", "SRT + JSON"],
+                                    list(FORMAT_OPTIONS),
                                     key="output_format")
+        formats = FORMAT_OPTIONS[output_format]
+    
+    skip_non_speech = st.checkbox("Skip music and silence before transcribing",
+                                  value=False, key="skip_non_speech",
+                                  help="Detects speech regions and only sends those to the model")
+    transcribe_options = {'vad': skip_non_speech}
+    profile_stages = st.checkbox("Profile pipeline stages", value=profiling.active() is not None,
+                                 key="profile_stages",
+                                 help=f"Writes sampled pstats profiles and flamegraph stacks per stage and file "
+                                      f"to {profiling.DEFAULT_PROFILE_DIR}; applies to every job in this app")
+    if profile_stages and not profiling.active():
+        profiling.enable()
+    elif not profile_stages and profiling.active():
+        profiling.disable()
     
     # Verify output directory
     if st.session_state.output_dir:
@@ -221,8 +329,14 @@ def main():
             st.error(f"❌ Error creating output directory: {str(e)}")
             st.session_state.output_dir = None
 
-    # Initialize transcriber
-    transcriber = Transcriber()
+    executor = get_executor()
+    job_params = {
+        'output_path': st.session_state.output_dir or './video/',
+        'language': language,
+        'language_name': language_choice,
+        'formats': formats,
+        'transcribe_options': transcribe_options,
+    }
 
     st.divider()
 
@@ -249,87 +363,8 @@ def main():
         
         if st.session_state.selected_file and os.path.exists(st.session_state.selected_file):
             if st.button("🎯 Transcribe", type="primary", key="transcribe_local"):
-                start_time = time.time()
-                status_container.info("📝 Starting transcription process...")
-                progress_bar = progress_container.progress(0)
-                
-                file_path = st.session_state.selected_file
-                
-                # Transcribe
-                progress_bar.progress(30)
-                status_container.info(f"🎯 Transcribing audio (Language: {language_choice})...")
-                transcription_result = transcriber.transcribe_audio(file_path, language=language)
-                
-                if transcription_result:
-                    progress_bar.progress(70)
-                    status_container.info("📊 Processing results...")
-                    
-                    # Display results
-                    st.success("✨ Transcription completed!")
-                    st.subheader("Transcript")
-                    st.text_area("Full Transcript", transcription_result['text'], height=300)
-                    
-                    # Save and offer downloads
-                    try:
-                        progress_bar.progress(90)
-                        status_container.info("💾 Saving output files...")
-                        
-                        # Ensure output directory exists
-                        output_path = st.session_state.output_dir or './video/'
-                        os.makedirs(output_path, exist_ok=True)
-                        
-                        # Copy file to output directory if it's not already there
-                        output_file_path = os.path.join(output_path, os.path.basename(file_path))
-                        if file_path != output_file_path:
-                            import shutil
-                            shutil.copy2(file_path, output_file_path)
-                            file_path = output_file_path
-                        
-                        # Save files based on selected format
-                        if output_format in ["All Formats", "Text Only", "Text + JSON"]:
-                            transcript_path = f"{os.path.splitext(file_path)[0]}_transcript.txt"
-                            transcriber.save_transcript(transcription_result, file_path)
-                            with open(transcript_path, 'r', encoding='utf-8') as f:
-                                transcript_content = f.read()
-                            st.download_button(
-                                "📄 Download Transcript (TXT)",
-                                transcript_content,
-                                file_name=f"{os.path.splitext(os.path.basename(file_path))[0]}_transcript.txt"
-                            )
-
-                        if output_format in ["All Formats", "SRT Only", "SRT + JSON"]:
-                            srt_path = f"{os.path.splitext(file_path)[0]}.srt"
-                            transcriber.save_srt(transcription_result['segments'], file_path)
-                            with open(srt_path, 'r', encoding='utf-8') as f:
-                                srt_content = f.read()
-                            st.download_button(
-                                "🎬 Download Subtitles (SRT)",
-                                srt_content,
-                                file_name=f"{os.path.splitext(os.path.basename(file_path))[0]}.srt"
-                            )
-                        
-                        if output_format in ["All Formats", "JSON Only", "Text + JSON", "SRT + JSON"]:
-                            json_path = f"{os.path.splitext(file_path)[0]}_transcript.json"
-                            transcriber.save_json(transcription_result, file_path)
-                            with open(json_path, 'r', encoding='utf-8') as f:
-                                json_content = f.read()
-                            st.download_button(
-                                "📊 Download Transcript (JSON)",
-                                json_content,
-                                file_name=f"{os.path.splitext(os.path.basename(file_path))[0]}_transcript.json"
-                            )
-                            
-                        progress_bar.progress(100)
-                        status_container.success(f"✅ Files saved to: {output_path}")
-                    except Exception as e:
-                        st.error(f"❌ Error saving files: {str(e)}")
-                else:
-                    status_container.error("❌ Transcription failed.")
-                    progress_bar.empty()
-                
-                # Display total time taken
-                end_time = time.time()
-                time_container.info(f"⏱️ Total time: {format_time(end_time - start_time)}")
+                submit_job(executor, 'file', dict(job_params, file_path=st.session_state.selected_file,
+                                                  title=os.path.basename(st.session_state.selected_file)))
 
     elif input_source == "YouTube URL":
         st.header("YouTube Video")
@@ -337,57 +372,7 @@ def main():
         
         if youtube_url:
             if st.button("🎯 Transcribe", type="primary", key="transcribe_youtube"):
-                start_time = time.time()
-                status_container.info("🚀 Starting YouTube processing...")
-                progress_bar = progress_container.progress(0)
-                
-                # Download audio
-                status_container.info("⬇️ Downloading YouTube video...")
-                progress_bar.progress(20)
-                output_path = st.session_state.output_dir or './video/'
-                audio_file = audio_downloader.download_audio(youtube_url, output_path)
-                
-                if audio_file:
-                    # Transcribe
-                    status_container.info(f"🎯 Transcribing audio (Language: {language_choice})...")
-                    progress_bar.progress(50)
-                    transcription_result = transcriber.transcribe_audio(audio_file, language=language)
-                    
-                    if transcription_result:
-                        # Display results
-                        progress_bar.progress(80)
-                        status_container.info("📊 Processing results...")
-                        st.success("✨ Transcription completed!")
-                        st.subheader("Transcript")
-                        st.text_area("Full Transcript", transcription_result['text'], height=300)
-                        
-                        # Save files
-                        try:
-                            status_container.info("💾 Saving output files...")
-                            # Save files based on selected format
-                            if output_format in ["All Formats", "Text Only", "Text + JSON"]:
-                                transcriber.save_transcript(transcription_result, audio_file)
-                            
-                            if output_format in ["All Formats", "SRT Only", "SRT + JSON"]:
-                                transcriber.save_srt(transcription_result['segments'], audio_file)
-                            
-                            if output_format in ["All Formats", "JSON Only", "Text + JSON", "SRT + JSON"]:
-                                transcriber.save_json(transcription_result, audio_file)
-                            
-                            progress_bar.progress(100)
-                            status_container.success(f"✅ Files saved to: {os.path.dirname(audio_file)}")
-                        except Exception as e:
-                            st.error(f"❌ Error saving files: {str(e)}")
-                    else:
-                        status_container.error("❌ Transcription failed.")
-                        progress_bar.empty()
-                else:
-                    status_container.error("❌ Failed to download YouTube video.")
-                    progress_bar.empty()
-                
-                # Display total time taken
-                end_time = time.time()
-                time_container.info(f"⏱️ Total time: {format_time(end_time - start_time)}")
+                submit_job(executor, 'file', dict(job_params, url=youtube_url, title=youtube_url))
 
     elif input_source == "Batch Processing (CSV)":
         st.header("Batch Processing")
@@ -412,6 +397,7 @@ def main():
         
         if st.session_state.selected_csv and os.path.exists(st.session_state.selected_csv):
             # Preview CSV content
+            urls = []
             try:
                 with open(st.session_state.selected_csv, 'r', newline='', encoding='utf-8') as csvfile:
                     reader = csv.reader(csvfile)
@@ -421,57 +407,22 @@ def main():
                         st.info(f"Found {len(urls)} URLs in CSV file")
             except Exception as e:
                 st.error(f"Error reading CSV: {str(e)}")
-                urls = []
+            
+            download_mode = st.selectbox("Downloaded Audio",
+                                         list(AUDIO_DOWNLOAD_OPTIONS),
+                                         key="download_mode",
+                                         help="16 kHz PCM skips the MP3 encode and the decode before transcription")
             
             if st.button("🎯 Process Batch", type="primary", key="process_batch"):
-                start_time = time.time()
-                status_container.info("🚀 Starting batch processing...")
-                
                 if urls:
-                    progress_bar = progress_container.progress(0)
-                    status_text = st.empty()
-                    
-                    output_path = st.session_state.output_dir or './video/'
-                    successful = 0
-                    failed = 0
-                    
-                    for i, url in enumerate(urls):
-                        status_container.info(f"🎯 Processing URL {i+1}/{len(urls)}")
-                        status_text.text(f"Current URL: {url}")
-                        
-                        # Download and transcribe
-                        audio_file = audio_downloader.download_audio(url, output_path)
-                        if audio_file:
-                            transcription_result = transcriber.transcribe_audio(audio_file, language=language)
-                            if transcription_result:
-                                # Save files based on selected format
-                                if output_format in ["All Formats", "Text Only", "Text + JSON"]:
-                                    transcriber.save_transcript(transcription_result, audio_file)
-                                
-                                if output_format in ["All Formats", "SRT Only", "SRT + JSON"]:
-                                    transcriber.save_srt(transcription_result['segments'], audio_file)
-                                
-                                if output_format in ["All Formats", "JSON Only", "Text + JSON", "SRT + JSON"]:
-                                    transcriber.save_json(transcription_result, audio_file)
-                                
-                                successful += 1
-                            else:
-                                failed += 1
-                        else:
-                            failed += 1
-                        
-                        progress_bar.progress((i + 1) / len(urls))
-                    
-                    status_text.empty()
-                    progress_bar.progress(100)
-                    status_container.success("✅ Batch processing completed!")
-                    st.success(f"📁 Processed {successful} files successfully, {failed} failed. Files saved to: {output_path}")
+                    submit_job(executor, 'batch', dict(job_params, urls=urls,
+                                                       audio_format=AUDIO_DOWNLOAD_OPTIONS[download_mode],
+                                                       title=os.path.basename(st.session_state.selected_csv)))
                 else:
-                    status_container.error("❌ No valid URLs found in CSV file.")
-                
-                # Display total time taken
-                end_time = time.time()
-                time_container.info(f"⏱️ Total time: {format_time(end_time - start_time)}")
+                    st.error("❌ No valid URLs found in CSV file.")
+
+    st.divider()
+    render_jobs(executor)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,162 @@
+import os
+import subprocess
+import tempfile
+import numpy as np
+from utils import set_default_mode
+
+# Whisper models consume 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Extension of decoded 16 kHz mono float32 waveforms stored as NumPy arrays
+PCM_EXTENSION = '.npy'
+
+_NPY_HEADER = {'descr': '<f4', 'fortran_order': False}
+
+
+def is_pcm(audio_file):
+    return isinstance(audio_file, str) and audio_file.endswith(PCM_EXTENSION)
+
+
+def load_audio(audio_file, sr=SAMPLE_RATE):
+    """Decode an audio file to a mono float32 waveform at the given sample rate.
+
+    Decoded PCM artifacts are memory-mapped instead of run through ffmpeg again.
+    """
+    if is_pcm(audio_file) and sr == SAMPLE_RATE:
+        return np.load(audio_file, mmap_mode='r')
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", audio_file,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr),
+        "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode(errors='replace')}") from e
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def decode_to_pcm(source, dest=None, sr=SAMPLE_RATE, block=1 << 20):
+    """Decode any ffmpeg-readable file straight to a float32 .npy waveform.
+
+    ffmpeg's output is streamed into the file behind a placeholder header that is
+    rewritten with the final length, so the waveform is never held in memory.
+    """
+    dest = dest or os.path.splitext(source)[0] + PCM_EXTENSION
+    # A unique temp name lets several processes decode the same source without clashing
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest) or '.', suffix='.part')
+    set_default_mode(fd)
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-loglevel", "error",
+        "-i", source,
+        "-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le", "-ar", str(sr),
+        "-",
+    ]
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.lib.format.write_array_header_1_0(f, dict(_NPY_HEADER, shape=(0,)))
+            header_size = f.tell()
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            for chunk in iter(lambda: process.stdout.read(block), b''):
+                f.write(chunk)
+            stderr = process.stderr.read()
+            if process.wait() != 0:
+                raise RuntimeError(f"Failed to decode audio: {stderr.decode(errors='replace')}")
+            samples = (f.tell() - header_size) // 4
+            f.truncate(header_size + samples * 4)
+            f.seek(0)
+            np.lib.format.write_array_header_1_0(f, dict(_NPY_HEADER, shape=(samples,)))
+            if f.tell() != header_size:
+                raise RuntimeError("Decoded audio is too long for the reserved .npy header")
+        os.replace(tmp_path, dest)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dest
+
+
+def stream_audio(audio_file, block_seconds=10.0, sr=SAMPLE_RATE):
+    """Yield a file's mono float32 waveform in consecutive blocks of `block_seconds`.
+
+    Audio is read from an ffmpeg pipe (or a mapped PCM artifact) as it is consumed,
+    so only one block is held at a time however long the recording is.
+    """
+    block = max(int(block_seconds * sr), 1)
+    if is_pcm(audio_file) and sr == SAMPLE_RATE:
+        waveform = np.load(audio_file, mmap_mode='r')
+        for start in range(0, len(waveform), block):
+            yield np.array(waveform[start:start + block], dtype=np.float32)
+        return
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-loglevel", "error",
+        "-i", audio_file,
+        "-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le", "-ar", str(sr),
+        "-",
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for chunk in iter(lambda: process.stdout.read(block * 4), b''):
+            samples = len(chunk) // 4
+            if samples:
+                yield np.frombuffer(chunk[:samples * 4], dtype='<f4')
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"Failed to decode audio: {stderr.decode(errors='replace')}")
+    finally:
+        # The consumer may stop early; don't leave ffmpeg blocked on a full pipe
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def audio_duration(audio, sr=SAMPLE_RATE):
+    """Duration in seconds of a decoded waveform"""
+    return len(audio) / sr
+
+
+def probe_duration(audio_file):
+    """Duration in seconds of an audio file from its container metadata, or None"""
+    if is_pcm(audio_file):
+        return audio_duration(np.load(audio_file, mmap_mode='r'))
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", audio_file]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True, text=True).stdout
+        return float(out.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def frame_rms(waveform, frame_seconds=0.02, sr=SAMPLE_RATE):
+    """Root-mean-square energy of consecutive non-overlapping frames"""
+    frame = max(int(frame_seconds * sr), 1)
+    count = len(waveform) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(waveform[:count * frame], dtype=np.float32).reshape(count, frame)
+    # einsum avoids materialising a squared copy of the whole recording
+    return np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame)
+
+
+def silence_split_points(waveform, min_seconds=30.0, max_seconds=120.0, frame_seconds=0.02,
+                         smooth_seconds=0.3, sr=SAMPLE_RATE):
+    """Sample offsets that cut the waveform into min..max second pieces at its quietest moments"""
+    energy = frame_rms(waveform, frame_seconds, sr)
+    width = max(int(smooth_seconds / frame_seconds), 1)
+    if len(energy) >= width:
+        energy = np.convolve(energy, np.ones(width) / width, mode='same')
+    frames_per_second = 1.0 / frame_seconds
+    frame = int(frame_seconds * sr)
+    total = len(waveform)
+    points = []
+    position = 0
+    while total - position > max_seconds * sr:
+        first = int((position / sr + min_seconds) * frames_per_second)
+        last = int((position / sr + max_seconds) * frames_per_second)
+        quietest = first + int(np.argmin(energy[first:last]))
+        position = quietest * frame + frame // 2
+        points.append(position)
+    return points
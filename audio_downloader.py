@@ -1,16 +1,62 @@
 import os
-import yt_dlp
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+import audio
+import profiling
 from interface import UserInterface
+from metrics import REGISTRY
 
-def download_audio(url, output_path='./video/'):
-    ui = UserInterface()
-    ydl_opts = {
+# 'mp3' re-encodes to 192 kbps MP3, 'native' keeps the source container (m4a/opus/webm),
+# 'pcm' decodes the native download straight to a 16 kHz float32 waveform for the model
+AUDIO_FORMATS = ('mp3', 'native', 'pcm')
+
+# Download errors that usually succeed when retried a little later
+TRANSIENT_ERRORS = (
+    'HTTP Error 403',
+    'HTTP Error 429',
+    'HTTP Error 500',
+    'HTTP Error 502',
+    'HTTP Error 503',
+    'HTTP Error 504',
+    'timed out',
+    'Connection reset',
+    'Connection refused',
+    'Temporary failure in name resolution',
+    'IncompleteRead',
+    'Remote end closed connection',
+)
+
+
+# Downloaded files are named '[<video id>] <title>.<ext>'
+_FILENAME_ID = re.compile(r'^\[([^\]]+)\] ')
+
+
+def extract_video_id(url):
+    """YouTube video id of a watch, short or youtu.be URL, or None"""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.endswith('youtu.be'):
+        return parsed.path.strip('/').split('/')[0] or None
+    if 'youtube' in host:
+        if parsed.path == '/watch':
+            return parse_qs(parsed.query).get('v', [None])[0]
+        parts = parsed.path.strip('/').split('/')
+        if len(parts) >= 2 and parts[0] in ('shorts', 'live', 'embed', 'v'):
+            return parts[1]
+    return None
+
+
+def video_id_from_filename(path):
+    match = _FILENAME_ID.match(os.path.basename(path))
+    return match.group(1) if match else None
+
+
+def build_ydl_opts(output_path='./video/', audio_format='mp3'):
+    opts = {
         'format': 'bestaudio/best',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
         'outtmpl': output_path + '/[%(id)s] %(title)s.%(ext)s',
         'quiet': False,
         'no_warnings': False,
@@ -22,21 +68,155 @@ def download_audio(url, output_path='./video/'):
             }
         },
     }
+    if audio_format == 'mp3':
+        opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': '192',
+        }]
+    return opts
+
+
+def is_transient(error):
+    message = str(error)
+    return any(fragment in message for fragment in TRANSIENT_ERRORS)
+
 
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info)
-            audio_file = os.path.splitext(filename)[0] + '.mp3'
-            if os.path.exists(audio_file):
-                ui.display_success(f"Audio downloaded successfully: {audio_file}")
+class DownloadEngine:
+    """Downloads URLs for any number of calling threads, such as the pipeline's download workers.
+
+    Every calling thread keeps one configured YoutubeDL instance for its lifetime, at most
+    `per_host` downloads run against the same host at once, and transient failures such
+    as 403s are retried with exponential backoff and full jitter.
+    """
+
+    def __init__(self, output_path='./video/', per_host=2, retries=3,
+                 backoff=1.0, max_backoff=30.0, ydl_opts=None, audio_format='mp3', keep_source=False,
+                 metrics=None):
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unknown audio format '{audio_format}'. Choose from: {', '.join(AUDIO_FORMATS)}")
+        self.ui = UserInterface()
+        self.metrics = metrics or REGISTRY
+        self.output_path = output_path
+        self.audio_format = audio_format
+        self.keep_source = keep_source
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.ydl_opts = ydl_opts or build_ydl_opts(output_path, audio_format)
+        self._local = threading.local()
+        self._instances = []
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            ydl.close()
+
+    def _ydl(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            # Imported on first use: yt_dlp takes a noticeable share of CLI start-up
+            import yt_dlp
+            ydl = yt_dlp.YoutubeDL(self.ydl_opts)
+            self._local.ydl = ydl
+            with self._lock:
+                self._instances.append(ydl)
+        return ydl
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def download(self, url):
+        """Download one URL, retrying transient failures; returns the audio path or None"""
+        start = time.perf_counter()
+        with profiling.stage('download', url):
+            audio_file = self._download(url)
+        self.metrics.histogram('download_seconds', "Download time per URL, retries included").observe(
+            time.perf_counter() - start, result='ok' if audio_file else 'failed')
+        return audio_file
+
+    def _fail(self, cause):
+        self.metrics.counter('failures_total', "Failures by stage and cause").inc(stage='download', cause=cause)
+        return None
+
+    def _download(self, url):
+        from yt_dlp.utils import DownloadError
+        slot = self._host_slot(url)
+        for attempt in range(self.retries + 1):
+            try:
+                with slot:
+                    ydl = self._ydl()
+                    info = ydl.extract_info(url, download=True)
+                    filename = ydl.prepare_filename(info)
+                audio_file = self._downloaded_file(info, filename)
+                if not os.path.exists(audio_file):
+                    self.ui.display_error(f"Audio file not found after download: {audio_file}")
+                    return self._fail('missing_file')
+                self.metrics.counter('download_bytes_total', "Bytes of audio downloaded").inc(
+                    os.path.getsize(audio_file))
+                if self.audio_format == 'pcm':
+                    audio_file = self._to_pcm(audio_file)
+                self.ui.display_success(f"Audio downloaded successfully: {audio_file}")
                 return audio_file
-            else:
-                ui.display_error(f"Audio file not found after download: {audio_file}")
-                return None
-    except yt_dlp.utils.DownloadError as e:
-        ui.display_error(f"Download error: {str(e)}")
+            except DownloadError as e:
+                if attempt < self.retries and is_transient(e):
+                    delay = self._delay(attempt)
+                    self.metrics.counter('download_retries_total', "Transient download errors retried").inc()
+                    self.ui.display_progress(
+                        f"Transient download error, retrying in {delay:.1f}s "
+                        f"({attempt + 1}/{self.retries}): {url}")
+                    time.sleep(delay)
+                    continue
+                self.ui.display_error(f"Download error: {str(e)}")
+                return self._fail('transient' if is_transient(e) else 'download_error')
+            except Exception as e:
+                self.ui.display_error(f"An unexpected error occurred while downloading: {str(e)}")
+                return self._fail(type(e).__name__)
+
+    def _downloaded_file(self, info, filename):
+        if self.audio_format == 'mp3':
+            return os.path.splitext(filename)[0] + '.mp3'
+        downloads = info.get('requested_downloads') or []
+        return downloads[0].get('filepath', filename) if downloads else filename
+
+    def _to_pcm(self, source):
+        # One ffmpeg decode to what the model consumes, instead of an MP3 encode it decodes again
+        with self.metrics.histogram('decode_seconds', "ffmpeg decode time per file").time(source='download'):
+            pcm_file = audio.decode_to_pcm(source)
+        if not self.keep_source:
+            os.remove(source)
+        return pcm_file
+
+    def probe(self, url):
+        """Metadata yt-dlp extracts for a URL (duration, title, ...), without downloading; None on failure"""
+        from yt_dlp.utils import DownloadError
+        try:
+            with self._host_slot(url):
+                return self._ydl().extract_info(url, download=False)
+        except DownloadError as e:
+            self.ui.display_error(f"Could not probe {url}: {str(e)}")
+        except Exception as e:
+            self.ui.display_error(f"An unexpected error occurred while probing {url}: {str(e)}")
         return None
-    except Exception as e:
-        ui.display_error(f"An unexpected error occurred while downloading: {str(e)}")
-        return None
\ No newline at end of file
+
+
+def download_audio(url, output_path='./video/', audio_format='mp3'):
+    with DownloadEngine(output_path, audio_format=audio_format) as engine:
+        return engine.download(url)
@@ -0,0 +1,292 @@
+import functools
+import importlib
+import os
+import threading
+import types
+import time
+import numpy as np
+import audio
+
+MLX_MODEL = "./models/models--mlx-community--whisper-large-v2-mlx"
+
+
+class TranscriptionBackend:
+    """Base class for speech-to-text engines used by Transcriber.
+
+    A backend's model is loaded and warmed up once per process and then shared by
+    every backend instance with the same settings, so Streamlit reruns and new
+    Transcriber objects never reload weights. Subclasses implement _load_model,
+    _warm_up and _transcribe.
+    """
+
+    name = 'base'
+    # Whether one loaded model may run several transcriptions at the same time
+    thread_safe = False
+
+    _models = {}
+    _load_times = {}
+    _model_locks = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, model):
+        self.model = model
+        self.audio_seconds = 0.0
+        self.compute_seconds = 0.0
+
+    @property
+    def cache_id(self):
+        """Identifies the model and settings that produced a result"""
+        return f"{self.name}:{self.model}"
+
+    def _key(self):
+        return (type(self).__name__, self.cache_id)
+
+    def load(self):
+        """Load and warm up the model unless this process already has it"""
+        key = self._key()
+        with self._registry_lock:
+            if key not in self._models:
+                start = time.time()
+                handle = self._load_model()
+                self._warm_up(handle)
+                self._models[key] = handle
+                self._load_times[key] = time.time() - start
+                self._model_locks[key] = threading.Lock()
+            return self._models[key]
+
+    @property
+    def load_time(self):
+        return self._load_times.get(self._key())
+
+    @property
+    def realtime_factor(self):
+        """Compute seconds spent per second of audio (lower is faster)"""
+        if not self.audio_seconds:
+            return None
+        return self.compute_seconds / self.audio_seconds
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'model': self.model,
+            'load_time': self.load_time,
+            'audio_seconds': self.audio_seconds,
+            'compute_seconds': self.compute_seconds,
+            'realtime_factor': self.realtime_factor,
+        }
+
+    def transcribe(self, audio_input, language, progress=None, **decode_options):
+        """Transcribe a file path or a 16 kHz mono float32 waveform.
+
+        `progress` is called with the number of audio seconds decoded so far each time
+        the model finishes a segment.
+        """
+        handle = self.load()
+        lock = self._model_locks[self._key()]
+        start = time.time()
+        if self.thread_safe:
+            result = self._transcribe(handle, audio_input, language, decode_options, progress)
+        else:
+            with lock:
+                result = self._transcribe(handle, audio_input, language, decode_options, progress)
+        if result:
+            self.record(self._duration(audio_input, result), time.time() - start)
+        return result
+
+    def record(self, audio_seconds, compute_seconds):
+        """Account audio transcribed outside transcribe(), e.g. by worker processes"""
+        self.audio_seconds += audio_seconds
+        self.compute_seconds += compute_seconds
+
+    @staticmethod
+    def _duration(audio_input, result):
+        if not isinstance(audio_input, str):
+            return audio.audio_duration(audio_input)
+        segments = result.get('segments') or []
+        return segments[-1]['end'] if segments else 0.0
+
+    def _load_model(self):
+        raise NotImplementedError
+
+    def _warm_up(self, handle):
+        pass
+
+    def _transcribe(self, handle, audio_input, language, decode_options, progress):
+        raise NotImplementedError
+
+
+class MLXBackend(TranscriptionBackend):
+    """Whisper on Apple silicon through mlx_whisper"""
+
+    name = 'mlx'
+
+    def __init__(self, model=MLX_MODEL, fp16=True):
+        super().__init__(model)
+        self.fp16 = fp16
+
+    def _load_model(self):
+        import mlx.core as mx
+        from mlx_whisper.transcribe import ModelHolder
+        # mlx_whisper.transcribe looks the model up in the same holder, so it is not reloaded
+        return ModelHolder.get_model(self.model, mx.float16 if self.fp16 else mx.float32)
+
+    def _warm_up(self, handle):
+        import mlx_whisper
+        mlx_whisper.transcribe(np.zeros(audio.SAMPLE_RATE, dtype=np.float32),
+                               path_or_hf_repo=self.model, fp16=self.fp16, language='en')
+
+    def _transcribe(self, handle, audio_input, language, decode_options, progress):
+        import mlx_whisper
+        # mlx_whisper only reports progress through its tqdm bar, so swap in one that
+        # forwards to the callback; the model lock keeps the swap to this call
+        module = importlib.import_module('mlx_whisper.transcribe')
+        original_tqdm = module.tqdm
+        if progress:
+            module.tqdm = types.SimpleNamespace(tqdm=functools.partial(_FrameProgress, progress))
+        try:
+            return mlx_whisper.transcribe(audio_input, path_or_hf_repo=self.model, fp16=self.fp16,
+                                          language=language, **decode_options)
+        finally:
+            module.tqdm = original_tqdm
+
+
+class _FrameProgress:
+    """tqdm stand-in that converts Whisper's mel frame counts to seconds for a callback"""
+
+    # Whisper's mel spectrogram has a 10 ms hop
+    FRAMES_PER_SECOND = 100
+
+    def __init__(self, callback, total=None, **kwargs):
+        self.callback = callback
+        self.total = total
+        self.n = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def update(self, n=1):
+        self.n += n
+        self.callback(self.n / self.FRAMES_PER_SECOND)
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """Whisper on CPU through faster-whisper (CTranslate2), int8 by default"""
+
+    name = 'faster-whisper'
+
+    def __init__(self, model='large-v2', device='cpu', compute_type='int8', cpu_threads=0):
+        super().__init__(model)
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+
+    @property
+    def cache_id(self):
+        return f"{self.name}:{self.model}:{self.device}:{self.compute_type}"
+
+    def _load_model(self):
+        from faster_whisper import WhisperModel
+        return WhisperModel(self.model, device=self.device, compute_type=self.compute_type,
+                            cpu_threads=self.cpu_threads)
+
+    def _warm_up(self, handle):
+        segments, _ = handle.transcribe(np.zeros(audio.SAMPLE_RATE, dtype=np.float32), language='en')
+        list(segments)
+
+    def _transcribe(self, handle, audio_input, language, decode_options, progress):
+        segments, info = handle.transcribe(audio_input, language=language, **decode_options)
+        result_segments = []
+        # Segments are decoded lazily as the generator is consumed
+        for segment in segments:
+            if progress:
+                progress(segment.end)
+            result_segments.append({
+                'id': segment.id,
+                'seek': segment.seek,
+                'start': segment.start,
+                'end': segment.end,
+                'text': segment.text,
+                'tokens': list(segment.tokens),
+                'temperature': segment.temperature,
+                'avg_logprob': segment.avg_logprob,
+                'compression_ratio': segment.compression_ratio,
+                'no_speech_prob': segment.no_speech_prob,
+            })
+        return {
+            'text': ''.join(segment['text'] for segment in result_segments),
+            'segments': result_segments,
+            'language': info.language,
+        }
+
+
+class FakeBackend(TranscriptionBackend):
+    """Deterministic stand-in that emits one placeholder segment per `segment_seconds`.
+
+    `cost_per_second` burns that much CPU time per second of audio, so pipelines and
+    benchmarks can model a real backend's cost without a model or GPU.
+    """
+
+    name = 'fake'
+    thread_safe = True
+
+    def __init__(self, model='fake', segment_seconds=5.0, cost_per_second=0.0, load_seconds=0.0):
+        super().__init__(model)
+        self.segment_seconds = segment_seconds
+        self.cost_per_second = cost_per_second
+        self.load_seconds = load_seconds
+
+    @property
+    def cache_id(self):
+        return f"{self.name}:{self.model}:{self.segment_seconds}"
+
+    def _load_model(self):
+        time.sleep(self.load_seconds)
+        return self.model
+
+    def _transcribe(self, handle, audio_input, language, decode_options, progress):
+        waveform = audio.load_audio(audio_input) if isinstance(audio_input, str) else audio_input
+        duration = audio.audio_duration(waveform)
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + self.segment_seconds, duration)
+            _burn_cpu((end - start) * self.cost_per_second)
+            if progress:
+                progress(end)
+            segments.append({
+                'id': len(segments),
+                'seek': int(start * 100),
+                'start': round(start, 3),
+                'end': round(end, 3),
+                'text': f" [{language}] segment {len(segments)}",
+            })
+            start = end
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': language,
+        }
+
+
+def _burn_cpu(seconds):
+    deadline = time.thread_time() + seconds
+    while time.thread_time() < deadline:
+        pass
+
+
+BACKENDS = {
+    MLXBackend.name: MLXBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def get_backend(name=None, **kwargs):
+    """Backend by name, defaulting to $TRANSCRIBE_BACKEND and then MLX"""
+    name = name or os.environ.get('TRANSCRIBE_BACKEND', MLXBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,42 @@
+"""Speedup of chunked parallel transcription against worker count.
+
+Runs the fake backend with a fixed CPU cost per audio second, so the numbers
+measure the chunking, process pool and stitching overhead rather than a model.
+
+    python -m benchmarks.chunked --minutes 15 --cost 0.02
+"""
+import argparse
+import os
+import time
+from backends import FakeBackend
+from chunking import transcribe_chunked
+from benchmarks.synthetic import speech_like
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=float, default=15.0)
+    parser.add_argument('--cost', type=float, default=0.02, help="CPU seconds per audio second")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    waveform = speech_like(args.minutes * 60)
+    backend = FakeBackend(cost_per_second=args.cost)
+
+    start = time.time()
+    backend.transcribe(waveform, 'tr')
+    baseline = time.time() - start
+    print(f"{args.minutes:.0f} min of audio, sequential: {baseline:.2f}s")
+    print(f"{'workers':>8} {'seconds':>8} {'speedup':>8} {'segments':>9}")
+
+    workers = 1
+    while workers <= args.max_workers:
+        start = time.time()
+        result = transcribe_chunked(backend, waveform, 'tr', workers=workers)
+        elapsed = time.time() - start
+        print(f"{workers:>8} {elapsed:>8.2f} {baseline / elapsed:>8.2f} {len(result['segments']):>9}")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""End-to-end batch pipeline benchmark: download -> decode -> transcribe -> write.
+
+Synthetic speech-like WAV files are served from a local HTTP server, fetched through
+DownloadEngine, transcribed by the fake backend at a fixed CPU cost per audio second
+and saved in every output format. Each audio length runs in a fresh process so its
+peak RSS is its own. Results are appended to a JSON history file and compared with
+the previous run of the same configuration.
+
+    python -m benchmarks.pipeline --minutes 1 15 90 --cost 0.01
+"""
+import argparse
+import functools
+import http.server
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from audio_downloader import DownloadEngine, build_ydl_opts
+from backends import FakeBackend
+from pipeline import BatchPipeline
+from transcription import Transcriber
+from benchmarks.synthetic import write_speech_wav
+
+HISTORY_FILE = './cache/benchmarks/pipeline.json'
+FORMATS = ('txt', 'srt', 'json')
+
+
+def peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return usage / (1 << 20) if sys.platform == 'darwin' else usage / 1024
+
+
+def serve_directory(directory):
+    """Local HTTP server standing in for the video host; returns (server, base_url)"""
+    handler = functools.partial(_QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def run_case(source_dir, names, cost, queue_size):
+    """Push the given files through the pipeline; runs in its own process"""
+    server, base_url = serve_directory(source_dir)
+    transcriber = Transcriber(backend=FakeBackend(cost_per_second=cost))
+    try:
+        with tempfile.TemporaryDirectory(prefix='bench-out-') as output_path:
+            ydl_opts = dict(build_ydl_opts(output_path, 'native'), quiet=True, no_warnings=True,
+                            noprogress=True)
+            with DownloadEngine(output_path, ydl_opts=ydl_opts, audio_format='native') as engine:
+                pipeline = BatchPipeline(transcriber, formats=FORMATS, output_path=output_path,
+                                         downloader=engine.download, queue_size=queue_size)
+                start = time.time()
+                items = list(pipeline.run([f"{base_url}/{name}" for name in names]))
+                wall = time.time() - start
+    finally:
+        server.shutdown()
+    failed = [item.error for item in items if not item.ok]
+    if failed:
+        raise RuntimeError(f"Benchmark run failed: {failed}")
+    audio_seconds = sum(item.duration for item in items)
+    stages = {stage: sum(item.timings.get(stage, 0.0) for item in items) / len(items)
+              for stage in BatchPipeline.STAGES}
+    return {
+        'files': len(items),
+        'audio_seconds': round(audio_seconds, 3),
+        'wall_seconds': round(wall, 3),
+        'stage_seconds': {stage: round(seconds, 3) for stage, seconds in stages.items()},
+        'realtime_factor': round(sum(item.timings['transcribe'] for item in items) / audio_seconds, 5),
+        'end_to_end_realtime_factor': round(wall / audio_seconds, 5),
+        'files_per_hour': round(len(items) * 3600 / wall, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def previous_result(history, config, minutes):
+    for run in reversed(history):
+        if run['config'] == config:
+            for case in run['cases']:
+                if case['minutes'] == minutes:
+                    return case
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=float, nargs='+', default=[1, 15, 90])
+    parser.add_argument('--copies', type=int, default=2, help="files of each length per run")
+    parser.add_argument('--cost', type=float, default=0.01, help="CPU seconds per audio second")
+    parser.add_argument('--queue-size', type=int, default=2)
+    parser.add_argument('--history', default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    config = {'copies': args.copies, 'cost': args.cost, 'queue_size': args.queue_size}
+    history = load_history(args.history)
+    cases = []
+    with tempfile.TemporaryDirectory(prefix='bench-src-') as source_dir:
+        print(f"{'minutes':>8} {'files':>6} {'wall s':>8} {'download':>9} {'decode':>8} {'transcr.':>9} "
+              f"{'write':>7} {'RTF':>7} {'files/h':>8} {'RSS MB':>8}")
+        for minutes in args.minutes:
+            names = []
+            for copy in range(args.copies):
+                name = f"bench-{minutes:g}min-{copy}.wav"
+                write_speech_wav(os.path.join(source_dir, name), minutes * 60, seed=copy)
+                names.append(name)
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                case = pool.submit(run_case, source_dir, names, args.cost, args.queue_size).result()
+            case['minutes'] = minutes
+            stages = case['stage_seconds']
+            print(f"{minutes:>8g} {case['files']:>6} {case['wall_seconds']:>8.2f} {stages['download']:>9.2f} "
+                  f"{stages['decode']:>8.2f} {stages['transcribe']:>9.2f} {stages['write']:>7.2f} "
+                  f"{case['realtime_factor']:>7.4f} {case['files_per_hour']:>8.0f} {case['peak_rss_mb']:>8.0f}")
+            previous = previous_result(history, config, minutes)
+            if previous:
+                change = case['files_per_hour'] / previous['files_per_hour'] - 1
+                print(f"{'':>8} files/hour {change:+.1%}, peak RSS "
+                      f"{case['peak_rss_mb'] - previous['peak_rss_mb']:+.0f} MB vs previous run")
+            for name in names:
+                os.remove(os.path.join(source_dir, name))
+            cases.append(case)
+
+    history.append({
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'config': config,
+        'cases': cases,
+    })
+    save_history(args.history, history)
+    print(f"Results appended to {args.history}")
+
+
+if __name__ == '__main__':
+    main()
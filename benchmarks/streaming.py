@@ -0,0 +1,93 @@
+"""Peak memory of streaming transcription against recording length.
+
+Synthetic speech-like WAV files of each length are transcribed by the fake backend
+with Transcriber.stream_outputs, each in a fresh process so its peak RSS is its own,
+and for comparison with the whole-file path. Streaming must stay within
+`--max-growth-mb` of the shortest recording's peak at every length; the benchmark
+exits with status 1 when it does not, so it can gate a change.
+
+    python -m benchmarks.streaming --minutes 5 60 240 --window 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from backends import FakeBackend
+from transcription import Transcriber
+from benchmarks.pipeline import peak_rss_mb, git_revision, load_history, save_history
+from benchmarks.synthetic import write_speech_wav
+
+HISTORY_FILE = './cache/benchmarks/streaming.json'
+FORMATS = ('txt', 'srt', 'json')
+
+
+def run_case(path, mode, window, cost):
+    """Transcribe one file in `mode` ('stream' or 'whole'); runs in its own process"""
+    transcriber = Transcriber(backend=FakeBackend(cost_per_second=cost))
+    start = time.time()
+    if mode == 'stream':
+        result = transcriber.stream_outputs(path, path, FORMATS, window_seconds=window)
+        segments = result['segments'] if result else None
+    else:
+        result = transcriber.transcribe_audio(path)
+        written = transcriber.save_outputs(result, path, FORMATS) if result else {}
+        segments = len(result['segments']) if written else None
+    if segments is None:
+        raise RuntimeError(f"{mode} transcription of {path} failed")
+    return {
+        'mode': mode,
+        'segments': segments,
+        'wall_seconds': round(time.time() - start, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=float, nargs='+', default=[5, 60, 240])
+    parser.add_argument('--window', type=float, default=30.0, help="streaming window in seconds")
+    parser.add_argument('--cost', type=float, default=0.0, help="CPU seconds per audio second")
+    parser.add_argument('--max-growth-mb', type=float, default=32.0,
+                        help="allowed rise in streaming peak RSS over the shortest recording")
+    parser.add_argument('--no-whole', action='store_true', help="skip the whole-file comparison")
+    parser.add_argument('--history', default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    modes = ['stream'] if args.no_whole else ['stream', 'whole']
+    cases = []
+    with tempfile.TemporaryDirectory(prefix='bench-stream-') as source_dir:
+        print(f"{'minutes':>8} {'mode':>7} {'segments':>9} {'wall s':>8} {'RSS MB':>8}")
+        for minutes in sorted(args.minutes):
+            path = write_speech_wav(os.path.join(source_dir, f"stream-{minutes:g}min.wav"), minutes * 60)
+            for mode in modes:
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    case = pool.submit(run_case, path, mode, args.window, args.cost).result()
+                case['minutes'] = minutes
+                print(f"{minutes:>8g} {mode:>7} {case['segments']:>9} {case['wall_seconds']:>8.2f} "
+                      f"{case['peak_rss_mb']:>8.0f}")
+                cases.append(case)
+            for name in os.listdir(source_dir):
+                os.remove(os.path.join(source_dir, name))
+
+    streamed = [case for case in cases if case['mode'] == 'stream']
+    growth = streamed[-1]['peak_rss_mb'] - streamed[0]['peak_rss_mb']
+    history = load_history(args.history)
+    history.append({
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'config': {'window': args.window, 'cost': args.cost},
+        'stream_growth_mb': round(growth, 1),
+        'cases': cases,
+    })
+    save_history(args.history, history)
+    print(f"Streaming peak RSS grew {growth:+.0f} MB from {streamed[0]['minutes']:g} to "
+          f"{streamed[-1]['minutes']:g} minutes (limit {args.max_growth_mb:g} MB)")
+    if growth > args.max_growth_mb:
+        print("Streaming memory is not bounded by the window length", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
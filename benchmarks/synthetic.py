@@ -0,0 +1,57 @@
+import wave
+import numpy as np
+import audio
+
+
+def speech_like(seconds, seed=0, sr=audio.SAMPLE_RATE):
+    """Deterministic speech-like test signal: voiced syllable bursts grouped into
+    utterances of 1-6 s, separated by pauses of 0.2-1.5 s over a faint noise floor."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sr)
+    waveform = (rng.standard_normal(total) * 0.002).astype(np.float32)
+    position = int(rng.uniform(0.2, 1.0) * sr)
+    while position < total:
+        length = min(int(rng.uniform(1.0, 6.0) * sr), total - position)
+        t = np.arange(length, dtype=np.float32) / sr
+        f0 = rng.uniform(100, 220)
+        phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.05 * np.sin(2 * np.pi * 0.7 * t))) / sr
+        # Harmonics shaped by three formant-like resonances
+        voiced = sum(_formant_gain(k * f0) * np.sin(k * phase) for k in range(1, 16))
+        syllables = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3.5, 5.5) * t))
+        waveform[position:position + length] += (0.1 * voiced * syllables).astype(np.float32)
+        position += length + int(rng.uniform(0.2, 1.5) * sr)
+    return waveform
+
+
+def _formant_gain(freq):
+    return 0.3 / (1 + freq / 200) + sum(np.exp(-((freq - f) / 250) ** 2) for f in (700, 1200, 2500))
+
+
+def write_wav(path, waveform, sr=audio.SAMPLE_RATE, block=1 << 20):
+    """Write a float waveform as 16-bit mono PCM WAV"""
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        for start in range(0, len(waveform), block):
+            chunk = np.clip(waveform[start:start + block], -1.0, 1.0)
+            f.writeframes((chunk * 32767).astype('<i2').tobytes())
+    return path
+
+
+def write_speech_wav(path, seconds, seed=0, piece_seconds=300.0, sr=audio.SAMPLE_RATE):
+    """Write `seconds` of speech-like audio as WAV, generated a piece at a time so long
+    recordings never have to be held in memory"""
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        written = 0.0
+        piece = 0
+        while written < seconds:
+            length = min(piece_seconds, seconds - written)
+            chunk = np.clip(speech_like(length, seed=seed + piece, sr=sr), -1.0, 1.0)
+            f.writeframes((chunk * 32767).astype('<i2').tobytes())
+            written += length
+            piece += 1
+    return path
@@ -0,0 +1,136 @@
+"""Load time and memory of a transcript archive as JSON versus transcript stores.
+
+A synthetic archive of Whisper-shaped, speaker-attributed transcripts is written in
+both formats. Each format is then loaded in a fresh process to answer the same
+question: total speaking time per speaker across the archive.
+
+    python -m benchmarks.transcript_store --episodes 300 --segments 1500
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from transcript_store import TranscriptStore, write_store, STORE_SUFFIX
+from benchmarks.pipeline import peak_rss_mb
+
+SPEAKERS = ["Sinan Akgunay", "Haluk Bürümcekçi", None]
+WORDS = "faiz enflasyon merkez bankası para politikası kurulu büyüme cari açık kur rezerv".split()
+
+
+def synthetic_transcript(segments, seed):
+    rng = np.random.default_rng(seed)
+    result = []
+    position = 0.0
+    for i in range(segments):
+        length = round(float(rng.uniform(1.0, 8.0)), 2)
+        words = rng.choice(WORDS, size=int(rng.integers(4, 20)))
+        result.append({
+            'id': i,
+            'start': round(position, 2),
+            'end': round(position + length, 2),
+            'text': ' ' + ' '.join(words).capitalize() + '.',
+            'speaker': SPEAKERS[int(rng.integers(len(SPEAKERS)))],
+        })
+        position = round(position + length, 2)
+    return {'text': ''.join(segment['text'] for segment in result), 'segments': result, 'language': 'tr'}
+
+
+def speaking_time_json(paths):
+    totals = {}
+    archive = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            archive.append(json.load(f))
+    for transcript in archive:
+        for segment in transcript['segments']:
+            totals[segment['speaker']] = totals.get(segment['speaker'], 0.0) + segment['end'] - segment['start']
+    return totals
+
+
+def speaking_time_store(paths):
+    totals = {}
+    archive = [TranscriptStore(path) for path in paths]
+    for store in archive:
+        durations = store.ends.astype(np.float64) - store.starts
+        codes = store.speaker_codes
+        sums = np.bincount(codes + 1, weights=durations, minlength=len(store.speakers) + 1)
+        for code, seconds in enumerate(sums):
+            speaker = store.speakers[code - 1] if code else None
+            totals[speaker] = totals.get(speaker, 0.0) + float(seconds)
+    return totals
+
+
+def anon_rss_mb():
+    """Current private (non file-backed) resident memory in MB, where Linux reports it.
+
+    Mapped store pages count towards RSS but are page cache the kernel can drop;
+    this is the memory that loading actually allocates.
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_case(mode, paths):
+    """Load the archive one way; runs in its own process"""
+    baseline = peak_rss_mb()
+    anon_baseline = anon_rss_mb()
+    start = time.time()
+    totals = (speaking_time_json if mode == 'json' else speaking_time_store)(paths)
+    anon = anon_rss_mb()
+    return {
+        'mode': mode,
+        'seconds': round(time.time() - start, 3),
+        'rss_mb': round(peak_rss_mb() - baseline, 1),
+        'anon_mb': round(anon - anon_baseline, 1) if anon is not None else None,
+        'totals': {str(speaker): round(seconds, 1) for speaker, seconds in totals.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--episodes', type=int, default=300)
+    parser.add_argument('--segments', type=int, default=1500, help="segments per episode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-store-') as directory:
+        json_paths, store_paths = [], []
+        for episode in range(args.episodes):
+            transcript = synthetic_transcript(args.segments, episode)
+            path = os.path.join(directory, f"episode-{episode}_transcript.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(transcript, f, ensure_ascii=False, indent=2)
+            json_paths.append(path)
+            store_paths.append(write_store(transcript, os.path.join(directory, f"episode-{episode}{STORE_SUFFIX}")))
+        sizes = {mode: sum(os.path.getsize(path) for path in paths) / (1 << 20)
+                 for mode, paths in (('json', json_paths), ('store', store_paths))}
+
+        cases = {}
+        for mode, paths in (('json', json_paths), ('store', store_paths)):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                cases[mode] = pool.submit(run_case, mode, paths).result()
+
+    print(f"{'format':>7} {'disk MB':>8} {'load s':>8} {'RSS MB':>8} {'anon MB':>8}")
+    for mode, case in cases.items():
+        anon = f"{case['anon_mb']:>8.1f}" if case['anon_mb'] is not None else f"{'n/a':>8}"
+        print(f"{mode:>7} {sizes[mode]:>8.1f} {case['seconds']:>8.3f} {case['rss_mb']:>8.1f} {anon}")
+    # float32 times sum to the same totals up to rounding
+    if any(abs(cases['json']['totals'][speaker] - seconds) > 1e-6 * seconds + 0.1
+           for speaker, seconds in cases['store']['totals'].items()):
+        print(f"Speaking times differ: {cases['json']['totals']} vs {cases['store']['totals']}")
+    store = cases['store']
+    memory = 'anon_mb' if store['anon_mb'] is not None else 'rss_mb'
+    print(f"Store loads {cases['json']['seconds'] / max(store['seconds'], 1e-6):.0f}x faster with "
+          f"{cases['json'][memory] / max(store[memory], 0.1):.0f}x less added memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import audio
+from utils import hash_file, evict_lru, json_default, set_default_mode
+
+
+class TranscriptionCache:
+    """On-disk cache of full transcription results.
+
+    Entries are keyed by the audio content hash together with the model, language and
+    decode options, so a renamed or re-downloaded copy of the same audio still hits.
+    Reads refresh an entry's mtime and the least recently used entries are evicted
+    once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir='./cache/transcripts', max_bytes=1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, audio_file, model, language, decode_options=None):
+        parts = {
+            'audio': hash_file(audio_file),
+            'model': model,
+            'language': language,
+            'options': decode_options or {},
+        }
+        encoded = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(path)
+        return result
+
+    def put(self, key, result):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        set_default_mode(fd)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, default=json_default)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        evict_lru(self.cache_dir, self.max_bytes, suffix='.json')
+
+
+class DecodedAudioStore:
+    """Decoded 16 kHz float32 waveforms, written once per source file and memory-mapped.
+
+    Retries, reruns in another language and runs with another model all reuse the
+    same decode. Because the arrays are memory-mapped, worker processes reading the
+    same episode share its pages through the OS page cache. Entries are keyed by the
+    source's content hash and evicted least-recently-used past `max_bytes`.
+    """
+
+    def __init__(self, store_dir='./cache/audio', max_bytes=20 << 30):
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        os.makedirs(store_dir, exist_ok=True)
+
+    def path_for(self, audio_file):
+        return os.path.join(self.store_dir, f"{hash_file(audio_file)}{audio.PCM_EXTENSION}")
+
+    def load(self, audio_file):
+        if audio.is_pcm(audio_file):
+            return audio.load_audio(audio_file)
+        path = self.path_for(audio_file)
+        if os.path.exists(path):
+            os.utime(path)
+            return np.load(path, mmap_mode='r')
+        audio.decode_to_pcm(audio_file, path)
+        # Map before evicting: an open mapping stays valid even if its file is removed
+        waveform = np.load(path, mmap_mode='r')
+        evict_lru(self.store_dir, self.max_bytes, suffix=audio.PCM_EXTENSION)
+        return waveform
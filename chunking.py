@@ -0,0 +1,107 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import audio
+
+# Each process-pool worker keeps its own loaded copy of the backend
+_worker_backend = None
+
+
+def _init_worker(backend):
+    global _worker_backend
+    _worker_backend = backend
+    _worker_backend.load()
+
+
+def _transcribe_chunk(task):
+    index, source, language, decode_options = task
+    if isinstance(source, tuple):
+        # (path, start, end) of a memory-mapped waveform: map it here instead of copying samples
+        path, start, end = source
+        source = np.load(path, mmap_mode='r')[start:end]
+    return index, _worker_backend.transcribe(source, language, **decode_options)
+
+
+def _chunk_source(waveform, start, end):
+    filename = getattr(waveform, 'filename', None)
+    # Only a whole mapped file can be addressed by sample offsets in the worker
+    if filename and audio.is_pcm(filename) and np.load(filename, mmap_mode='r').shape == waveform.shape:
+        return (filename, start, end)
+    return waveform[start:end]
+
+
+def plan_chunks(waveform, min_seconds=30.0, max_seconds=120.0, overlap_seconds=1.0, sr=audio.SAMPLE_RATE):
+    """Split a waveform at silences into (start, end, core_start, core_end) sample ranges.
+
+    The core ranges tile the recording exactly; each chunk is padded by
+    `overlap_seconds` on both sides so words near a cut are heard in full.
+    """
+    cuts = [0] + audio.silence_split_points(waveform, min_seconds, max_seconds, sr=sr) + [len(waveform)]
+    overlap = int(overlap_seconds * sr)
+    chunks = []
+    for core_start, core_end in zip(cuts, cuts[1:]):
+        chunks.append((max(core_start - overlap, 0), min(core_end + overlap, len(waveform)),
+                       core_start, core_end))
+    return chunks
+
+
+def stitch(chunks, results, sr=audio.SAMPLE_RATE):
+    """Merge per-chunk results into one result on the recording's global timeline.
+
+    Segments are shifted by their chunk offset, and a segment survives only if its
+    midpoint falls inside its chunk's core range, which drops duplicates heard twice
+    in the overlap between neighbouring chunks.
+    """
+    segments = []
+    language = None
+    for (start, _, core_start, core_end), result in zip(chunks, results):
+        if not result:
+            continue
+        language = language or result.get('language')
+        offset = start / sr
+        for segment in result.get('segments', []):
+            midpoint = offset + (segment['start'] + segment['end']) / 2
+            if not core_start / sr <= midpoint < core_end / sr:
+                continue
+            shifted = dict(segment)
+            shifted['id'] = len(segments)
+            shifted['start'] = round(segment['start'] + offset, 3)
+            shifted['end'] = round(segment['end'] + offset, 3)
+            if 'seek' in segment:
+                shifted['seek'] = segment['seek'] + int(round(offset * 100))
+            segments.append(shifted)
+    return {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': language,
+    }
+
+
+def transcribe_chunked(backend, waveform, language, workers=None, min_seconds=30.0, max_seconds=120.0,
+                       overlap_seconds=1.0, progress=None, **decode_options):
+    """Transcribe silence-delimited chunks of a waveform in parallel worker processes.
+
+    Meant for CPU backends on many-core machines; every worker process loads its own
+    copy of the model once. `progress` gets the seconds of audio covered by finished
+    chunks each time one completes.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = plan_chunks(waveform, min_seconds, max_seconds, overlap_seconds)
+    tasks = [(i, _chunk_source(waveform, start, end), language, decode_options)
+             for i, (start, end, _, _) in enumerate(chunks)]
+    results = [None] * len(chunks)
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                             initargs=(backend,)) as pool:
+        # Longest chunks first so the pool does not end waiting on one big straggler
+        tasks.sort(key=lambda task: -(chunks[task[0]][1] - chunks[task[0]][0]))
+        done_samples = 0
+        for future in as_completed([pool.submit(_transcribe_chunk, task) for task in tasks]):
+            index, result = future.result()
+            results[index] = result
+            _, _, core_start, core_end = chunks[index]
+            done_samples += core_end - core_start
+            if progress:
+                progress(done_samples / audio.SAMPLE_RATE)
+    if any(result is None for result in results):
+        return None
+    return stitch(chunks, results)
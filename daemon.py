@@ -0,0 +1,239 @@
+"""Long-lived local transcription server that keeps the model loaded between runs.
+
+    python daemon.py [--address 127.0.0.1:8765] [--backend mlx]
+
+main.py and app.py submit transcriptions to it when it is running and transcribe
+in-process otherwise. Audio is passed by path, so the daemon must see the same files.
+"""
+import argparse
+import http.client
+import http.server
+import json
+import os
+import time
+from transcription import Transcriber
+from interface import UserInterface
+from utils import json_default
+
+# host:port the daemon listens on and clients look for it at
+DAEMON_ENV = 'TRANSCRIBE_DAEMON'
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+
+
+def daemon_address():
+    host, _, port = os.environ.get(DAEMON_ENV, DEFAULT_ADDRESS).rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, default=json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        transcriber = self.server.transcriber
+        self._send_json(200, {
+            'status': 'ok',
+            'pid': os.getpid(),
+            'uptime': time.time() - self.server.started_at,
+            'backend': transcriber.backend.stats(),
+        })
+
+    def do_POST(self):
+        if self.path != '/transcribe':
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            audio_file = request['audio_file']
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {'error': f"Bad request: {str(e)}"})
+            return
+        if not os.path.isfile(audio_file):
+            self._send_json(404, {'error': f"Audio file not found: {audio_file}"})
+            return
+
+        # Progress events stream back as JSON lines, then the result (or error) line
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+
+        def send(data):
+            self.wfile.write(json.dumps(data, default=json_default).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+        def progress(event):
+            try:
+                send({'progress': event})
+            except OSError:
+                # The client went away; let the transcription finish for the cache
+                pass
+
+        result = self.server.transcriber.transcribe_audio(
+            audio_file, language=request.get('language', 'tr'), progress=progress,
+            **request.get('options', {}))
+        try:
+            send({'result': result} if result else {'error': "Transcription failed."})
+        except OSError:
+            pass
+        self.server.transcriber.metrics.export()
+
+
+class TranscriptionDaemon(http.server.ThreadingHTTPServer):
+    """HTTP server on a local address around one warm Transcriber"""
+
+    daemon_threads = True
+
+    def __init__(self, transcriber, address=None):
+        super().__init__(address or daemon_address(), _Handler)
+        self.transcriber = transcriber
+        self.started_at = time.time()
+
+
+class DaemonClient:
+    """Talks to a running daemon; connect() returns None when there is none"""
+
+    def __init__(self, address=None, timeout=None):
+        self.host, self.port = address or daemon_address()
+        self.timeout = timeout
+
+    @classmethod
+    def connect(cls, address=None, probe_timeout=0.5):
+        client = cls(address)
+        try:
+            client.health_info = client.health(probe_timeout)
+        except (OSError, ValueError, http.client.HTTPException):
+            return None
+        return client
+
+    def _request(self, method, path, body=None, timeout=None):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout or self.timeout)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        return connection, connection.getresponse()
+
+    def health(self, timeout=None):
+        connection, response = self._request('GET', '/health', timeout=timeout)
+        try:
+            return json.loads(response.read())
+        finally:
+            connection.close()
+
+    def transcribe(self, audio_file, language, options=None, progress=None):
+        """Result dict, or None if the daemon reported a failure"""
+        connection, response = self._request('POST', '/transcribe', {
+            'audio_file': os.path.abspath(audio_file),
+            'language': language,
+            'options': options or {},
+        })
+        try:
+            if response.status != 200:
+                raise RuntimeError(json.loads(response.read()).get('error', f"HTTP {response.status}"))
+            for line in response:
+                message = json.loads(line)
+                if 'progress' in message:
+                    if progress:
+                        progress(message['progress'])
+                elif 'result' in message:
+                    return message['result']
+                else:
+                    raise RuntimeError(message.get('error', "Transcription failed."))
+            raise ConnectionError("The daemon closed the connection before sending a result")
+        finally:
+            connection.close()
+
+
+class RemoteTranscriber(Transcriber):
+    """Transcriber that hands transcription to the daemon and does the rest locally.
+
+    Outputs are still written by this process. If the daemon goes away mid-run, this
+    and all later work falls back to an in-process model, loaded on first use, with
+    the cache and decoded-audio store this transcriber was configured with.
+    """
+
+    def __init__(self, client, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+
+    def load_audio(self, audio_file):
+        if self.client:
+            # The daemon decodes (or maps) the audio itself; shipping samples over HTTP would cost more
+            return None
+        return super().load_audio(audio_file)
+
+    def transcribe_audio(self, audio_file, language="tr", audio=None, chunk_workers=None, vad=False,
+                         progress=None, **decode_options):
+        if not self.client:
+            return super().transcribe_audio(audio_file, language, audio=audio, chunk_workers=chunk_workers,
+                                            vad=vad, progress=progress, **decode_options)
+        options = dict(decode_options, vad=vad)
+        if chunk_workers:
+            options['chunk_workers'] = chunk_workers
+        try:
+            return self.client.transcribe(audio_file, language, options, progress)
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            self.ui.display_error(f"Transcription daemon unavailable ({str(e)}), transcribing in-process")
+            self.client = None
+        except RuntimeError as e:
+            self.ui.display_error(f"An error occurred while transcribing: {str(e)}")
+            return None
+        return super().transcribe_audio(audio_file, language, audio=audio, chunk_workers=chunk_workers,
+                                        vad=vad, progress=progress, **decode_options)
+
+
+def connect_transcriber(backend_name=None, use_daemon=True, **kwargs):
+    """A RemoteTranscriber when a daemon with a matching backend is running, else a Transcriber.
+
+    `kwargs` (backend, cache, audio_store, realtime_factors, ...) configure the
+    transcriber; with a daemon they only apply if it has to fall back to in-process work.
+    """
+    client = DaemonClient.connect() if use_daemon else None
+    if client and (backend_name is None or client.health_info['backend']['backend'] == backend_name):
+        UserInterface.display_progress(f"Using the transcription daemon at {client.host}:{client.port}")
+        return RemoteTranscriber(client, **kwargs)
+    return Transcriber(**kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--address', default=None, help=f"host:port to listen on (default: ${DAEMON_ENV} "
+                                                        f"or {DEFAULT_ADDRESS})")
+    parser.add_argument('--backend', default=None, help="transcription backend (default: $TRANSCRIBE_BACKEND)")
+    args = parser.parse_args()
+    if args.address:
+        os.environ[DAEMON_ENV] = args.address
+
+    from backends import get_backend
+    from cache import TranscriptionCache, DecodedAudioStore
+    from progress import RealtimeFactorStore
+    ui = UserInterface()
+    transcriber = Transcriber(backend=get_backend(args.backend), cache=TranscriptionCache(),
+                              audio_store=DecodedAudioStore(), realtime_factors=RealtimeFactorStore())
+    ui.display_progress(f"Loading {transcriber.backend.cache_id}...")
+    transcriber.backend.load()
+    server = TranscriptionDaemon(transcriber)
+    host, port = server.server_address[:2]
+    ui.display_success(f"Transcription daemon ready on {host}:{port} "
+                       f"(model loaded in {transcriber.backend.load_time:.1f}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
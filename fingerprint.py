@@ -0,0 +1,439 @@
+"""Spectral audio fingerprints for spotting the same episode under another video id.
+
+    python fingerprint.py add ./video/*.mp3     # fingerprint already transcribed audio
+    python fingerprint.py match short.mp3        # which stored recording is this, and where
+
+Re-uploads, mirrors and clips cut from a full episode decode to audio that matches
+an earlier download at some time offset. Fingerprints are pairs of spectral peaks
+("landmarks"): each hash encodes two peak frequencies and the time between them,
+which survive re-encoding, volume changes and trimming. A new file whose hashes
+line up with a stored file at one consistent offset is that file, or a cut of it,
+and its transcript can be taken from the stored result instead of the model.
+
+Each recording is stored with the language and transcribe options its transcript
+was made with, and only matches a query made with the same ones.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import numpy as np
+import audio
+import transcript_store
+from writers import OUTPUT_SUFFIXES
+
+DEFAULT_INDEX = './cache/fingerprints.sqlite'
+
+# Fingerprints are taken at 8 kHz, where the speech formants and most music energy are
+FINGERPRINT_RATE = 8000
+N_FFT = 1024
+HOP = 256
+FRAME_SECONDS = HOP / FINGERPRINT_RATE
+# Peaks are looked for in this range (Hz), each the maximum of PEAK_BINS bins and
+# PEAK_FRAMES frames either side of it
+FREQUENCY_RANGE = (250, 3800)
+PEAK_BINS = 8
+PEAK_FRAMES = 8
+PEAKS_PER_SECOND = 8
+# Each peak is paired with this many following peaks, at most MAX_DT frames later
+FAN_OUT = 3
+MAX_DT = 255
+# Sub-hop framings tried when matching a new recording
+QUERY_SHIFTS = 4
+
+
+class Fingerprint:
+    """Landmark hashes of one recording and the frame each was anchored at.
+
+    Frames start `start` seconds into the recording (see query_fingerprints).
+    """
+
+    def __init__(self, hashes, times, duration, start=0.0):
+        self.hashes = hashes
+        self.times = times
+        self.duration = duration
+        self.start = start
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+def _local_max(values, radius, axis):
+    """Running maximum over `radius` neighbours either side along one axis.
+
+    Widens the window by doubling, so it costs O(log radius) passes instead of one
+    per neighbour.
+    """
+    values = np.swapaxes(values, 0, axis)
+    pad = np.full((radius,) + values.shape[1:], -np.inf, dtype=values.dtype)
+    result = np.concatenate([pad, values, pad])
+    width = 2 * radius + 1
+    span = 1
+    while span < width:
+        step = min(span, width - span)
+        result = np.maximum(result[:-step], result[step:])
+        span += step
+    return np.swapaxes(result, 0, axis)
+
+
+def _peaks(waveform, block_seconds=60.0):
+    """(frame, bin) of the strongest spectral peaks, about PEAKS_PER_SECOND per second.
+
+    A peak is the loudest point of its neighbourhood in time and frequency, so it sits
+    on the crest of a syllable or note and stays put when noise or a codec shifts the
+    levels around it.
+    """
+    window = np.hanning(N_FFT).astype(np.float32)
+    low, high = (int(round(hz * N_FFT / FINGERPRINT_RATE)) for hz in FREQUENCY_RANGE)
+    bucket = int(round(1.0 / FRAME_SECONDS))
+    block = int(block_seconds * FINGERPRINT_RATE) // (HOP * bucket) * (HOP * bucket)
+    frames_out, bins_out = [], []
+    # Blocks of whole seconds keep the spectrogram of a long recording out of memory;
+    # they overlap by PEAK_FRAMES so peaks near a boundary see their full neighbourhood
+    margin = PEAK_FRAMES * HOP
+    for start in range(0, max(len(waveform) - N_FFT + 1, 0), block):
+        first = max(start - margin, 0)
+        chunk = np.asarray(waveform[first:start + block + margin + N_FFT - HOP], dtype=np.float32)
+        count = (len(chunk) - N_FFT) // HOP + 1
+        if count <= 0:
+            break
+        frames = np.lib.stride_tricks.sliding_window_view(chunk, N_FFT)[::HOP][:count]
+        magnitude = np.log(np.abs(np.fft.rfft(frames * window, axis=1))[:, low:high] + 1e-6)
+        local = _local_max(_local_max(magnitude, PEAK_BINS, 1), PEAK_FRAMES, 0)
+        # Strength over the block's typical level; quiet peaks are mostly noise
+        strength = magnitude - np.median(magnitude)
+        frame, band_bin = np.nonzero((magnitude == local) & (strength > 1.0))
+        frame += first // HOP
+        inside = (frame >= start // HOP) & (frame < (start + block) // HOP)
+        frame, band_bin = frame[inside], band_bin[inside]
+        strength = strength[frame - first // HOP, band_bin]
+        # Keep the strongest PEAKS_PER_SECOND of every second
+        second = frame // bucket
+        order = np.lexsort((-strength, second))
+        rank = np.arange(len(order)) - np.searchsorted(second[order], second[order])
+        keep = order[rank < PEAKS_PER_SECOND]
+        keep = keep[np.lexsort((band_bin[keep], frame[keep]))]
+        frames_out.append(frame[keep])
+        bins_out.append(band_bin[keep] + low)
+    if not frames_out:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(frames_out).astype(np.int64), np.concatenate(bins_out).astype(np.int64)
+
+
+def _downsample(waveform):
+    """16 kHz -> 8 kHz by averaging sample pairs, a cheap low-pass that is enough here"""
+    even = len(waveform) // 2 * 2
+    pairs = np.asarray(waveform[:even], dtype=np.float32).reshape(-1, 2)
+    return pairs.mean(axis=1)
+
+
+def compute(waveform, sr=audio.SAMPLE_RATE, shift=0):
+    """Fingerprint of a 16 kHz mono waveform, framed from `shift` samples (at 8 kHz) in"""
+    if sr != 2 * FINGERPRINT_RATE:
+        raise ValueError(f"Fingerprints are computed from {2 * FINGERPRINT_RATE} Hz audio, not {sr} Hz")
+    duration = audio.audio_duration(waveform, sr)
+    start = shift / FINGERPRINT_RATE
+    frames, bins = _peaks(_downsample(waveform)[shift:])
+    hashes, times = [], []
+    for k in range(1, FAN_OUT + 1):
+        dt = frames[k:] - frames[:-k]
+        pair = (dt > 0) & (dt <= MAX_DT)
+        # 9 bits per frequency bin and 8 for the time difference
+        hashes.append((bins[:-k][pair] << 17) | (bins[k:][pair] << 8) | dt[pair])
+        times.append(frames[:-k][pair])
+    if not hashes or not sum(len(h) for h in hashes):
+        return Fingerprint(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), duration, start)
+    return Fingerprint(np.concatenate(hashes), np.concatenate(times), duration, start)
+
+
+def query_fingerprints(waveform, sr=audio.SAMPLE_RATE, shifts=QUERY_SHIFTS, first=None):
+    """Fingerprints of a waveform framed at `shifts` evenly spaced starts within one hop.
+
+    Two encodes of an episode rarely start on the same sample, and peaks found on
+    frames half a hop apart differ too often to match; one of the shifted framings
+    lines up with the stored one to within a fraction of a hop. Generated lazily,
+    unshifted first (`first`, if it was already computed), so a match on an early
+    framing saves computing the rest.
+    """
+    yield first if first is not None else compute(waveform, sr)
+    for k in range(1, shifts):
+        yield compute(waveform, sr, shift=k * HOP // shifts)
+
+
+class Match:
+    """A stored recording that a new one matched, and where in it the new one starts"""
+
+    def __init__(self, audio_file, duration, offset, votes, score):
+        self.audio_file = audio_file
+        self.duration = duration
+        self.offset = offset
+        self.votes = votes
+        self.score = score
+
+    def contains(self, duration, tolerance=2.0):
+        """Whether a recording of `duration` seconds at this offset lies inside the stored one"""
+        return self.offset >= -tolerance and self.offset + duration <= self.duration + tolerance
+
+    def summary(self):
+        return {
+            'audio_file': self.audio_file,
+            'offset': round(self.offset, 3),
+            'votes': self.votes,
+            'score': round(self.score, 4),
+        }
+
+
+def _encode_options(options):
+    """Transcribe options as stored; unset ones (vad=False, chunk_workers=None) are left out"""
+    return json.dumps({key: value for key, value in (options or {}).items() if value}, sort_keys=True,
+                      default=str)
+
+
+class FingerprintIndex:
+    """SQLite inverted index from landmark hash to the recordings and times it occurs at.
+
+    A query samples up to `max_query` of a recording's hashes, looks them up and
+    votes for (recording, time offset) pairs; a real match piles its votes on one
+    offset while chance hits scatter. It matches when at least `min_votes` votes and
+    a `min_score` share of the sampled hashes agree.
+    """
+
+    def __init__(self, db_path=DEFAULT_INDEX, min_votes=20, min_score=0.1, max_query=5000):
+        self.db_path = db_path
+        self.min_votes = min_votes
+        self.min_score = min_score
+        self.max_query = max_query
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS recordings (
+                    id INTEGER PRIMARY KEY,
+                    audio_file TEXT UNIQUE NOT NULL,
+                    duration REAL NOT NULL,
+                    hashes INTEGER NOT NULL,
+                    added_at REAL NOT NULL,
+                    language TEXT,
+                    options TEXT
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS landmarks (
+                    hash INTEGER NOT NULL,
+                    recording INTEGER NOT NULL,
+                    frame INTEGER NOT NULL,
+                    PRIMARY KEY (hash, recording, frame)
+                ) WITHOUT ROWID
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(recordings)")}
+            if 'language' not in columns:
+                # Indexes from before settings were recorded; their recordings match no language
+                self._conn.execute("ALTER TABLE recordings ADD COLUMN language TEXT")
+                self._conn.execute("ALTER TABLE recordings ADD COLUMN options TEXT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add(self, audio_file, fingerprint, language=None, options=None):
+        """Store a recording's fingerprint, replacing any earlier one for the same file.
+
+        `language` and `options` are what its transcript was made with.
+        """
+        audio_file = os.path.abspath(audio_file)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id FROM recordings WHERE audio_file = ?", (audio_file,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM landmarks WHERE recording = ?", (row[0],))
+                self._conn.execute("DELETE FROM recordings WHERE id = ?", (row[0],))
+            recording = self._conn.execute(
+                "INSERT INTO recordings (audio_file, duration, hashes, added_at, language, options) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (audio_file, fingerprint.duration, len(fingerprint), time.time(), language,
+                 _encode_options(options))).lastrowid
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO landmarks (hash, recording, frame) VALUES (?, ?, ?)",
+                zip(fingerprint.hashes.tolist(), [recording] * len(fingerprint), fingerprint.times.tolist()))
+
+    def _vote(self, fingerprint, batch, skip=None, allowed=None):
+        """(votes, sampled hashes, recording, frame offset) of the best-agreeing recording"""
+        step = max(len(fingerprint) // self.max_query, 1)
+        hashes = fingerprint.hashes[::step]
+        positions = {}
+        for h, t in zip(hashes.tolist(), fingerprint.times[::step].tolist()):
+            positions.setdefault(h, []).append(t)
+        keys = list(positions)
+        recordings, offsets = [], []
+        with self._lock:
+            for i in range(0, len(keys), batch):
+                chunk = keys[i:i + batch]
+                rows = self._conn.execute(
+                    f"SELECT hash, recording, frame FROM landmarks WHERE hash IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                for h, recording, frame in rows:
+                    if recording == skip or (allowed is not None and recording not in allowed):
+                        continue
+                    for t in positions[h]:
+                        recordings.append(recording)
+                        offsets.append(frame - t)
+        if not recordings:
+            return None
+        recordings = np.array(recordings)
+        offsets = np.array(offsets)
+        best = None
+        for recording in np.unique(recordings):
+            found = offsets[recordings == recording]
+            low = found.min()
+            votes = np.bincount(found - low)
+            # A peak can land a frame early or late between two encodes, so each offset
+            # is counted with its neighbours, then pinned to the busiest of the three
+            smoothed = np.convolve(votes, np.ones(3, dtype=int), mode='same')
+            peak = int(np.argmax(smoothed))
+            around = votes[max(peak - 1, 0):peak + 2]
+            peak = max(peak - 1, 0) + int(np.argmax(around))
+            if best is None or smoothed.max() > best[0]:
+                best = (int(smoothed.max()), len(hashes), int(recording), int(low + peak))
+        return best
+
+    def match(self, fingerprints, exclude=None, batch=500, language=None, options=None):
+        """Match for one or more framings of a recording (see query_fingerprints), or None.
+
+        Framings are tried in turn until one clears the thresholds. `exclude` skips a
+        file's own earlier entry. With a `language`, only recordings transcribed in it
+        with the same transcribe `options` can match.
+        """
+        if isinstance(fingerprints, Fingerprint):
+            fingerprints = [fingerprints]
+        skip = None
+        if exclude:
+            with self._lock:
+                row = self._conn.execute("SELECT id FROM recordings WHERE audio_file = ?",
+                                         (os.path.abspath(exclude),)).fetchone()
+            skip = row[0] if row else None
+        allowed = None
+        if language is not None:
+            with self._lock:
+                allowed = {row[0] for row in self._conn.execute(
+                    "SELECT id FROM recordings WHERE language = ? AND options = ?",
+                    (language, _encode_options(options)))}
+            if not allowed:
+                return None
+        best = None
+        for fingerprint in fingerprints:
+            if not len(fingerprint):
+                continue
+            found = self._vote(fingerprint, batch, skip, allowed)
+            if found is None:
+                continue
+            votes, sampled, recording, offset = found
+            # Hashes repeat within a recording, so votes can outnumber the sample
+            score = min(votes / sampled, 1.0)
+            if best is None or score > best[1]:
+                best = (votes, score, recording, offset * FRAME_SECONDS - fingerprint.start)
+            if votes >= self.min_votes and score >= self.min_score:
+                break
+        if best is None:
+            return None
+        votes, score, recording, offset = best
+        if votes < self.min_votes or score < self.min_score:
+            return None
+        with self._lock:
+            audio_file, duration = self._conn.execute(
+                "SELECT audio_file, duration FROM recordings WHERE id = ?", (recording,)).fetchone()
+        return Match(audio_file, duration, offset, votes, score)
+
+    def stats(self):
+        with self._lock:
+            recordings, hashes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hashes), 0) FROM recordings").fetchone()
+        return {'recordings': recordings, 'hashes': hashes}
+
+
+def reuse_transcript(match, duration):
+    """The matched recording's stored result cut to this recording's span and shifted
+    onto its timeline, or None if that result is not available or does not cover it"""
+    if not match.contains(duration):
+        return None
+    base = os.path.splitext(match.audio_file)[0]
+    result = transcript_store.result_file_for(match.audio_file)
+    # Transcribed before results were kept: a store packed from its JSON output, or the JSON
+    packed = base + transcript_store.STORE_SUFFIX
+    if os.path.exists(result):
+        stored = transcript_store.load(result)
+    elif os.path.exists(packed):
+        stored = transcript_store.load(packed)
+    else:
+        source = base + OUTPUT_SUFFIXES['json']
+        if not os.path.exists(source):
+            return None
+        with open(source, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    if isinstance(stored, list):
+        stored = {'segments': stored}
+    segments = []
+    for segment in stored.get('segments', []):
+        start = segment['start'] - match.offset
+        end = segment['end'] - match.offset
+        # A segment belongs to the clip if most of it falls inside
+        if (start + end) / 2 < 0 or (start + end) / 2 >= duration:
+            continue
+        shifted = dict(segment)
+        shifted['id'] = len(segments)
+        shifted['start'] = round(max(start, 0.0), 3)
+        shifted['end'] = round(min(end, duration), 3)
+        if 'seek' in shifted:
+            shifted['seek'] = max(int(round(shifted['seek'] - match.offset * 100)), 0)
+        segments.append(shifted)
+    result = {key: value for key, value in stored.items() if key not in ('segments', 'text')}
+    result.update({
+        'text': ''.join(segment.get('text', '') for segment in segments),
+        'segments': segments,
+        'reused_from': match.summary(),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['add', 'match'])
+    parser.add_argument('paths', nargs='+', help="audio files")
+    parser.add_argument('--index', default=DEFAULT_INDEX, help=f"index database (default: {DEFAULT_INDEX})")
+    parser.add_argument('-l', '--language', default='tr',
+                        help="language the added files were transcribed in, with default options (default: tr)")
+    args = parser.parse_args()
+
+    index = FingerprintIndex(args.index)
+    failed = 0
+    try:
+        for path in args.paths:
+            try:
+                waveform = audio.load_audio(path)
+                if args.command == 'add':
+                    fingerprint = compute(waveform)
+                    index.add(path, fingerprint, args.language)
+                    print(f"{path}: {len(fingerprint)} hashes")
+                    continue
+                match = index.match(query_fingerprints(waveform), exclude=path)
+            except (OSError, RuntimeError, ValueError) as e:
+                print(f"Error: {path}: {str(e)}")
+                failed += 1
+                continue
+            if match is None:
+                print(f"{path}: no match")
+            else:
+                print(f"{path}: {match.audio_file} from {match.offset:.2f}s "
+                      f"(votes {match.votes}, score {match.score:.2f})")
+        stats = index.stats()
+        print(f"Index holds {stats['recordings']} recordings, {stats['hashes']} hashes")
+    finally:
+        index.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,26 @@
 import os
 import csv
 
+# Output format menu choices mapped to the formats they produce
+FORMAT_CHOICES = {
+    '1': ['txt'],
+    '2': ['srt'],
+    '3': ['json'],
+    '4': ['txt', 'srt', 'json'],
+    '5': ['ndjson'],
+    '6': ['vtt'],
+}
+
+def iter_csv_rows(file_path):
+    """Stream the rows of a manifest CSV that have a URL in the third column, header skipped"""
+    with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)  # Skip header row
+        for row in reader:
+            if len(row) >= 3 and row[2]:
+                yield row
+
+
 class UserInterface:
     @staticmethod
     def get_audio_source():
@@ -33,10 +53,7 @@ class UserInterface:
     @staticmethod
     def read_csv_file(file_path):
         try:
-            with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                next(reader)  # Skip header row
-                return [row for row in reader if len(row) >= 3 and row[2]]
+            return list(iter_csv_rows(file_path))
         except Exception as e:
             print(f"Error reading CSV file: {str(e)}")
             return None
@@ -61,10 +78,11 @@ class UserInterface:
     @staticmethod
     def get_output_format():
         while True:
-            choice = input("Choose output format - '1' for Text, '2' for SRT, '3' for JSON, '4' for All formats: ")
-            if choice in ['1', '2', '3', '4']:
+            choice = input("Choose output format - '1' for Text, '2' for SRT, '3' for JSON, '4' for All formats, "
+                           "'5' for NDJSON, '6' for WebVTT: ")
+            if choice in FORMAT_CHOICES:
                 return choice
-            print("Invalid choice. Please enter '1', '2', '3', or '4'.")
+            print("Invalid choice. Please enter '1', '2', '3', '4', '5' or '6'.")
     
     @staticmethod
     def get_language():
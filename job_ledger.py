@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+import time
+from audio_downloader import extract_video_id, video_id_from_filename
+from writers import output_file_for
+
+LEDGER_FILENAME = '.transcribe_jobs.sqlite'
+
+# Job states in the order a URL moves through them; 'failed' can follow any of them
+PENDING = 'pending'
+DOWNLOADED = 'downloaded'
+TRANSCRIBED = 'transcribed'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobLedger:
+    """Durable per-URL record of batch progress, kept in SQLite next to the outputs.
+
+    Every state change is committed immediately, so after a crash a rerun of the same
+    manifest knows which URLs are finished, which audio files are already on disk and
+    which URLs failed and should be retried.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    url TEXT PRIMARY KEY,
+                    video_id TEXT,
+                    status TEXT NOT NULL,
+                    audio_file TEXT,
+                    formats TEXT NOT NULL DEFAULT '',
+                    language TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if 'language' not in columns:
+                # Ledgers from before languages were recorded; their rows match no language
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN language TEXT")
+
+    @classmethod
+    def for_output_dir(cls, output_path):
+        os.makedirs(output_path, exist_ok=True)
+        return cls(os.path.join(output_path, LEDGER_FILENAME))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def _update(self, url, **fields):
+        fields['updated_at'] = time.time()
+        columns = ', '.join(fields)
+        placeholders = ', '.join('?' for _ in fields)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO jobs (url, {columns}) VALUES (?, {placeholders}) "
+                f"ON CONFLICT(url) DO UPDATE SET {updates}",
+                (url, *fields.values()))
+
+    def start(self, url):
+        """Record an attempt at a URL, keeping whatever progress it already has"""
+        job = self.get(url)
+        status = job['status'] if job and job['status'] != FAILED else PENDING
+        if job and job['status'] == FAILED and job['audio_file'] and os.path.exists(job['audio_file']):
+            status = DOWNLOADED
+        self._update(url, status=status, video_id=extract_video_id(url) or (job or {}).get('video_id'),
+                     attempts=(job['attempts'] if job else 0) + 1, error=None)
+
+    def mark_downloaded(self, url, audio_file):
+        self._update(url, status=DOWNLOADED, audio_file=audio_file,
+                     video_id=video_id_from_filename(audio_file) or extract_video_id(url))
+
+    def mark_transcribed(self, url):
+        self._update(url, status=TRANSCRIBED)
+
+    def mark_written(self, url, formats, language=None):
+        job = self.get(url) or {}
+        written = set(formats)
+        # Formats written earlier in another language are stale once this one is written
+        if job.get('status') == DONE and job.get('language') == language:
+            written |= set(filter(None, (job.get('formats') or '').split(',')))
+        self._update(url, status=DONE, formats=','.join(sorted(written)), language=language)
+
+    def mark_failed(self, url, error):
+        self._update(url, status=FAILED, error=error)
+
+    def downloaded_file(self, url):
+        """Audio file from an earlier run that is still on disk, or None"""
+        job = self.get(url)
+        if job and job['status'] != PENDING and job['audio_file'] and os.path.exists(job['audio_file']):
+            return job['audio_file']
+        return None
+
+    def is_done(self, url, formats, language=None):
+        """True if every requested format was written for this URL in `language` and is still on disk"""
+        job = self.get(url)
+        if not job or job['status'] != DONE or not job['audio_file'] or job['language'] != language:
+            return False
+        written = set(job['formats'].split(','))
+        return all(fmt in written and os.path.exists(output_file_for(job['audio_file'], fmt))
+                   for fmt in formats)
+
+    def summary(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
@@ -0,0 +1,250 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import audio_downloader
+import profiling
+from pipeline import BatchPipeline
+from job_ledger import JobLedger
+from progress import describe, format_clock
+from utils import set_default_mode
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class JobError(Exception):
+    """A job failed for a reason worth showing to the user as-is"""
+
+
+class Job:
+    def __init__(self, kind, params, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Queued"
+        # Estimated seconds left, when there is a basis for one
+        self.eta = None
+        # Hot-function summary when the job ran with profiling on
+        self.profile = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Text of each output file of a finished file job, for download buttons; only kept
+        # in memory, so jobs loaded from disk have none
+        self.contents = None
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATES
+
+    @property
+    def elapsed(self):
+        if not self.started_at:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self):
+        data = dict(self.__dict__)
+        data.pop('contents', None)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data['kind'], data['params'], data['id'])
+        job.__dict__.update(data)
+        return job
+
+
+def transcribe_file_job(transcriber, job, report):
+    """Transcribe one local file or YouTube URL and save the requested formats"""
+    params = job.params
+    output_path = params.get('output_path') or './video/'
+    os.makedirs(output_path, exist_ok=True)
+    if params.get('url'):
+        report(0.05, "⬇️ Downloading YouTube video...")
+        audio_file = audio_downloader.download_audio(params['url'], output_path)
+        if not audio_file:
+            raise JobError("Failed to download YouTube video.")
+    else:
+        audio_file = params['file_path']
+        # Copy file to output directory if it's not already there
+        output_file_path = os.path.join(output_path, os.path.basename(audio_file))
+        if os.path.abspath(audio_file) != os.path.abspath(output_file_path):
+            shutil.copy2(audio_file, output_file_path)
+            audio_file = output_file_path
+
+    label = f"🎯 Transcribing audio (Language: {params.get('language_name', params['language'])})"
+    report(0.3, f"{label}...")
+
+    def progress(event):
+        # Transcription covers 30-90% of the bar
+        report(0.3 + 0.6 * event['fraction'], f"{label}: {describe(event)}", event['eta'])
+
+    result = transcriber.transcribe_audio(audio_file, language=params['language'], progress=progress,
+                                          **params.get('transcribe_options', {}))
+    if not result:
+        raise JobError("Transcription failed.")
+
+    report(0.9, "💾 Saving output files...")
+    contents = {}
+    saved = transcriber.save_outputs(result, audio_file, params['formats'], contents=contents)
+    if len(saved) < len(params['formats']):
+        raise JobError("Saving output files failed.")
+    job.contents = contents
+    return {'text': result['text'], 'outputs': saved, 'output_path': os.path.dirname(audio_file)}
+
+
+def batch_job(transcriber, job, report):
+    """Run a list of URLs through the batch pipeline"""
+    params = job.params
+    urls = params['urls']
+    output_path = params.get('output_path') or './video/'
+    ledger = JobLedger.for_output_dir(output_path)
+    finished = [0]
+
+    def queue_message(text):
+        eta = pipeline.queue_eta()
+        if eta is not None:
+            text += f" · queue ETA {format_clock(eta)}"
+        return text, eta
+
+    def on_progress(item, event):
+        message, eta = queue_message(f"🎯 URL {item.index + 1}/{len(urls)}: {describe(event)}")
+        report((finished[0] + event['fraction']) / len(urls), message, eta)
+
+    try:
+        pipeline = BatchPipeline(transcriber, language=params['language'], formats=params['formats'],
+                                 output_path=output_path, ledger=ledger,
+                                 transcribe_options=params.get('transcribe_options'),
+                                 audio_format=params.get('audio_format', 'mp3'), on_progress=on_progress)
+        for i, item in enumerate(pipeline.run(urls)):
+            finished[0] = i + 1
+            message, eta = queue_message(f"🎯 Processed URL {i + 1}/{len(urls)}: {item.url}")
+            report((i + 1) / len(urls), message, eta)
+    finally:
+        ledger.close()
+    return {
+        'successful': pipeline.successful,
+        'failed': pipeline.failed,
+        'skipped': pipeline.skipped,
+        'output_path': output_path,
+    }
+
+
+JOB_KINDS = {
+    'file': transcribe_file_job,
+    'batch': batch_job,
+}
+
+
+class JobExecutor:
+    """Runs transcription jobs on background threads, outside any Streamlit script run.
+
+    Jobs are submitted by kind and polled by id. Every state change is written to
+    `jobs_dir` as JSON, so status and results outlive reruns, browser refreshes and
+    sessions. Jobs that were queued or running when a previous process died are
+    marked failed on startup. Up to `workers` jobs run at once; they share one
+    transcriber, whose backend serialises model access while downloads carry on.
+    """
+
+    def __init__(self, transcriber, jobs_dir='./cache/jobs', workers=2):
+        self.transcriber = transcriber
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._recover()
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        fd, tmp_path = tempfile.mkstemp(dir=self.jobs_dir, suffix='.tmp')
+        set_default_mode(fd)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(job.id))
+
+    def _load(self, job_id):
+        try:
+            with open(self._path(job_id), 'r', encoding='utf-8') as f:
+                return Job.from_dict(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _recover(self):
+        for job in self.list_jobs():
+            if job.active:
+                job.status = FAILED
+                job.error = "Interrupted by an application restart"
+                job.finished_at = time.time()
+                self._save(job)
+
+    def submit(self, kind, params):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job = Job(kind, params)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._save(job)
+        self._pool.submit(self._run, job)
+        return job.id
+
+    def _run(self, job):
+        def report(progress, message, eta=None):
+            job.progress = min(progress, 1.0)
+            job.message = message
+            job.eta = eta
+            self._save(job)
+
+        job.status = RUNNING
+        job.started_at = time.time()
+        report(0.0, "Starting...")
+        try:
+            job.result = JOB_KINDS[job.kind](self.transcriber, job, report)
+            job.status = DONE
+            job.progress = 1.0
+            job.message = "Completed"
+        except JobError as e:
+            job.status = FAILED
+            job.error = str(e)
+        except Exception as e:
+            job.status = FAILED
+            job.error = f"Unexpected error: {str(e)}"
+        job.eta = None
+        job.finished_at = time.time()
+        profiler = profiling.active()
+        if profiler:
+            job.profile = profiler.summary()
+        self._save(job)
+        self.transcriber.metrics.export()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job or self._load(job_id)
+
+    def list_jobs(self, limit=None):
+        """Most recent jobs first, including those from earlier sessions"""
+        jobs = []
+        for name in os.listdir(self.jobs_dir):
+            if name.endswith('.json'):
+                job = self.get(name[:-len('.json')])
+                if job:
+                    jobs.append(job)
+        jobs.sort(key=lambda job: job.created_at, reverse=True)
+        return jobs[:limit] if limit else jobs
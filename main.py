@@ -1,6 +1,25 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import audio
 import audio_downloader
-from transcription import Transcriber
-from interface import UserInterface
+import speakers
+from daemon import connect_transcriber
+from backends import BACKENDS, get_backend
+from writers import OUTPUT_SUFFIXES
+from cache import TranscriptionCache, DecodedAudioStore
+from interface import UserInterface, FORMAT_CHOICES, iter_csv_rows
+from pipeline import BatchPipeline
+from job_ledger import JobLedger
+from work_queue import WorkQueue, default_worker_id
+from scheduler import plan_batch, actual_makespan
+from search_index import SearchIndex
+from fingerprint import FingerprintIndex
+import profiling
+from progress import RealtimeFactorStore, describe, format_clock
 
 
 def get_audio_file(ui):
@@ -21,7 +40,16 @@ def process_single_file(ui, transcriber, audio_file, output_format='4', language
 
     # Transcribe audio
     ui.display_progress(f"Transcribing audio (Language: {'Turkish' if language == 'tr' else 'English'})...")
-    transcription_result = transcriber.transcribe_audio(audio_file, language=language)
+    reported = set()
+
+    def progress(event):
+        # Once per tenth of the audio is plenty on a terminal
+        decile = int(event['fraction'] * 10)
+        if decile not in reported:
+            reported.add(decile)
+            ui.display_progress(f"Transcribed {describe(event)}")
+
+    transcription_result = transcriber.transcribe_audio(audio_file, language=language, progress=progress)
     if not transcription_result:
         ui.display_error("Transcription failed.")
         return
@@ -30,19 +58,275 @@ def process_single_file(ui, transcriber, audio_file, output_format='4', language
     ui.display_transcript(transcription_result['text'])
 
     # Save transcripts based on chosen format
-    if output_format in ['1', '4']:  # Text or All
-        transcriber.save_transcript(transcription_result, audio_file)
-    
-    if output_format in ['2', '4']:  # SRT or All
-        transcriber.save_srt(transcription_result['segments'], audio_file)
-    
-    if output_format in ['3', '4']:  # JSON or All
-        transcriber.save_json(transcription_result, audio_file)
+    transcriber.save_outputs(transcription_result, audio_file, FORMAT_CHOICES[output_format])
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Transcribe YouTube URLs and local audio files without prompts. "
+                    "Run with no arguments for the interactive mode.")
+    parser.add_argument('inputs', nargs='*', help="YouTube URLs or local audio files")
+    parser.add_argument('-m', '--manifest', action='append', default=[],
+                        help="CSV file with URLs in the third column and optionally a language code "
+                             "in the fourth (repeatable)")
+    parser.add_argument('-l', '--language', default='tr', help="language code, e.g. tr or en (default: tr)")
+    parser.add_argument('-f', '--formats', default='txt,srt,json',
+                        help=f"comma-separated output formats from: {', '.join(OUTPUT_SUFFIXES)} "
+                             f"(default: txt,srt,json)")
+    parser.add_argument('-o', '--output-dir', default='./video/', help="downloads and transcripts go here")
+    parser.add_argument('-w', '--workers', type=int, default=2, help="concurrent downloads (default: 2)")
+    parser.add_argument('--transcribe-workers', type=int, default=1,
+                        help="concurrent transcriptions; only useful with a thread-safe backend (default: 1)")
+    parser.add_argument('--no-schedule', action='store_true',
+                        help="keep input order instead of probing durations and running longest first")
+    parser.add_argument('--queue-size', type=int, default=2,
+                        help="decoded files allowed to wait between stages (default: 2)")
+    parser.add_argument('--audio-format', choices=audio_downloader.AUDIO_FORMATS, default='mp3')
+    parser.add_argument('--backend', choices=list(BACKENDS),
+                        help="transcription backend (default: $TRANSCRIBE_BACKEND, then mlx)")
+    parser.add_argument('--chunk-workers', type=int, default=None,
+                        help="transcribe each file in parallel chunks with this many processes")
+    parser.add_argument('--vad', action='store_true', help="skip music and silence before transcribing")
+    parser.add_argument('--stream', type=float, nargs='?', const=30.0, default=None, metavar='SECONDS',
+                        help="decode and transcribe in windows of SECONDS (default: 30) straight into the "
+                             "outputs, in constant memory, for very long recordings")
+    parser.add_argument('--rttm-dir', metavar='DIR',
+                        help="attribute segments to speakers from DIR/<audio name>.rttm where one exists")
+    parser.add_argument('--speakers', type=int, metavar='N',
+                        help="attribute segments to N speakers found by the local stand-in diarizer")
+    parser.add_argument('--coalesce', action='store_true',
+                        help="with speakers, merge adjacent segments by the same speaker")
+    parser.add_argument('--no-cache', action='store_true', help="do not reuse or store cached transcriptions")
+    parser.add_argument('--no-index', action='store_true',
+                        help="do not add JSON transcripts to the search index (see search_index.py)")
+    parser.add_argument('--no-fingerprint', action='store_true',
+                        help="transcribe every file, even ones whose audio matches an earlier transcript "
+                             "(see fingerprint.py)")
+    parser.add_argument('--summary', help="also write the JSON summary to this file")
+    parser.add_argument('--profile', metavar='DIR', help="write per-stage profiles to DIR")
+    parser.add_argument('--no-daemon', action='store_true',
+                        help="transcribe in this process even if the transcription daemon is running")
+    shared = parser.add_argument_group("shared work queue", "spread one backlog over several processes or hosts")
+    shared.add_argument('--queue', metavar='DB',
+                        help="work queue database (default: .transcribe_queue.sqlite in the output dir)")
+    shared.add_argument('--ingest', action='store_true',
+                        help="add the inputs to the work queue, deduplicated by video id, and exit")
+    shared.add_argument('--worker', action='store_true', help="transcribe items claimed from the work queue")
+    shared.add_argument('--worker-id', help="name of this worker in the queue (default: host-pid-random)")
+    shared.add_argument('--lease-seconds', type=float, default=1800,
+                        help="how long a claim lasts without a heartbeat (default: 1800)")
+    args = parser.parse_args(argv)
+    args.formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in args.formats if fmt not in OUTPUT_SUFFIXES]
+    if unknown or not args.formats:
+        parser.error(f"unknown output format(s): {', '.join(unknown) or '(none)'}")
+    if args.ingest and args.worker:
+        parser.error("--ingest and --worker are separate steps")
+    if args.stream is not None and (args.vad or args.chunk_workers):
+        parser.error("--stream cannot be combined with --vad or --chunk-workers")
+    if args.stream is not None and args.stream <= 0:
+        parser.error("--stream needs a positive window length")
+    if args.rttm_dir and args.speakers:
+        parser.error("--rttm-dir and --speakers are alternatives")
+    if args.stream is not None and (args.rttm_dir or args.speakers):
+        parser.error("--stream writes outputs before speakers could be attributed")
+    if not args.worker and not args.inputs and not args.manifest:
+        parser.error("give at least one URL, file or --manifest")
+    return args
+
+
+def iter_inputs(args):
+    """(source, language or None) for URLs and files from the command line, then from
+    each manifest as it is read"""
+    for source in args.inputs:
+        yield source, None
+    for manifest in args.manifest:
+        for row in iter_csv_rows(manifest):
+            yield row[2], (row[3].strip() if len(row) > 3 else '') or None
+
+
+def collect_inputs(ui, args):
+    """Sources in order and without repeats, and the languages set for some of them"""
+    try:
+        languages = {}
+        for source, language in iter_inputs(args):
+            if source.strip():
+                languages.setdefault(source.strip(), language)
+    except Exception as e:
+        ui.display_error(f"Error reading manifest: {str(e)}")
+        return None, None
+    return list(languages), {source: language for source, language in languages.items() if language}
+
+
+def open_work_queue(args):
+    if args.queue:
+        return WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+    return WorkQueue.for_output_dir(args.output_dir, lease_seconds=args.lease_seconds)
+
+
+def run_ingest(args):
+    """Stream inputs into the shared work queue; returns the process exit code"""
+    ui = UserInterface()
+    work = open_work_queue(args)
+    try:
+        added = work.ingest(iter_inputs(args))
+    except Exception as e:
+        ui.display_error(f"Error ingesting inputs: {str(e)}")
+        return 2
+    finally:
+        summary = work.summary()
+        work.close()
+    print(json.dumps({'added': added, 'queue': summary}))
+    return 0
 
 
-def main():
+def run_headless(args):
+    """Run a batch from command-line arguments; returns the process exit code"""
     ui = UserInterface()
-    transcriber = Transcriber()
+    profiler = profiling.enable(args.profile) if args.profile else profiling.enable_from_env()
+    os.makedirs(args.output_dir, exist_ok=True)
+    work = None
+    leases = {}
+    languages = {}
+    if args.worker:
+        work = open_work_queue(args)
+        worker_id = args.worker_id or default_worker_id()
+
+        def claimed():
+            # Items are leased one at a time, as the download stage has room for them
+            for lease in work.claims(worker_id):
+                leases[lease['url']] = lease['key']
+                # The pipeline reads an item's language as it takes the URL
+                if lease['language']:
+                    languages[lease['url']] = lease['language']
+                yield lease['url']
+
+        sources = claimed()
+    else:
+        sources, languages = collect_inputs(ui, args)
+        if sources is None:
+            return 2
+    # Streaming feeds the model window by window in this process, so the daemon is not used
+    transcriber = connect_transcriber(backend_name=args.backend,
+                                      use_daemon=not args.no_daemon and args.stream is None,
+                                      backend=get_backend(args.backend),
+                                      cache=None if args.no_cache else TranscriptionCache(),
+                                      audio_store=DecodedAudioStore(),
+                                      realtime_factors=RealtimeFactorStore(),
+                                      search_index=None if args.no_index else SearchIndex())
+    transcribe_options = {'vad': args.vad}
+    if args.chunk_workers:
+        transcribe_options['chunk_workers'] = args.chunk_workers
+
+    speaker_turns = None
+    if args.rttm_dir:
+        def speaker_turns(audio_file):
+            rttm = os.path.join(args.rttm_dir, os.path.splitext(os.path.basename(audio_file))[0] + '.rttm')
+            return speakers.parse_rttm(rttm) if os.path.isfile(rttm) else None
+    elif args.speakers:
+        def speaker_turns(audio_file):
+            return speakers.stand_in_turns(audio.load_audio(audio_file), args.speakers)
+
+    # Workers share an output dir, possibly across hosts; the queue tracks their progress instead
+    ledger = None if work else JobLedger.for_output_dir(args.output_dir)
+    engine = audio_downloader.DownloadEngine(args.output_dir, audio_format=args.audio_format,
+                                             metrics=transcriber.metrics)
+
+    def fetch(source):
+        if not os.path.isfile(source):
+            return engine.download(source)
+        # Local files are copied next to the downloads so all outputs land in one place
+        target = os.path.join(args.output_dir, os.path.basename(source))
+        if os.path.abspath(source) != os.path.abspath(target):
+            shutil.copy2(source, target)
+        return target
+
+    start = time.time()
+    heartbeat = work.keep_alive(worker_id) if work else None
+    failures = []
+    finished = []
+    plan = None
+    audio_seconds = 0.0
+    stage_seconds = {}
+    try:
+        with engine:
+            if not work and not args.no_schedule and len(sources) > 1:
+                plan = plan_batch(sources, engine, transcriber, args.transcribe_workers, languages,
+                                  args.language, probe_workers=max(args.workers, 4))
+                sources = plan.order
+            pipeline = BatchPipeline(transcriber, language=args.language, formats=args.formats,
+                                     output_path=args.output_dir, downloader=fetch,
+                                     queue_size=args.queue_size, download_workers=args.workers,
+                                     ledger=ledger, transcribe_options=transcribe_options,
+                                     transcribe_workers=args.transcribe_workers, stream_window=args.stream,
+                                     speaker_turns=speaker_turns, coalesce_speakers=args.coalesce,
+                                     fingerprints=None if args.no_fingerprint else FingerprintIndex())
+            for item in pipeline.run(sources, languages):
+                finished.append(item)
+                if work:
+                    if item.ok:
+                        work.complete(leases.pop(item.url), worker_id, {'audio_file': item.audio_file})
+                    else:
+                        work.fail(leases.pop(item.url), worker_id, item.error)
+                if not item.ok:
+                    failures.append({'input': item.url, 'error': item.error})
+                    continue
+                if item.skipped:
+                    continue
+                audio_seconds += item.duration or 0.0
+                for stage, seconds in item.timings.items():
+                    stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+    finally:
+        if ledger:
+            ledger.close()
+        if heartbeat:
+            heartbeat.set()
+    wall = time.time() - start
+
+    summary = {
+        'inputs': pipeline.successful + pipeline.failed + pipeline.skipped,
+        'successful': pipeline.successful,
+        'failed': pipeline.failed,
+        'skipped': pipeline.skipped,
+        'reused': sum(1 for item in finished if item.ok and item.result and 'reused_from' in item.result),
+        'wall_seconds': round(wall, 3),
+        'audio_seconds': round(audio_seconds, 3),
+        'files_per_hour': round(pipeline.successful * 3600 / wall, 2) if wall else None,
+        'end_to_end_realtime_factor': round(wall / audio_seconds, 4) if audio_seconds else None,
+        'stage_seconds': {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
+        'backend': transcriber.backend.stats(),
+        'output_dir': args.output_dir,
+        'failures': failures,
+    }
+    if plan:
+        summary['schedule'] = plan.summary(actual_makespan(finished))
+        predicted, actual = summary['schedule']['predicted_makespan'], summary['schedule']['actual_makespan']
+        if predicted is not None and actual is not None:
+            ui.display_progress(f"Transcription makespan: predicted {format_clock(predicted)}, "
+                                f"actual {format_clock(actual)}")
+    if work:
+        summary['worker_id'] = worker_id
+        summary['queue'] = work.summary()
+        work.close()
+    if profiler:
+        summary['profile_dir'] = profiler.output_dir
+        print(profiler.summary(), file=sys.stderr)
+    summary['metrics_dir'] = transcriber.metrics.export()
+    encoded = json.dumps(summary, ensure_ascii=False, default=str)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(encoded + '\n')
+    # The summary is the last line on stdout so callers can parse it after the progress output
+    print(encoded)
+    return 1 if failures else 0
+
+
+def interactive():
+    ui = UserInterface()
+    # TRANSCRIBE_PROFILE=<dir> writes per-stage profiles and prints the hottest functions
+    profiler = profiling.enable_from_env()
+    transcriber = connect_transcriber(cache=TranscriptionCache(), audio_store=DecodedAudioStore(),
+                                      realtime_factors=RealtimeFactorStore(), search_index=SearchIndex())
 
     audio_source = get_audio_file(ui)
     if not audio_source:
@@ -62,19 +346,44 @@ def main():
             ui.display_error("Failed to read CSV file.")
             return
         
-        for row in csv_data:
-            if len(row) >= 3:
-                video_url = row[2]
-                ui.display_progress(f"Processing URL: {video_url}")
-                audio_file = audio_downloader.download_audio(video_url)
-                if audio_file:
-                    process_single_file(ui, transcriber, audio_file, output_format, language)
-                else:
-                    ui.display_error(f"Failed to download audio for URL: {video_url}")
+        # Downloads overlap with transcription of the previous episode
+        urls = [row[2] for row in csv_data if len(row) >= 3]
+        # The ledger lets a rerun of the same CSV skip finished URLs
+        ledger = JobLedger.for_output_dir('./video/')
+        pipeline = BatchPipeline(transcriber, language=language,
+                                 formats=FORMAT_CHOICES[output_format], ledger=ledger)
+        for item in pipeline.run(urls):
+            if item.ok and not item.skipped:
+                ui.display_transcript(item.result['text'])
+            ui.display_progress(f"Queue depths: {pipeline.queue_depths()}")
+            eta = pipeline.queue_eta()
+            if eta is not None:
+                ui.display_progress(f"Estimated time for the rest of the queue: {format_clock(eta)}")
+        ledger.close()
+        ui.display_success(f"Processed {pipeline.successful} files successfully, {pipeline.failed} failed, "
+                           f"{pipeline.skipped} already done.")
     else:
         # Single file processing
         process_single_file(ui, transcriber, audio_source, output_format, language)
 
+    if profiler:
+        print(profiler.summary())
+
+    metrics_dir = transcriber.metrics.export()
+    if metrics_dir:
+        ui.display_progress(f"Metrics written to {metrics_dir}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        interactive()
+        return 0
+    args = parse_args(argv)
+    if args.ingest:
+        return run_ingest(args)
+    return run_headless(args)
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from utils import set_default_mode
+
+# Upper bounds in seconds, from quick file writes up to hour-long transcriptions
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set, e.g. bytes downloaded or failures by cause"""
+
+    type = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(key, {'value': value}) for key, value in self._values.items()]
+
+    def prometheus_lines(self):
+        return [f"{self.name}{_format_labels(key)} {_format_number(data['value'])}"
+                for key, data in self.samples()]
+
+
+class Histogram:
+    """Distribution of observed values per label set, with cumulative buckets"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            samples = []
+            for key, series in self._values.items():
+                cumulative, total = [], 0
+                for count in series['counts']:
+                    total += count
+                    cumulative.append(total)
+                samples.append((key, {'buckets': dict(zip(map(_format_number, self.buckets), cumulative)),
+                                      'sum': series['sum'], 'count': series['count']}))
+            return samples
+
+    def prometheus_lines(self):
+        lines = []
+        for key, data in self.samples():
+            for bound, count in data['buckets'].items():
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_number(data['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {data['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named counters and histograms shared by every stage of a process.
+
+    Metrics are created on first use and looked up by name afterwards, so each module
+    declares what it records where it records it. The registry exports as JSON lines
+    (one snapshot per export, appended) and as a Prometheus text-format file that a
+    node_exporter textfile collector or any other scraper can read.
+    """
+
+    def __init__(self, prefix='transcribe_'):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name, help_text=''):
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name, help_text='', buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def snapshot(self):
+        """Every series as a JSON-serialisable dict"""
+        timestamp = time.time()
+        records = []
+        for metric in self.metrics():
+            for key, data in metric.samples():
+                records.append(dict(data, name=metric.name, type=metric.type, labels=dict(key),
+                                    timestamp=timestamp))
+        return records
+
+    def to_prometheus(self):
+        lines = []
+        for metric in self.metrics():
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.prometheus_lines())
+        return '\n'.join(lines) + '\n'
+
+    def write_jsonl(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in self.snapshot():
+                f.write(json.dumps(record) + '\n')
+
+    def write_prometheus(self, path):
+        # Scrapers must never read a half-written file
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        set_default_mode(fd)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def export(self, directory=None):
+        """Append a snapshot to metrics.jsonl and rewrite metrics.prom in `directory`.
+
+        The directory defaults to $TRANSCRIBE_METRICS_DIR, then ./cache/metrics.
+        """
+        directory = directory or os.environ.get('TRANSCRIBE_METRICS_DIR', './cache/metrics')
+        try:
+            self.write_jsonl(os.path.join(directory, 'metrics.jsonl'))
+            self.write_prometheus(os.path.join(directory, 'metrics.prom'))
+        except OSError:
+            # Metrics must never fail a transcription run
+            return None
+        return directory
+
+
+# Process-wide registry used unless a component is given its own
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,343 @@
+import queue
+import threading
+import time
+import audio
+import audio_downloader
+import fingerprint
+import speakers
+from interface import UserInterface
+
+# Marks the end of the work stream on a stage queue
+_DONE = object()
+
+
+class BatchItem:
+    """One URL moving through the batch pipeline"""
+
+    def __init__(self, index, url, language=None):
+        self.index = index
+        self.url = url
+        # Overrides the pipeline's language for this item
+        self.language = language
+        self.audio_file = None
+        self.audio = None
+        self.result = None
+        self.error = None
+        self.skipped = False
+        self.timings = {}
+        # (start, end) wall-clock time of each stage
+        self.spans = {}
+        # Audio length once decoded and seconds of it transcribed so far, for ETAs
+        self.duration = None
+        self.transcribed_seconds = 0.0
+        # Spectral fingerprint of the decoded audio, stored once the item is written
+        self.fingerprint = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BatchPipeline:
+    """Staged download -> decode -> transcribe -> write pipeline for batch runs.
+
+    Each stage runs in its own thread(s) and hands items to the next stage through a
+    bounded queue, so episode N+1 is downloading while episode N is transcribing while
+    at most `queue_size` decoded waveforms wait in memory between any two stages.
+
+    Several `transcribe_workers` only pay off with a thread-safe backend or one that
+    hands work elsewhere (chunk processes, the daemon); others serialise on the model.
+
+    `on_progress(item, event)` is called from the transcribe stage with the progress
+    events of the item being transcribed.
+
+    With `stream_window` (seconds) set, items are not decoded up front: the transcribe
+    stage streams each file window by window straight into its outputs, so memory
+    does not grow with recording length, and the write stage only records the result.
+
+    `speaker_turns(audio_file)` may return speaker turns (see speakers.py) for an item,
+    or None; the write stage then attributes every segment to a speaker, merging runs
+    by the same speaker if `coalesce_speakers` is set. Streamed items are written
+    before it could, so they are left as they are.
+
+    With a `fingerprints` index (see fingerprint.py) every decoded item is
+    fingerprinted; one that matches audio transcribed before in the same language
+    and with the same transcribe options, or a stretch of it, gets that transcript
+    shifted onto its own timeline instead of a model run, and the fingerprint of
+    every written item is added to the index with its language and options. Streamed
+    items are never decoded whole, so they are not fingerprinted.
+    """
+
+    STAGES = ('download', 'decode', 'transcribe', 'write')
+
+    def __init__(self, transcriber, language='tr', formats=('txt', 'srt', 'json'),
+                 output_path='./video/', downloader=None, decoder=None, queue_size=2,
+                 download_workers=2, ledger=None, transcribe_options=None, audio_format='mp3',
+                 on_progress=None, metrics=None, transcribe_workers=1, stream_window=None,
+                 speaker_turns=None, coalesce_speakers=False, fingerprints=None):
+        self.ui = UserInterface()
+        self.metrics = metrics or transcriber.metrics
+        self.on_progress = on_progress
+        self.ledger = ledger
+        self.transcribe_options = transcribe_options or {}
+        self.transcriber = transcriber
+        self.language = language
+        self.formats = list(formats)
+        self._engine = None
+        if downloader is None:
+            # One YoutubeDL per download worker, with retries for transient errors
+            self._engine = audio_downloader.DownloadEngine(output_path, audio_format=audio_format,
+                                                           metrics=self.metrics)
+            downloader = self._engine.download
+        self.downloader = downloader
+        self.decoder = decoder or transcriber.load_audio
+        self.download_workers = download_workers
+        self.transcribe_workers = transcribe_workers
+        self.stream_window = stream_window
+        self.speaker_turns = speaker_turns
+        self.coalesce_speakers = coalesce_speakers
+        self.fingerprints = fingerprints
+        self.queues = {
+            'download': queue.Queue(),
+            'decode': queue.Queue(maxsize=queue_size),
+            'transcribe': queue.Queue(maxsize=queue_size),
+            'write': queue.Queue(maxsize=queue_size),
+        }
+        self.done = queue.Queue()
+        self.successful = 0
+        self.failed = 0
+        self.skipped = 0
+        self._threads = []
+        # Queues the end marker has been put on
+        self._ended = set()
+        self._items = []
+        self._languages = {}
+
+    def queue_depths(self):
+        """Number of items waiting in front of each stage"""
+        # Once put on a queue, the end marker stays there for sibling workers
+        return {stage: max(q.qsize() - (q in self._ended), 0) for stage, q in self.queues.items()}
+
+    def queue_eta(self):
+        """Estimated seconds until every queued item is transcribed, or None without a basis.
+
+        Items not decoded yet are assumed to be as long as the average decoded one.
+        """
+        factor = self.transcriber.expected_realtime_factor()
+        known = [item.duration for item in self._items if item.duration]
+        if factor is None or not known:
+            return None
+        average = sum(known) / len(known)
+        remaining = 0.0
+        for item in self._items:
+            if item.skipped or not item.ok or item.result:
+                continue
+            if item.duration is None:
+                remaining += average
+            else:
+                remaining += max(item.duration - item.transcribed_seconds, 0.0)
+        workers = self.transcribe_workers if self.transcriber.backend.thread_safe else 1
+        return remaining * factor / workers
+
+    def run(self, urls, languages=None):
+        """Run the batch, yielding each item in the calling thread as it finishes.
+
+        `languages` optionally maps a URL to the language it should be transcribed in.
+        """
+        self.start(urls, languages)
+        while True:
+            item = self.done.get()
+            if item is _DONE:
+                break
+            outcome = 'skipped' if item.skipped else 'ok' if item.ok else 'failed'
+            self.metrics.counter('pipeline_items_total', "Batch items by outcome").inc(outcome=outcome)
+            if item.skipped:
+                self.skipped += 1
+            elif item.ok:
+                self.successful += 1
+            else:
+                self.failed += 1
+                if self.ledger:
+                    self.ledger.mark_failed(item.url, item.error)
+            yield item
+        for thread in self._threads:
+            thread.join()
+        if self._engine:
+            self._engine.close()
+
+    def start(self, urls, languages=None):
+        """Start every stage; `urls` may be a list or a lazy iterable such as queue leases"""
+        # Kept as given: a lazy `urls` may fill in languages as it yields
+        self._languages = languages if languages is not None else {}
+        if hasattr(urls, '__len__'):
+            self._feed(urls)
+        else:
+            # Lazily produced work is only pulled as downloaders free up, so nothing is
+            # taken (or leased) long before it can be started
+            self.queues['download'] = queue.Queue(maxsize=self.download_workers)
+            thread = threading.Thread(target=self._feed, args=(urls,), name='pipeline-feed', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        self._spawn('download', self._download, self.queues['download'], self.queues['decode'],
+                    self.download_workers)
+        self._spawn('decode', self._decode, self.queues['decode'], self.queues['transcribe'])
+        self._spawn('transcribe', self._transcribe, self.queues['transcribe'], self.queues['write'],
+                    self.transcribe_workers)
+        self._spawn('write', self._write, self.queues['write'], self.done)
+
+    def _feed(self, urls):
+        try:
+            for index, url in enumerate(urls):
+                item = BatchItem(index, url, self._languages.get(url))
+                self._items.append(item)
+                self.queues['download'].put(item)
+        except Exception as e:
+            self.ui.display_error(f"Reading the batch input failed: {str(e)}")
+        finally:
+            self._end(self.queues['download'])
+
+    def _end(self, q):
+        self._ended.add(q)
+        q.put(_DONE)
+
+    def _spawn(self, stage, func, in_q, out_q, workers=1):
+        remaining = [workers]
+        lock = threading.Lock()
+        stage_seconds = self.metrics.histogram('pipeline_stage_seconds', "Time per item in each pipeline stage")
+
+        def worker():
+            while True:
+                item = in_q.get()
+                if item is _DONE:
+                    # Let sibling workers see the marker; the last one forwards it downstream
+                    in_q.put(_DONE)
+                    with lock:
+                        remaining[0] -= 1
+                        last = remaining[0] == 0
+                    if last:
+                        self._end(out_q)
+                    return
+                if item.ok and not item.skipped:
+                    start = time.time()
+                    try:
+                        func(item)
+                    except Exception as e:
+                        item.error = f"{stage} failed: {str(e)}"
+                        self.metrics.counter('failures_total', "Failures by stage and cause").inc(
+                            stage=stage, cause=type(e).__name__)
+                    item.spans[stage] = (start, time.time())
+                    item.timings[stage] = item.spans[stage][1] - start
+                    stage_seconds.observe(item.timings[stage], stage=stage)
+                    if not item.ok:
+                        self.ui.display_error(f"{item.error} ({item.url})")
+                out_q.put(item)
+
+        for _ in range(workers):
+            thread = threading.Thread(target=worker, name=f"pipeline-{stage}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _download(self, item):
+        if self.ledger:
+            if self.ledger.is_done(item.url, self.formats, item.language or self.language):
+                self.ui.display_progress(f"Already transcribed, skipping: {item.url}")
+                item.audio_file = self.ledger.get(item.url)['audio_file']
+                item.skipped = True
+                return
+            self.ledger.start(item.url)
+            item.audio_file = self.ledger.downloaded_file(item.url)
+            if item.audio_file:
+                self.ui.display_progress(f"Reusing downloaded audio: {item.audio_file}")
+                return
+        self.ui.display_progress(f"Processing URL: {item.url}")
+        item.audio_file = self.downloader(item.url)
+        if not item.audio_file:
+            item.error = "download failed"
+        elif self.ledger:
+            self.ledger.mark_downloaded(item.url, item.audio_file)
+
+    def _decode(self, item):
+        if self.stream_window:
+            item.duration = audio.probe_duration(item.audio_file)
+            return
+        item.audio = self.decoder(item.audio_file)
+        if item.audio is not None:
+            item.duration = audio.audio_duration(item.audio)
+        if self.fingerprints:
+            self._reuse_matching(item)
+
+    def _reuse_matching(self, item):
+        """Fingerprint an item and take the transcript of matching audio if there is one"""
+        try:
+            # The daemon decodes for itself, so its items are only decoded here for the fingerprint
+            waveform = item.audio if item.audio is not None else audio.load_audio(item.audio_file)
+            item.fingerprint = fingerprint.compute(waveform)
+            item.duration = item.fingerprint.duration
+            match = self.fingerprints.match(fingerprint.query_fingerprints(waveform, first=item.fingerprint),
+                                            exclude=item.audio_file, language=item.language or self.language,
+                                            options=self.transcribe_options)
+            result = fingerprint.reuse_transcript(match, item.duration) if match else None
+        except Exception as e:
+            self.ui.display_error(f"Fingerprinting {item.audio_file} failed, transcribing it: {str(e)}")
+            return
+        if match and not result:
+            self.ui.display_progress(f"{item.audio_file} overlaps {match.audio_file} but is not contained in "
+                                     f"its transcript; transcribing it")
+        if result:
+            self.ui.display_progress(f"{item.audio_file} matches {match.audio_file} from {match.offset:.1f}s "
+                                     f"(score {match.score:.2f}); reusing its transcript")
+            self.metrics.counter('fingerprint_reuses_total', "Transcripts reused from matching audio").inc()
+            item.result = result
+            item.audio = None
+
+    def _transcribe(self, item):
+        def progress(event):
+            item.transcribed_seconds = event['decoded']
+            if self.on_progress:
+                self.on_progress(item, event)
+
+        if self.stream_window:
+            options = {key: value for key, value in self.transcribe_options.items()
+                       if key not in ('vad', 'chunk_workers')}
+            item.result = self.transcriber.stream_outputs(item.audio_file, item.audio_file, self.formats,
+                                                          language=item.language or self.language,
+                                                          window_seconds=self.stream_window,
+                                                          progress=progress, **options)
+            if not item.result:
+                item.error = "transcription failed"
+            elif self.ledger:
+                self.ledger.mark_transcribed(item.url)
+            return
+        if item.result:
+            # Taken from matching audio at decode time
+            if self.ledger:
+                self.ledger.mark_transcribed(item.url)
+            return
+        item.result = self.transcriber.transcribe_audio(item.audio_file,
+                                                        language=item.language or self.language,
+                                                        audio=item.audio, progress=progress,
+                                                        **self.transcribe_options)
+        # The waveform is no longer needed once the model has seen it
+        item.audio = None
+        if not item.result:
+            item.error = "transcription failed"
+        elif self.ledger:
+            self.ledger.mark_transcribed(item.url)
+
+    def _write(self, item):
+        if self.stream_window:
+            written = item.result['outputs']
+        else:
+            result = item.result
+            turns = self.speaker_turns(item.audio_file) if self.speaker_turns else None
+            if turns is not None:
+                result = speakers.merge(result, turns, self.coalesce_speakers)
+            written = self.transcriber.save_outputs(result, item.audio_file, self.formats)
+        if self.ledger and written:
+            self.ledger.mark_written(item.url, written, item.language or self.language)
+        if len(written) < len(self.formats):
+            item.error = "saving outputs failed"
+        elif item.fingerprint is not None:
+            self.fingerprints.add(item.audio_file, item.fingerprint, item.language or self.language,
+                                  self.transcribe_options)
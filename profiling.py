@@ -0,0 +1,201 @@
+import collections
+import contextlib
+import io
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+
+# Set to an output directory (or 1 for ./cache/profiles) to profile every stage
+PROFILE_ENV = 'TRANSCRIBE_PROFILE'
+DEFAULT_PROFILE_DIR = './cache/profiles'
+
+# Shared no-op context for when profiling is off; it is reusable and costs one call
+_DISABLED = contextlib.nullcontext()
+
+_profiler = None
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into counts per stack.
+
+    Stacks are tuples of (file, first line, function) from the outermost frame in.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.started = self.stopped = None
+        self._stopped = threading.Event()
+
+    @property
+    def seconds_per_sample(self):
+        """Wall time each sample stands for; waits for the GIL stretch the nominal interval"""
+        samples = sum(self.counts.values())
+        if not samples or self.started is None or self.stopped is None:
+            return self.interval
+        return (self.stopped - self.started) / samples
+
+    def run(self):
+        self.started = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.counts[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.stopped = time.perf_counter()
+
+
+def _sampled_stats(counts, seconds_per_sample):
+    """pstats-format stats built from sampled stacks.
+
+    Each sample stands for `seconds_per_sample`: own time for the innermost function,
+    cumulative time for every function on the stack. Call counts are sample counts.
+    """
+    stats = {}
+    for stack, count in counts.items():
+        seconds = count * seconds_per_sample
+        seen = set()
+        for depth, function in enumerate(stack):
+            entry = stats.setdefault(function, [0, 0, 0.0, 0.0, {}])
+            leaf = seconds if depth == len(stack) - 1 else 0.0
+            entry[2] += leaf
+            # A recursive function is on the stack more than once but ran for one sample
+            if function not in seen:
+                seen.add(function)
+                entry[0] += count
+                entry[1] += count
+                entry[3] += seconds
+            if depth:
+                edge = entry[4].setdefault(stack[depth - 1], [0, 0, 0.0, 0.0])
+                edge[0] += count
+                edge[1] += count
+                edge[2] += leaf
+                edge[3] += seconds
+    return {function: (cc, nc, tt, ct, {caller: tuple(edge) for caller, edge in callers.items()})
+            for function, (cc, nc, tt, ct, callers) in stats.items()}
+
+
+def _folded_name(function):
+    filename, line, name = function
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class Profiler:
+    """Profiles pipeline stages one file at a time.
+
+    Each stage run writes `<stage>/<n>-<file>.prof` (stats readable with pstats or
+    snakeviz) and `<stage>/<n>-<file>.folded` (collapsed stacks for flamegraph.pl or
+    speedscope) under `output_dir`. A stage entered while the same thread is already
+    inside one is folded into the outer profile.
+
+    Both come from sampling the stage's own thread. cProfile cannot be used per stage:
+    from Python 3.12 it traces every thread in the interpreter, so a stage's profile
+    would take in whatever the other stages were doing, and only one can be active.
+    """
+
+    def __init__(self, output_dir=DEFAULT_PROFILE_DIR, sample_interval=0.005):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._stats_files = collections.defaultdict(list)
+
+    def _name(self, label):
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        base = os.path.basename(str(label).rstrip('/')) or 'run'
+        return f"{sequence:04d}-{re.sub(r'[^A-Za-z0-9._-]+', '_', base)[:80]}"
+
+    @contextlib.contextmanager
+    def stage(self, stage, label):
+        if getattr(self._local, 'active', False):
+            yield
+            return
+        self._local.active = True
+        sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            self._local.active = False
+            self._save(stage, label, sampler.counts, sampler.seconds_per_sample)
+
+    def _save(self, stage, label, counts, seconds_per_sample):
+        directory = os.path.join(self.output_dir, stage)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self._name(label))
+        if counts:
+            # The layout pstats.Stats loads, as cProfile's dump_stats writes it
+            with open(base + '.prof', 'wb') as f:
+                marshal.dump(_sampled_stats(counts, seconds_per_sample), f)
+            with self._lock:
+                self._stats_files[stage].append(base + '.prof')
+        folded = sorted((';'.join(_folded_name(function) for function in stack), count)
+                        for stack, count in counts.items())
+        with open(base + '.folded', 'w', encoding='utf-8') as f:
+            for stack, count in folded:
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, top=15):
+        """Hottest functions by own time for each stage profiled so far"""
+        out = io.StringIO()
+        with self._lock:
+            stats_files = {stage: list(paths) for stage, paths in self._stats_files.items()}
+        for stage, paths in sorted(stats_files.items()):
+            stats = pstats.Stats(*paths)
+            rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+            out.write(f"== {stage} ({len(paths)} runs, {stats.total_tt:.2f}s profiled) ==\n")
+            out.write(f"{'own s':>9} {'cum s':>9} {'samples':>9}  function\n")
+            for (filename, line, function), (_, calls, own, cumulative, _) in rows:
+                out.write(f"{own:>9.3f} {cumulative:>9.3f} {calls:>9}  "
+                          f"{function} ({os.path.basename(filename)}:{line})\n")
+        out.write(f"Profiles written to {self.output_dir}\n")
+        return out.getvalue()
+
+
+def enable(output_dir=DEFAULT_PROFILE_DIR, sample_interval=0.005):
+    """Start profiling every stage in this process; returns the profiler"""
+    global _profiler
+    _profiler = Profiler(output_dir, sample_interval)
+    return _profiler
+
+
+def disable():
+    global _profiler
+    _profiler = None
+
+
+def active():
+    return _profiler
+
+
+def stage(name, label):
+    """Context manager profiling one stage for one file, a no-op unless profiling is on"""
+    if _profiler is None:
+        return _DISABLED
+    return _profiler.stage(name, label)
+
+
+def enable_from_env():
+    """Turn profiling on when $TRANSCRIBE_PROFILE is set; returns the profiler or None"""
+    value = os.environ.get(PROFILE_ENV)
+    if not value or value == '0':
+        return None
+    return enable(DEFAULT_PROFILE_DIR if value == '1' else value)
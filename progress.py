@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from utils import set_default_mode
+
+
+def format_clock(seconds):
+    """H:MM:SS or M:SS for progress messages"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class RealtimeFactorStore:
+    """Rolling realtime factor (compute seconds per audio second) per backend and model.
+
+    Each finished transcription is folded into an exponentially weighted average that
+    is persisted as JSON, so ETAs are sensible from the first file of the next run.
+    """
+
+    def __init__(self, path='./cache/realtime_factors.json', alpha=0.3):
+        self.path = path
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._factors = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._factors = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def get(self, key):
+        with self._lock:
+            return self._factors.get(key)
+
+    def update(self, key, audio_seconds, compute_seconds):
+        if audio_seconds <= 0:
+            return self.get(key)
+        factor = compute_seconds / audio_seconds
+        with self._lock:
+            previous = self._factors.get(key)
+            if previous is not None:
+                factor = self.alpha * factor + (1 - self.alpha) * previous
+            self._factors[key] = factor
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            set_default_mode(fd)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._factors, f, indent=2)
+            os.replace(tmp_path, self.path)
+        return factor
+
+
+class ProgressTracker:
+    """Turns "decoded N of T audio seconds" updates into progress events with an ETA.
+
+    Until a tenth of the audio is done the ETA uses the stored realtime factor; after
+    that it uses the rate measured on this file. A total of 0 means the duration is
+    unknown and no ETA is given. Events reach `callback` at most once
+    every `min_interval` seconds, plus a final one at completion.
+    """
+
+    def __init__(self, total_seconds, callback, realtime_factor=None, min_interval=0.5):
+        self.total_seconds = total_seconds
+        self.callback = callback
+        self.realtime_factor = realtime_factor
+        self.min_interval = min_interval
+        self.decoded_seconds = 0.0
+        self.started_at = time.time()
+        self._last_emit = 0.0
+
+    def event(self):
+        elapsed = time.time() - self.started_at
+        fraction = min(self.decoded_seconds / self.total_seconds, 1.0) if self.total_seconds else 0.0
+        factor = self.realtime_factor
+        if fraction >= 0.1 and self.decoded_seconds:
+            factor = elapsed / self.decoded_seconds
+        remaining = max(self.total_seconds - self.decoded_seconds, 0.0)
+        return {
+            'decoded': self.decoded_seconds,
+            'total': self.total_seconds,
+            'fraction': fraction,
+            'elapsed': elapsed,
+            'realtime_factor': factor,
+            'eta': remaining * factor if factor is not None and self.total_seconds else None,
+        }
+
+    def update(self, decoded_seconds):
+        self.decoded_seconds = max(self.decoded_seconds, decoded_seconds)
+        now = time.time()
+        if now - self._last_emit >= self.min_interval:
+            self._last_emit = now
+            self.callback(self.event())
+
+    def finish(self):
+        self.decoded_seconds = self.total_seconds
+        self.callback(self.event())
+
+
+def describe(event):
+    """One-line progress message for an event"""
+    message = (f"{format_clock(event['decoded'])} / {format_clock(event['total'])} "
+               f"({event['fraction']:.0%})")
+    if event['eta'] is not None:
+        message += f", ETA {format_clock(event['eta'])}"
+    return message
@@ -0,0 +1,153 @@
+"""Regenerate output formats from stored transcription results, without the model.
+
+    python reexport.py ./video/ --formats srt,vtt       # every result below ./video/
+    python reexport.py ./video/episode.result.tstore -f txt     # one file
+
+Sources are the .result.tstore results kept next to each audio file; older
+transcripts are re-exported from a store packed from their JSON output, or from the
+_transcript.json itself. An output newer than its
+source is left alone, and one regenerated with identical content is only touched, so
+reruns over an archive rewrite nothing that has not changed.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import transcript_store
+from writers import OUTPUT_SUFFIXES, write_transcript
+from utils import hash_file
+from interface import UserInterface
+
+JSON_SUFFIX = OUTPUT_SUFFIXES['json']
+
+
+# Source kinds by preference: the full result, then a store packed from the JSON output, then that JSON
+_SOURCE_SUFFIXES = (transcript_store.RESULT_SUFFIX, transcript_store.STORE_SUFFIX, JSON_SUFFIX)
+
+
+def find_sources(paths):
+    """(source, base name) of every stored result under `paths`, the best kind for each base"""
+    sources = {}
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = (os.path.join(directory, name) for directory, _, names in os.walk(path)
+                          for name in sorted(names) if not name.startswith('.'))
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            for rank, suffix in enumerate(_SOURCE_SUFFIXES):
+                if candidate.endswith(suffix):
+                    base = candidate[:-len(suffix)]
+                    if base not in sources or rank < sources[base][0]:
+                        sources[base] = (rank, candidate)
+                    break
+    return [(source, base) for base, (_, source) in sorted(sources.items())]
+
+
+def _load(source):
+    if source.endswith(JSON_SUFFIX):
+        with open(source, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return transcript_store.load(source)
+
+
+def export(source, base, formats, force=False):
+    """Bring the given formats of one result up to date; returns {written, unchanged, current}"""
+    outcome = {'source': source, 'written': [], 'unchanged': [], 'current': []}
+    source_mtime = os.path.getmtime(source)
+    stale = []
+    for fmt in formats:
+        target = base + OUTPUT_SUFFIXES[fmt]
+        if os.path.abspath(target) == os.path.abspath(source):
+            # An _transcript.json source is its own JSON output
+            outcome['current'].append(fmt)
+        elif not force and os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+            outcome['current'].append(fmt)
+        else:
+            stale.append(fmt)
+    if not stale:
+        return outcome
+
+    transcript = _load(source)
+    if isinstance(transcript, list):
+        segments, text = transcript, None
+    else:
+        segments, text = transcript.get('segments', []), transcript.get('text')
+    directory = os.path.dirname(base) or '.'
+    # Written beside the targets, so each can be renamed into place
+    with tempfile.TemporaryDirectory(dir=directory, prefix='.reexport-') as scratch:
+        # The writer takes an audio file name and strips its extension; `base` has none left,
+        # and any dot in it belongs to the title
+        name = os.path.join(scratch, os.path.basename(base) + '.audio')
+        writer = write_transcript(segments, name, stale, text=text)
+        for fmt, path in writer.paths.items():
+            target = base + OUTPUT_SUFFIXES[fmt]
+            if os.path.exists(target) and hash_file(target) == hash_file(path):
+                os.utime(target)
+                outcome['unchanged'].append(fmt)
+            else:
+                os.replace(path, target)
+                outcome['written'].append(fmt)
+    return outcome
+
+
+def _export_task(task):
+    source, base, formats, force = task
+    try:
+        return export(source, base, formats, force)
+    except Exception as e:
+        return {'source': source, 'error': f"{type(e).__name__}: {str(e)}"}
+
+
+def reexport(paths, formats, workers=None, force=False, on_result=None):
+    """Re-export every result under `paths` across worker processes; returns totals"""
+    sources = find_sources(paths)
+    totals = {'sources': len(sources), 'written': 0, 'unchanged': 0, 'current': 0, 'failed': 0}
+    tasks = [(source, base, formats, force) for source, base in sources]
+    workers = max(min(workers or os.cpu_count() or 1, len(tasks)), 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for outcome in pool.map(_export_task, tasks, chunksize=max(len(tasks) // (workers * 8), 1)):
+            if 'error' in outcome:
+                totals['failed'] += 1
+            else:
+                for key in ('written', 'unchanged', 'current'):
+                    totals[key] += len(outcome[key])
+            if on_result:
+                on_result(outcome)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help=".tstore / _transcript.json files, or directories to search")
+    parser.add_argument('-f', '--formats', default='txt,srt,json',
+                        help=f"comma-separated formats from: {', '.join(OUTPUT_SUFFIXES)} (default: txt,srt,json)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument('--force', action='store_true', help="regenerate outputs even if they look up to date")
+    args = parser.parse_args()
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_SUFFIXES]
+    if unknown or not formats:
+        parser.error(f"unknown output format(s): {', '.join(unknown) or '(none)'}")
+
+    ui = UserInterface()
+
+    def report(outcome):
+        if 'error' in outcome:
+            ui.display_error(f"{outcome['source']}: {outcome['error']}")
+        elif outcome['written']:
+            ui.display_progress(f"{outcome['source']}: wrote {', '.join(outcome['written'])}")
+
+    start = time.time()
+    totals = reexport(args.paths, formats, args.workers, args.force, report)
+    ui.display_success(f"{totals['sources']} results in {time.time() - start:.1f}s: {totals['written']} outputs "
+                       f"written, {totals['unchanged']} unchanged, {totals['current']} already up to date, "
+                       f"{totals['failed']} failed")
+    return 1 if totals['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import heapq
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import audio
+from interface import UserInterface
+
+
+class BatchPlan:
+    """Order in which a batch should be fed to the pipeline, and what it is expected to take"""
+
+    def __init__(self, order, durations, languages, predicted_makespan, probe_seconds):
+        self.order = order
+        self.durations = durations
+        self.languages = languages
+        self.predicted_makespan = predicted_makespan
+        self.probe_seconds = probe_seconds
+
+    @property
+    def unknown(self):
+        return [url for url in self.order if self.durations.get(url) is None]
+
+    def summary(self, actual_makespan=None):
+        return {
+            'items': len(self.order),
+            'unknown_durations': len(self.unknown),
+            'audio_seconds': round(sum(d for d in self.durations.values() if d), 3),
+            'probe_seconds': round(self.probe_seconds, 3),
+            'predicted_makespan': round(self.predicted_makespan, 3) if self.predicted_makespan else None,
+            'actual_makespan': round(actual_makespan, 3) if actual_makespan is not None else None,
+        }
+
+
+def probe_durations(sources, engine, workers=8):
+    """Duration in seconds of each URL or local file, None where it cannot be told.
+
+    URLs are probed in parallel with the same yt-dlp extract_info call the download
+    makes, without downloading anything; local files are read with ffprobe.
+    """
+    def probe(source):
+        if os.path.isfile(source):
+            return audio.probe_duration(source)
+        info = engine.probe(source)
+        return info.get('duration') if info else None
+
+    with ThreadPoolExecutor(max_workers=max(min(workers, len(sources)), 1),
+                            thread_name_prefix='probe') as pool:
+        return dict(zip(sources, pool.map(probe, sources)))
+
+
+def simulate_makespan(costs, workers):
+    """Finish time of the last item when `workers` each take the next item as they free up"""
+    finish_times = [0.0] * max(workers, 1)
+    for cost in costs:
+        earliest = heapq.heappop(finish_times)
+        heapq.heappush(finish_times, earliest + cost)
+    return max(finish_times)
+
+
+def schedule(durations, languages, default_language):
+    """Longest-first order, one language group after another.
+
+    Each group shares a language and therefore decode settings, so settings change at
+    most once per group. Within a group, taking the longest item first is the LPT rule:
+    with workers pulling from a shared queue, no long item is left for the end while the
+    other workers sit idle. Items of unknown length count as the group's average.
+    """
+    groups = {}
+    for url in durations:
+        groups.setdefault(languages.get(url, default_language), []).append(url)
+    order = []
+    # Biggest groups first, so the long tail of the batch is the smallest group
+    known = [d for d in durations.values() if d]
+    fallback = sum(known) / len(known) if known else 0.0
+    length = {url: durations[url] if durations[url] else fallback for url in durations}
+    for _, urls in sorted(groups.items(), key=lambda group: -sum(length[url] for url in group[1])):
+        order.extend(sorted(urls, key=lambda url: -length[url]))
+    return order, length
+
+
+def plan_batch(sources, engine, transcriber, transcribe_workers=1, languages=None, default_language='tr',
+               probe_workers=8):
+    """Probe every source and return the BatchPlan the pipeline should follow"""
+    ui = UserInterface()
+    languages = languages or {}
+    ui.display_progress(f"Probing durations of {len(sources)} inputs...")
+    start = time.time()
+    durations = probe_durations(sources, engine, probe_workers)
+    probe_seconds = time.time() - start
+    order, length = schedule(durations, languages, default_language)
+
+    predicted = None
+    factor = transcriber.expected_realtime_factor()
+    if factor is not None:
+        # A backend that is not thread-safe runs one transcription at a time however many workers ask
+        workers = transcribe_workers if transcriber.backend.thread_safe else 1
+        predicted = simulate_makespan([length[url] * factor for url in order], workers)
+    plan = BatchPlan(order, durations, languages, predicted, probe_seconds)
+    unknown = len(plan.unknown)
+    ui.display_progress(f"Probed {len(sources) - unknown}/{len(sources)} durations in {probe_seconds:.1f}s"
+                        + (f"; predicted transcription makespan {predicted:.0f}s" if predicted else ""))
+    return plan
+
+
+def actual_makespan(items, stage='transcribe'):
+    """Seconds from the first item entering `stage` to the last one leaving it"""
+    spans = [item.spans[stage] for item in items if stage in item.spans]
+    if not spans:
+        return None
+    return max(end for _, end in spans) - min(start for start, _ in spans)
@@ -0,0 +1,260 @@
+"""Full-text search over the transcript archive, with segment timestamps.
+
+    python search_index.py --add ./video/             # index every _transcript.json below a directory
+    python search_index.py "Para Politikası Kurulu"    # search
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from datetime import timedelta
+from utils import format_timedelta, hash_file
+from writers import OUTPUT_SUFFIXES
+
+DEFAULT_INDEX = './cache/search.sqlite'
+
+# Every dotted and dotless i folds to plain i, whatever the casing, so "İstanbul",
+# "ISTANBUL", "istanbul" and "ıstanbul" all match; str.lower() would turn İ into two
+# characters and I into the English i
+_FOLD = {'İ': 'i', 'I': 'i', 'ı': 'i'}
+
+# Marks around matched terms, stripped out of the folded text to locate them in the original
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+
+
+def fold(text):
+    """Case- and diacritic-insensitive form of Turkish text, one character per character.
+
+    Keeping the length lets positions found in the folded text index the original.
+    """
+    folded = []
+    for char in text:
+        if char in _FOLD:
+            folded.append(_FOLD[char])
+            continue
+        lower = char.lower()
+        base = ''.join(c for c in unicodedata.normalize('NFKD', lower) if not unicodedata.combining(c))
+        folded.append(base if len(base) == 1 else lower if len(lower) == 1 else char)
+    return ''.join(folded)
+
+
+def episode_name(path):
+    name = os.path.basename(path)
+    suffix = OUTPUT_SUFFIXES['json']
+    return name[:-len(suffix)] if name.endswith(suffix) else os.path.splitext(name)[0]
+
+
+def _fts_query(query):
+    """Folded FTS5 query matching every word of `query`, or the exact phrase if it is quoted"""
+    query = fold(query).strip()
+    if len(query) > 2 and query[0] == query[-1] == '"':
+        terms = [query[1:-1]]
+    else:
+        terms = query.split()
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms if term.strip())
+
+
+class SearchIndex:
+    """SQLite FTS5 index of transcript segments, kept up to date one JSON file at a time.
+
+    Segments are indexed in Turkish-folded form and returned with their original text,
+    episode and start/end times. A file whose size and mtime (or, failing that, content
+    hash) have not changed since it was indexed is skipped, so re-indexing an archive
+    only reads what changed.
+    """
+
+    def __init__(self, db_path=DEFAULT_INDEX):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    episode TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    segments INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS segments (
+                    id INTEGER PRIMARY KEY,
+                    file_id INTEGER NOT NULL REFERENCES files (id),
+                    start REAL,
+                    end REAL,
+                    text TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS segments_file ON segments (file_id)")
+            try:
+                # rowid of each entry is the id of its row in segments
+                self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS segment_text USING fts5(folded)")
+            except sqlite3.OperationalError as e:
+                raise RuntimeError(f"This SQLite build has no FTS5 support: {str(e)}") from e
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def index_file(self, path):
+        """Add or refresh one transcript JSON file; returns False if it was already up to date"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT id, size, mtime, sha256 FROM files WHERE path = ?",
+                                     (path,)).fetchone()
+        if row and row['size'] == stat.st_size and row['mtime'] == stat.st_mtime:
+            return False
+        digest = hash_file(path)
+        if row and row['sha256'] == digest:
+            # Touched but not changed, e.g. rewritten with the same transcript
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE files SET mtime = ?, size = ? WHERE id = ?",
+                                   (stat.st_mtime, stat.st_size, row['id']))
+            return False
+        with open(path, 'r', encoding='utf-8') as f:
+            segments = json.load(f).get('segments', [])
+        with self._lock, self._conn:
+            if row:
+                self._delete(row['id'])
+            cursor = self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, episode, size, mtime, sha256, segments, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, episode_name(path), stat.st_size, stat.st_mtime, digest, len(segments), time.time()))
+            file_id = cursor.lastrowid
+            for segment in segments:
+                text = (segment.get('text') or '').strip()
+                if not text:
+                    continue
+                segment_id = self._conn.execute(
+                    "INSERT INTO segments (file_id, start, end, text) VALUES (?, ?, ?, ?)",
+                    (file_id, segment.get('start'), segment.get('end'), text)).lastrowid
+                self._conn.execute("INSERT INTO segment_text (rowid, folded) VALUES (?, ?)",
+                                   (segment_id, fold(text)))
+        return True
+
+    def _delete(self, file_id):
+        self._conn.execute("DELETE FROM segment_text WHERE rowid IN (SELECT id FROM segments WHERE file_id = ?)",
+                           (file_id,))
+        self._conn.execute("DELETE FROM segments WHERE file_id = ?", (file_id,))
+        self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def index_tree(self, root):
+        """Index every transcript JSON below `root`; returns (files indexed, files unchanged)"""
+        indexed = unchanged = 0
+        for directory, _, names in os.walk(root):
+            for name in sorted(names):
+                if name.endswith(OUTPUT_SUFFIXES['json']):
+                    if self.index_file(os.path.join(directory, name)):
+                        indexed += 1
+                    else:
+                        unchanged += 1
+        return indexed, unchanged
+
+    def prune(self):
+        """Drop files that no longer exist on disk; returns how many"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, path FROM files").fetchall()
+        gone = [row['id'] for row in rows if not os.path.exists(row['path'])]
+        with self._lock, self._conn:
+            for file_id in gone:
+                self._delete(file_id)
+        return len(gone)
+
+    def search(self, query, limit=20):
+        """Segments matching every word (or the quoted phrase) of `query`, best first, as dicts with
+        episode, path, start, end, text and snippet (matches wrapped in [ ])"""
+        match = _fts_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT files.episode, files.path, segments.start, segments.end, segments.text, "
+                "highlight(segment_text, 0, ?, ?) AS marked "
+                "FROM segment_text JOIN segments ON segments.id = segment_text.rowid "
+                "JOIN files ON files.id = segments.file_id "
+                "WHERE segment_text MATCH ? ORDER BY rank LIMIT ?",
+                (_MATCH_START, _MATCH_END, match, limit)).fetchall()
+        return [{
+            'episode': row['episode'],
+            'path': row['path'],
+            'start': row['start'],
+            'end': row['end'],
+            'text': row['text'],
+            'snippet': _snippet(row['text'], row['marked']),
+        } for row in rows]
+
+    def stats(self):
+        with self._lock:
+            files, segments = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(segments), 0) FROM files").fetchone()
+        return {'files': files, 'segments': segments}
+
+
+def _snippet(text, marked):
+    """Original text with the spans highlighted in its folded copy wrapped in [ ]"""
+    pieces = []
+    position = 0
+    inside = False
+    for char in marked:
+        if char == _MATCH_START or char == _MATCH_END:
+            inside = char == _MATCH_START
+            pieces.append('[' if inside else ']')
+            continue
+        pieces.append(text[position] if position < len(text) else char)
+        position += 1
+    return ''.join(pieces)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('query', nargs='*', help="words to search for")
+    parser.add_argument('--index', default=DEFAULT_INDEX, help=f"index database (default: {DEFAULT_INDEX})")
+    parser.add_argument('--add', metavar='DIR', action='append', default=[],
+                        help="index new and changed transcripts below DIR first (repeatable)")
+    parser.add_argument('--prune', action='store_true', help="forget transcripts deleted from disk")
+    parser.add_argument('-n', '--limit', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help="print hits as JSON lines")
+    args = parser.parse_args()
+    if not args.query and not args.add and not args.prune:
+        parser.error("give a query, --add or --prune")
+
+    index = SearchIndex(args.index)
+    try:
+        for root in args.add:
+            start = time.time()
+            indexed, unchanged = index.index_tree(root)
+            print(f"Indexed {indexed} transcripts from {root} ({unchanged} unchanged) "
+                  f"in {time.time() - start:.1f}s")
+        if args.prune:
+            print(f"Removed {index.prune()} deleted transcripts from the index")
+        if args.query:
+            start = time.time()
+            hits = index.search(' '.join(args.query), args.limit)
+            elapsed = time.time() - start
+            for hit in hits:
+                if args.json:
+                    print(json.dumps(hit, ensure_ascii=False))
+                    continue
+                start_time = format_timedelta(timedelta(seconds=hit['start'] or 0))
+                end_time = format_timedelta(timedelta(seconds=hit['end'] or 0))
+                print(f"{hit['episode']}  {start_time} --> {end_time}  {hit['snippet']}")
+            if not args.json:
+                print(f"{len(hits)} hits in {elapsed * 1000:.1f} ms")
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
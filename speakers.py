@@ -0,0 +1,250 @@
+"""Speaker attribution: merge transcript segments with a speaker-turn timeline.
+
+    python speakers.py episode_transcript.json --rttm episode.rttm --coalesce
+    python speakers.py episode_transcript.json --audio episode.mp3 --speakers 2 \\
+        --name SPEAKER_00="Sinan Akgunay" --name SPEAKER_01="Haluk Bürümcekçi"
+
+Writes episode_merged_transcript.json (and any other --formats) with a "speaker" on
+every segment, null where no speaker was talking, as in merged_transcript.json.
+"""
+import argparse
+import heapq
+import json
+import os
+import sys
+import numpy as np
+import audio
+import vad
+import writers
+from interface import UserInterface
+
+
+class Turn:
+    """One stretch of time a speaker was talking"""
+
+    __slots__ = ('start', 'end', 'speaker')
+
+    def __init__(self, start, end, speaker):
+        self.start = start
+        self.end = end
+        self.speaker = speaker
+
+    def __repr__(self):
+        return f"Turn({self.start:.2f}, {self.end:.2f}, {self.speaker!r})"
+
+
+def parse_rttm(path, names=None):
+    """Speaker turns from an RTTM file, sorted by start; `names` renames speaker labels"""
+    names = names or {}
+    turns = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0] != 'SPEAKER':
+                continue
+            try:
+                start, duration = float(fields[3]), float(fields[4])
+                label = fields[7]
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"{path}:{number}: malformed RTTM line") from e
+            if duration > 0:
+                turns.append(Turn(start, start + duration, names.get(label, label)))
+    turns.sort(key=lambda turn: turn.start)
+    return turns
+
+
+def write_rttm(turns, path, file_id=None):
+    file_id = file_id or os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'w', encoding='utf-8') as f:
+        for turn in turns:
+            f.write(f"SPEAKER {file_id} 1 {turn.start:.3f} {turn.end - turn.start:.3f} <NA> <NA> "
+                    f"{turn.speaker.replace(' ', '_')} <NA> <NA>\n")
+
+
+def _voice_profiles(waveform, regions, sr=audio.SAMPLE_RATE, frame_seconds=0.032, bands=24, max_frames=200):
+    """Mean log band energies of each region, a rough timbre signature per stretch of speech"""
+    frame = int(frame_seconds * sr)
+    edges = np.geomspace(80, 4000, bands + 1)
+    freqs = np.fft.rfftfreq(frame, 1.0 / sr)
+    band_of = np.clip(np.searchsorted(edges, freqs) - 1, -1, bands)
+    usable = (band_of >= 0) & (band_of < bands)
+    window = np.hanning(frame).astype(np.float32)
+    profiles = np.zeros((len(regions), bands))
+    for i, (start, end) in enumerate(regions):
+        count = (end - start) // frame
+        if count == 0:
+            continue
+        # Evenly spaced frames keep long regions from costing more than short ones
+        offsets = start + np.linspace(0, count - 1, min(count, max_frames)).astype(int) * frame
+        frames = np.stack([np.asarray(waveform[o:o + frame], dtype=np.float32) for o in offsets])
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        banded = np.zeros((len(frames), bands))
+        np.add.at(banded.T, band_of[usable], power[:, usable].T)
+        profiles[i] = np.log(banded + 1e-10).mean(axis=0)
+    return profiles
+
+
+def _kmeans(points, k, iterations=30):
+    """Labels of a small deterministic k-means (farthest-point initialisation)"""
+    centres = [points[0]]
+    for _ in range(1, k):
+        distance = np.min([((points - c) ** 2).sum(axis=1) for c in centres], axis=0)
+        centres.append(points[int(np.argmax(distance))])
+    centres = np.array(centres)
+    labels = np.zeros(len(points), dtype=int)
+    for _ in range(iterations):
+        labels = np.argmin(((points[:, None, :] - centres[None]) ** 2).sum(axis=2), axis=1)
+        updated = np.array([points[labels == j].mean(axis=0) if (labels == j).any() else centres[j]
+                            for j in range(k)])
+        if np.allclose(updated, centres):
+            break
+        centres = updated
+    return labels
+
+
+def stand_in_turns(waveform, speakers=2, sr=audio.SAMPLE_RATE):
+    """Speaker turns from a local stand-in for a diarization model.
+
+    Speech regions come from the voice activity detector and are clustered into
+    `speakers` voices by their average spectral shape. It needs no model and tells
+    apart voices that sound clearly different; an RTTM from a real diarizer is more
+    accurate. Labels are SPEAKER_00, SPEAKER_01, ... in order of first appearance.
+    """
+    regions = vad.detect_speech(waveform, sr=sr)
+    if not regions:
+        return []
+    profiles = _voice_profiles(waveform, regions, sr)
+    labels = _kmeans(profiles - profiles.mean(axis=0), min(speakers, len(regions)))
+    order = {}
+    for label in labels:
+        order.setdefault(label, len(order))
+    turns = []
+    for (start, end), label in zip(regions, labels):
+        speaker = f"SPEAKER_{order[label]:02d}"
+        if turns and turns[-1].speaker == speaker:
+            turns[-1].end = end / sr
+        else:
+            turns.append(Turn(start / sr, end / sr, speaker))
+    return turns
+
+
+def assign_speakers(segments, turns, min_overlap=0.0):
+    """Speaker with the most time overlapping each segment, None if no one overlaps it.
+
+    A sweep over segments and turns sorted by start keeps a heap of the turns still
+    open, so the cost is O((n + m) log m) plus the turns actually overlapping each
+    segment, rather than checking every turn against every segment. Turns may
+    overlap each other (crosstalk). Returns a list of speakers in segment order.
+    """
+    order = sorted(range(len(segments)), key=lambda i: segments[i]['start'])
+    turns = sorted(turns, key=lambda turn: turn.start)
+    speakers = [None] * len(segments)
+    active = []
+    position = 0
+    for index in order:
+        start, end = segments[index]['start'], segments[index]['end']
+        while position < len(turns) and turns[position].start < end:
+            heapq.heappush(active, (turns[position].end, position))
+            position += 1
+        # Segments come in start order, so a turn over before this one starts is over for good
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        overlap = {}
+        # In start order, so on a tie the speaker who started talking first wins
+        for turn_index in sorted(turn_index for _, turn_index in active):
+            turn = turns[turn_index]
+            seconds = min(end, turn.end) - max(start, turn.start)
+            if seconds > 0:
+                overlap[turn.speaker] = overlap.get(turn.speaker, 0.0) + seconds
+        if overlap:
+            speaker, seconds = max(overlap.items(), key=lambda item: item[1])
+            if seconds > min_overlap:
+                speakers[index] = speaker
+    return speakers
+
+
+def coalesce(segments, max_gap=1.0, max_seconds=None):
+    """Merge runs of adjacent segments by the same speaker into one segment each.
+
+    Segments are merged while the pause between them is at most `max_gap` and the
+    merged segment stays within `max_seconds` (if given).
+    """
+    merged = []
+    for segment in segments:
+        previous = merged[-1] if merged else None
+        if (previous is not None and previous.get('speaker') == segment.get('speaker')
+                and segment['start'] - previous['end'] <= max_gap
+                and (max_seconds is None or segment['end'] - previous['start'] <= max_seconds)):
+            previous['end'] = segment['end']
+            previous['text'] = f"{previous['text'].rstrip()} {segment.get('text', '').strip()}"
+            continue
+        merged.append({
+            'id': len(merged),
+            'start': segment['start'],
+            'end': segment['end'],
+            'text': segment.get('text', '').strip(),
+            'speaker': segment.get('speaker'),
+        })
+    return merged
+
+
+def merge(result, turns, coalesce_segments=False, min_overlap=0.0, max_gap=1.0, max_seconds=None):
+    """Copy of a transcription result with a speaker on every segment"""
+    segments = result.get('segments', [])
+    speakers = assign_speakers(segments, turns, min_overlap)
+    attributed = [dict(segment, speaker=speaker) for segment, speaker in zip(segments, speakers)]
+    if coalesce_segments:
+        attributed = coalesce(attributed, max_gap, max_seconds)
+        # Coalesced text is stripped, so put the spaces back between segments
+        text = ' '.join(segment['text'] for segment in attributed)
+    else:
+        text = ''.join(segment.get('text', '') for segment in attributed)
+    return dict(result, segments=attributed, text=text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('transcript', help="transcript JSON written by save_json")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--rttm', help="speaker turns from a diarization run")
+    source.add_argument('--audio', help="audio file for the local stand-in diarizer")
+    parser.add_argument('--speakers', type=int, default=2, help="voices for the stand-in diarizer (default: 2)")
+    parser.add_argument('--name', action='append', default=[], metavar='LABEL=NAME',
+                        help="rename a speaker label, e.g. SPEAKER_00='Sinan Akgunay' (repeatable)")
+    parser.add_argument('--coalesce', action='store_true', help="merge adjacent segments by the same speaker")
+    parser.add_argument('--max-gap', type=float, default=1.0, help="longest pause bridged by --coalesce")
+    parser.add_argument('-f', '--formats', default='json', help="comma-separated output formats (default: json)")
+    parser.add_argument('--save-rttm', help="also write the turns used to this RTTM file")
+    args = parser.parse_args()
+
+    ui = UserInterface()
+    names = dict(name.split('=', 1) for name in args.name if '=' in name)
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    try:
+        with open(args.transcript, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        if args.rttm:
+            turns = parse_rttm(args.rttm, names)
+        else:
+            turns = stand_in_turns(audio.load_audio(args.audio), args.speakers)
+            for turn in turns:
+                turn.speaker = names.get(turn.speaker, turn.speaker)
+    except (OSError, ValueError, RuntimeError) as e:
+        ui.display_error(str(e))
+        return 1
+    if args.save_rttm:
+        write_rttm(turns, args.save_rttm)
+
+    merged = merge(result, turns, args.coalesce, max_gap=args.max_gap)
+    base = args.transcript
+    suffix = writers.OUTPUT_SUFFIXES['json']
+    base = base[:-len(suffix)] if base.endswith(suffix) else os.path.splitext(base)[0]
+    # The writer strips an extension from the name it is given; any dot left in `base` is the title's
+    writer = writers.write_transcript(merged['segments'], f"{base}_merged.json", formats, text=merged['text'])
+    for path in writer.paths.values():
+        ui.display_success(f"Speaker-attributed transcript saved to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import numpy as np
+import audio
+
+# Characters of committed transcript passed on as the next window's prompt; Whisper
+# keeps at most the last 224 prompt tokens, so more text than this is never seen
+PROMPT_CHARS = 400
+
+
+def transcribe_stream(backend, blocks, language, window_seconds=30.0, guard_seconds=2.0, progress=None,
+                      sr=audio.SAMPLE_RATE, **decode_options):
+    """Transcribe a waveform arriving in blocks, one window at a time, yielding segments.
+
+    Each window is at most `window_seconds` long. Segments that end within
+    `guard_seconds` of a window's end may have been cut off mid-word, so they are
+    dropped and the next window starts where the last kept segment ended: the
+    uncommitted tail is heard again with the following audio. The text committed
+    so far is carried over as the next window's `initial_prompt`. Segments are
+    yielded on the recording's timeline as soon as their window is done, and
+    `progress` gets the seconds of audio committed so far.
+
+    At most one window of samples plus one block is held in memory, whatever the
+    length of the recording.
+    """
+    window = int(window_seconds * sr)
+    guard = min(int(guard_seconds * sr), window // 2)
+    blocks = iter(blocks)
+    pending = np.zeros(0, dtype=np.float32)
+    offset = 0
+    count = 0
+    prompt = decode_options.pop('initial_prompt', None)
+    exhausted = False
+    while True:
+        pieces = [pending]
+        filled = len(pending)
+        while filled < window and not exhausted:
+            block = next(blocks, None)
+            if block is None:
+                exhausted = True
+            else:
+                pieces.append(block)
+                filled += len(block)
+        buffer = np.concatenate(pieces)
+        # Anything read past the window waits for the next one
+        buffer, pending = buffer[:window], buffer[window:]
+        if not len(buffer):
+            return
+        last = exhausted and not len(pending)
+        options = dict(decode_options, initial_prompt=prompt) if prompt else decode_options
+        result = backend.transcribe(buffer, language, **options)
+        if not result:
+            raise RuntimeError(f"Transcription failed at {offset / sr:.1f}s")
+
+        segments = result.get('segments', [])
+        if last:
+            keep, cut = segments, len(buffer)
+        else:
+            limit = (len(buffer) - guard) / sr
+            keep = [segment for segment in segments if segment['end'] <= limit]
+            if not keep and segments:
+                # A single segment spanning the window; take it rather than stall
+                keep = segments[:1]
+            cut = int(keep[-1]['end'] * sr) if keep else len(buffer) - guard
+            if cut <= 0:
+                # Only a segment claiming to end where the window starts; the same window
+                # would come back the same, so move on by a second
+                cut = sr
+            cut = min(cut, len(buffer))
+        start = offset / sr
+        for segment in keep:
+            shifted = dict(segment)
+            shifted['id'] = count
+            shifted['start'] = round(segment['start'] + start, 3)
+            shifted['end'] = round(segment['end'] + start, 3)
+            if 'seek' in segment:
+                shifted['seek'] = segment['seek'] + int(round(start * 100))
+            count += 1
+            yield shifted
+        if keep:
+            prompt = ''.join(segment['text'] for segment in keep)[-PROMPT_CHARS:].strip() or prompt
+        offset += cut
+        if progress:
+            progress(offset / sr)
+        if last:
+            return
+        pending = np.concatenate([buffer[cut:], pending])
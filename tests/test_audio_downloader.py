@@ -0,0 +1,152 @@
+import functools
+import http.server
+import os
+import threading
+import time
+import pytest
+
+pytest.importorskip('yt_dlp')
+
+from audio_downloader import DownloadEngine, build_ydl_opts
+from benchmarks.pipeline import serve_directory
+from benchmarks.synthetic import write_speech_wav
+from metrics import MetricsRegistry
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    directory = tmp_path / 'source'
+    directory.mkdir()
+    for name in ('a', 'b', 'c', 'd', 'e', 'f'):
+        write_speech_wav(str(directory / f"{name}.wav"), 1.0)
+    return directory
+
+
+@pytest.fixture
+def host(source_dir):
+    server, base_url = serve_directory(str(source_dir))
+    yield base_url
+    server.shutdown()
+
+
+class _FlakyHandler(http.server.SimpleHTTPRequestHandler):
+    """Answers the first `failures` requests for each path with a 503"""
+
+    failures = 2
+
+    def __init__(self, *args, seen, **kwargs):
+        self.seen = seen
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        self.seen[self.path] = self.seen.get(self.path, 0) + 1
+        if self.seen[self.path] <= self.failures:
+            self.send_error(503)
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_host(source_dir):
+    seen = {}
+    handler = functools.partial(_FlakyHandler, directory=str(source_dir), seen=seen)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", seen
+    server.shutdown()
+
+
+def _engine(output_dir, **kwargs):
+    ydl_opts = dict(build_ydl_opts(str(output_dir), 'native'), quiet=True, no_warnings=True, noprogress=True)
+    return DownloadEngine(str(output_dir), ydl_opts=ydl_opts, audio_format='native', metrics=MetricsRegistry(),
+                          **kwargs)
+
+
+def _no_wait(engine):
+    """Record the backoff attempts instead of sleeping through them"""
+    attempts = []
+
+    def delay(attempt):
+        attempts.append(attempt)
+        return 0.0
+
+    engine._delay = delay
+    return attempts
+
+
+def test_download(tmp_path, host):
+    with _engine(tmp_path / 'out') as engine:
+        audio_file = engine.download(f"{host}/a.wav")
+    assert audio_file == str(tmp_path / 'out' / '[a] a.wav')
+    assert os.path.getsize(audio_file) == os.path.getsize(tmp_path / 'source' / 'a.wav')
+
+
+def test_transient_errors_are_retried_with_backoff(tmp_path, flaky_host):
+    base_url, seen = flaky_host
+    with _engine(tmp_path / 'out', retries=3) as engine:
+        attempts = _no_wait(engine)
+        audio_file = engine.download(f"{base_url}/b.wav")
+        retried = engine.metrics.counter('download_retries_total').value()
+    assert audio_file and os.path.exists(audio_file)
+    assert attempts == [0, 1]
+    assert retried == 2
+
+
+def test_transient_errors_give_up_after_the_retries(tmp_path, flaky_host):
+    base_url, _ = flaky_host
+    with _engine(tmp_path / 'out', retries=1) as engine:
+        attempts = _no_wait(engine)
+        assert engine.download(f"{base_url}/c.wav") is None
+        failures = engine.metrics.counter('failures_total').value(stage='download', cause='transient')
+    assert attempts == [0]
+    assert failures == 1
+
+
+def test_other_errors_are_not_retried(tmp_path, host):
+    with _engine(tmp_path / 'out', retries=3) as engine:
+        attempts = _no_wait(engine)
+        assert engine.download(f"{host}/missing.wav") is None
+        failures = engine.metrics.counter('failures_total').value(stage='download', cause='download_error')
+    assert attempts == []
+    assert failures == 1
+
+
+def test_downloads_per_host_are_capped(tmp_path, host):
+    engine = _engine(tmp_path / 'out', per_host=2)
+    running = [0]
+    peak = [0]
+    lock = threading.Lock()
+    make_ydl = engine._ydl
+
+    class _Watched:
+        def __init__(self, ydl):
+            self.ydl = ydl
+
+        def extract_info(self, url, download=True):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            try:
+                time.sleep(0.2)
+                return self.ydl.extract_info(url, download=download)
+            finally:
+                with lock:
+                    running[0] -= 1
+
+        def prepare_filename(self, info):
+            return self.ydl.prepare_filename(info)
+
+    engine._ydl = lambda: _Watched(make_ydl())
+    with engine:
+        results = [None] * 6
+        threads = [threading.Thread(target=lambda i=i, name=name: results.__setitem__(
+            i, engine.download(f"{host}/{name}.wav"))) for i, name in enumerate('abcdef')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+    assert all(results)
+    assert peak[0] == 2
@@ -0,0 +1,53 @@
+import numpy as np
+import audio
+import chunking
+
+SR = audio.SAMPLE_RATE
+
+
+def _speech_with_pauses(seconds=60, every=7):
+    rng = np.random.default_rng(0)
+    waveform = (rng.standard_normal(seconds * SR) * 0.3).astype(np.float32)
+    for start in range(every, seconds, every):
+        waveform[start * SR:start * SR + SR // 2] = 0.0
+    return waveform
+
+
+def test_cores_tile_the_recording():
+    waveform = _speech_with_pauses()
+    chunks = chunking.plan_chunks(waveform, min_seconds=5.0, max_seconds=20.0, overlap_seconds=1.0)
+    assert len(chunks) > 1
+    assert chunks[0][2] == 0
+    assert chunks[-1][3] == len(waveform)
+    for (_, _, _, core_end), (_, _, core_start, _) in zip(chunks, chunks[1:]):
+        assert core_end == core_start
+    for start, end, core_start, core_end in chunks:
+        assert start == max(core_start - SR, 0)
+        assert end == min(core_end + SR, len(waveform))
+
+
+def test_stitch_keeps_each_overlapping_segment_once():
+    waveform = _speech_with_pauses()
+    chunks = chunking.plan_chunks(waveform, min_seconds=5.0, max_seconds=20.0, overlap_seconds=1.0)
+    # One 0.5 s "word" every 0.25 s, heard by every chunk whose padded range holds it
+    words = [(t / 4, t / 4 + 0.5) for t in range(0, 4 * 60 - 2)]
+    results = []
+    for start, end, _, _ in chunks:
+        offset = start / SR
+        segments = [{'id': i, 'start': round(a - offset, 3), 'end': round(b - offset, 3), 'text': f' {a}'}
+                    for i, (a, b) in enumerate(words) if start / SR <= a and b <= end / SR]
+        results.append({'text': '', 'segments': segments, 'language': 'tr'})
+
+    stitched = chunking.stitch(chunks, results)
+
+    assert [(segment['start'], segment['end']) for segment in stitched['segments']] == words
+    assert [segment['id'] for segment in stitched['segments']] == list(range(len(words)))
+    assert stitched['language'] == 'tr'
+
+
+def test_stitch_skips_failed_chunks():
+    chunks = [(0, 2 * SR, 0, SR), (0, 2 * SR, SR, 2 * SR)]
+    results = [None, {'segments': [{'start': 1.2, 'end': 1.6, 'text': ' b'}], 'language': 'en'}]
+    stitched = chunking.stitch(chunks, results)
+    assert stitched['text'] == ' b'
+    assert stitched['language'] == 'en'
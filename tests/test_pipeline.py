@@ -0,0 +1,141 @@
+import threading
+import time
+import numpy as np
+import audio
+import pytest
+from backends import FakeBackend
+from job_ledger import JobLedger
+from metrics import MetricsRegistry
+from pipeline import BatchPipeline
+from transcription import Transcriber
+
+SR = audio.SAMPLE_RATE
+# Decoded length (seconds) that the failing backend refuses
+FAIL_SECONDS = 2
+
+
+class _FailingBackend(FakeBackend):
+    def _transcribe(self, handle, audio_input, language, decode_options, progress):
+        if len(audio_input) == FAIL_SECONDS * SR:
+            raise RuntimeError("model crashed")
+        return super()._transcribe(handle, audio_input, language, decode_options, progress)
+
+
+class _Downloads:
+    """Fake downloader: 'missing-*' URLs fail, every other URL becomes an empty audio file"""
+
+    def __init__(self, directory, gate=None):
+        self.directory = directory
+        self.gate = gate
+        self.calls = []
+
+    def __call__(self, url):
+        if self.gate:
+            self.gate.wait(10)
+        self.calls.append(url)
+        if url.startswith('missing-'):
+            return None
+        path = self.directory / f"{url}.mp3"
+        path.touch()
+        return str(path)
+
+
+def _decode(audio_file):
+    seconds = FAIL_SECONDS if 'crash' in audio_file else 3
+    return np.zeros(seconds * SR, dtype=np.float32)
+
+
+def _pipeline(tmp_path, downloader=None, **kwargs):
+    metrics = MetricsRegistry()
+    transcriber = Transcriber(backend=_FailingBackend(segment_seconds=1.0), metrics=metrics)
+    return BatchPipeline(transcriber, formats=('txt', 'json'), downloader=downloader or _Downloads(tmp_path),
+                         decoder=_decode, metrics=metrics, **kwargs)
+
+
+def test_items_finish_in_order_with_outputs(tmp_path):
+    pipeline = _pipeline(tmp_path, download_workers=1)
+    urls = [f"episode-{i}" for i in range(5)]
+
+    items = list(pipeline.run(urls))
+
+    assert [item.url for item in items] == urls
+    assert [item.index for item in items] == list(range(5))
+    assert all(item.ok and item.result['segments'] for item in items)
+    assert all(set(item.timings) == set(BatchPipeline.STAGES) for item in items)
+    assert (tmp_path / 'episode-3_transcript.txt').read_text(encoding='utf-8').startswith('[tr] segment 0')
+    assert (pipeline.successful, pipeline.failed, pipeline.skipped) == (5, 0, 0)
+
+
+def test_failures_are_reported_per_item(tmp_path):
+    pipeline = _pipeline(tmp_path)
+
+    items = {item.url: item for item in pipeline.run(['episode-1', 'missing-2', 'crash-3', 'episode-4'])}
+
+    assert items['episode-1'].ok and items['episode-4'].ok
+    assert items['missing-2'].error == "download failed"
+    assert items['crash-3'].error == "transcription failed"
+    # Nothing after a failed stage runs for that item
+    assert 'decode' not in items['missing-2'].timings
+    assert 'write' not in items['crash-3'].timings
+    assert not (tmp_path / 'crash-3_transcript.txt').exists()
+    assert (pipeline.successful, pipeline.failed, pipeline.skipped) == (2, 2, 0)
+
+
+def test_queue_depths(tmp_path):
+    gate = threading.Event()
+    pipeline = _pipeline(tmp_path, downloader=_Downloads(tmp_path, gate), download_workers=1)
+    assert pipeline.queue_depths() == {stage: 0 for stage in ('download', 'decode', 'transcribe', 'write')}
+
+    run = pipeline.run([f"episode-{i}" for i in range(4)])
+    finished = []
+    consumer = threading.Thread(target=lambda: finished.extend(run))
+    consumer.start()
+    try:
+        # The one downloader holds the first item; the rest wait in front of it
+        deadline = time.time() + 10
+        while pipeline.queue_depths()['download'] != 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert pipeline.queue_depths() == {'download': 3, 'decode': 0, 'transcribe': 0, 'write': 0}
+    finally:
+        gate.set()
+        consumer.join(30)
+    assert len(finished) == 4
+    assert pipeline.queue_depths() == {stage: 0 for stage in ('download', 'decode', 'transcribe', 'write')}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = JobLedger(str(tmp_path / 'ledger.sqlite'))
+    yield ledger
+    ledger.close()
+
+
+def test_ledger_skips_finished_urls_on_rerun(tmp_path, ledger):
+    urls = ['episode-1', 'missing-2', 'episode-3']
+    first = _pipeline(tmp_path, ledger=ledger)
+    list(first.run(urls))
+    assert (first.successful, first.failed) == (2, 1)
+    assert ledger.get('missing-2')['status'] == 'failed'
+
+    downloads = _Downloads(tmp_path)
+    rerun = _pipeline(tmp_path, downloader=downloads, ledger=ledger)
+    items = {item.url: item for item in rerun.run(urls)}
+
+    assert items['episode-1'].skipped and items['episode-3'].skipped
+    assert items['episode-1'].audio_file == str(tmp_path / 'episode-1.mp3')
+    # Only the failed URL is tried again
+    assert downloads.calls == ['missing-2']
+    assert (rerun.successful, rerun.failed, rerun.skipped) == (0, 1, 2)
+
+
+def test_ledger_reruns_in_another_language(tmp_path, ledger):
+    list(_pipeline(tmp_path, ledger=ledger).run(['episode-1']))
+
+    downloads = _Downloads(tmp_path)
+    rerun = _pipeline(tmp_path, downloader=downloads, ledger=ledger, language='en')
+    items = list(rerun.run(['episode-1']))
+
+    assert not items[0].skipped and items[0].ok
+    # The audio from the first run is reused rather than downloaded again
+    assert downloads.calls == []
+    assert (tmp_path / 'episode-1_transcript.txt').read_text(encoding='utf-8').startswith('[en] segment 0')
@@ -0,0 +1,56 @@
+import tracemalloc
+import numpy as np
+import audio
+import streaming
+from backends import FakeBackend
+
+SR = audio.SAMPLE_RATE
+
+
+def _blocks(seconds, block_seconds=10.0):
+    remaining = int(seconds * SR)
+    block = int(block_seconds * SR)
+    while remaining > 0:
+        size = min(block, remaining)
+        yield np.full(size, 0.1, dtype=np.float32)
+        remaining -= size
+
+
+def _peak_bytes(seconds):
+    backend = FakeBackend(segment_seconds=5.0)
+    tracemalloc.start()
+    try:
+        for _ in streaming.transcribe_stream(backend, _blocks(seconds), 'tr'):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_memory_does_not_grow_with_length():
+    short = _peak_bytes(5 * 60)
+    long = _peak_bytes(60 * 60)
+    # Twelve times the audio; a whole-file buffer would take 230 MB more
+    assert long < short + 4 * 2 ** 20
+
+
+def test_segments_cover_the_recording_once():
+    segments = list(streaming.transcribe_stream(FakeBackend(segment_seconds=5.0), _blocks(200), 'tr'))
+    assert segments[0]['start'] == 0.0
+    assert segments[-1]['end'] == 200.0
+    for previous, segment in zip(segments, segments[1:]):
+        assert segment['start'] == previous['end']
+    assert [segment['id'] for segment in segments] == list(range(len(segments)))
+
+
+class _ShortSegmentBackend(FakeBackend):
+    """Hears one 0.4 s segment at the start of every window"""
+
+    def _transcribe(self, handle, audio_input, language, decode_options, progress):
+        return {'text': ' x', 'segments': [{'id': 0, 'start': 0.0, 'end': 0.4, 'text': ' x'}], 'language': language}
+
+
+def test_short_first_segment_does_not_skip_audio():
+    segments = list(streaming.transcribe_stream(_ShortSegmentBackend(), _blocks(3, 1.0), 'tr',
+                                                window_seconds=2.0, guard_seconds=0.5))
+    assert [segment['start'] for segment in segments[:3]] == [0.0, 0.4, 0.8]
@@ -0,0 +1,57 @@
+import json
+import numpy as np
+import pytest
+import transcript_store
+
+
+TRANSCRIPTS = [
+    {'text': ' Merhaba dünya. İyi günler', 'language': 'tr', 'segments': [
+        {'id': 0, 'start': 0.0, 'end': 2.5, 'text': ' Merhaba dünya.', 'speaker': 'SPEAKER_00'},
+        {'id': 1, 'start': 2.5, 'end': 4.123456789, 'text': ' İyi günler', 'speaker': None, 'tokens': [5, 6]},
+        {'start': 4.2, 'end': 5.0, 'text': ''},
+    ]},
+    [
+        {'start': 0.0, 'end': 1.5, 'text': 'a', 'speaker': 'SPEAKER_01'},
+        {'start': 1.5, 'end': 3.0, 'text': 'b', 'speaker': 'SPEAKER_00'},
+    ],
+    {'text': '', 'segments': []},
+    [],
+]
+
+
+@pytest.mark.parametrize('transcript', TRANSCRIPTS)
+def test_round_trip(tmp_path, transcript):
+    path = transcript_store.write_store(transcript, str(tmp_path / 'episode.tstore'))
+    assert transcript_store.load(path) == transcript
+
+
+def test_columns(tmp_path):
+    path = transcript_store.write_store(TRANSCRIPTS[0], str(tmp_path / 'episode.tstore'))
+    with transcript_store.TranscriptStore(path) as store:
+        assert len(store) == 3
+        assert list(store.starts) == [0.0, 2.5, 4.2]
+        assert store.text(1) == ' İyi günler'
+        assert store[1]['end'] == 4.123456789
+
+
+def test_numpy_values_are_stored_as_json(tmp_path):
+    transcript = {'text': 'a', 'duration': np.float32(1.5), 'segments': [
+        {'id': 0, 'start': 0.0, 'end': 1.5, 'text': 'a', 'avg_logprob': np.float64(-0.25),
+         'tokens': np.array([1, 2])},
+    ]}
+    path = transcript_store.write_store(transcript, str(tmp_path / 'episode.tstore'))
+    assert transcript_store.load(path) == {'text': 'a', 'duration': 1.5, 'segments': [
+        {'id': 0, 'start': 0.0, 'end': 1.5, 'text': 'a', 'avg_logprob': -0.25, 'tokens': [1, 2]}]}
+
+
+def test_json_conversion(tmp_path):
+    json_path = tmp_path / 'episode_transcript.json'
+    json_path.write_text(json.dumps(TRANSCRIPTS[0], ensure_ascii=False), encoding='utf-8')
+
+    store_path = transcript_store.from_json(str(json_path))
+    assert store_path == str(tmp_path / 'episode.tstore')
+    assert store_path != transcript_store.result_file_for(str(tmp_path / 'episode.mp3'))
+
+    back = transcript_store.to_json(store_path, str(tmp_path / 'back.json'))
+    with open(back, encoding='utf-8') as f:
+        assert json.load(f) == TRANSCRIPTS[0]
@@ -0,0 +1,45 @@
+import pytest
+import vad
+
+SR = 100
+
+
+def _timeline():
+    # Speech from 1-3 s and 5-6 s of an 8 s recording
+    return vad.SpeechTimeline([(1 * SR, 3 * SR), (5 * SR, 6 * SR)], 8 * SR, sr=SR)
+
+
+def test_timeline_lengths():
+    timeline = _timeline()
+    assert timeline.speech_seconds == 3.0
+    assert timeline.skipped_seconds == 5.0
+    assert timeline.summary() == {'total_seconds': 8.0, 'speech_seconds': 3.0, 'skipped_seconds': 5.0,
+                                  'regions': 2}
+
+
+@pytest.mark.parametrize('gated, at_end, original', [
+    (0.0, False, 1.0),
+    (1.5, False, 2.5),
+    (2.0, False, 5.0),
+    (2.0, True, 3.0),
+    (2.5, False, 5.5),
+    (4.0, False, 6.0),
+])
+def test_to_original(gated, at_end, original):
+    assert _timeline().to_original(gated, at_end=at_end) == pytest.approx(original)
+
+
+def test_without_speech_times_are_unchanged():
+    assert vad.SpeechTimeline([], 8 * SR, sr=SR).to_original(2.5) == 2.5
+
+
+def test_remap_result():
+    result = {'segments': [
+        {'start': 0.5, 'end': 2.0, 'seek': 50, 'text': ' a'},
+        {'start': 2.0, 'end': 2.8, 'seek': 200, 'text': ' b'},
+    ]}
+    remapped = vad.remap_result(result, _timeline())
+    first, second = remapped['segments']
+    assert (first['start'], first['end'], first['seek']) == (1.5, 3.0, 150)
+    assert (second['start'], second['end'], second['seek']) == (5.0, 5.8, 500)
+    assert remapped['vad']['skipped_seconds'] == 5.0
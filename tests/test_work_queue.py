@@ -0,0 +1,119 @@
+import threading
+import time
+import pytest
+from work_queue import WorkQueue
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'queue.sqlite')
+
+
+def test_ingest_deduplicates_by_video_id(db_path):
+    queue = WorkQueue(db_path)
+    added = queue.ingest([
+        ('https://www.youtube.com/watch?v=abc123', 'en'),
+        'https://youtu.be/abc123',
+        'https://www.youtube.com/shorts/abc123',
+        ('https://www.youtube.com/watch?v=def456', 'tr'),
+        'https://example.com/episode.mp3',
+        '  https://example.com/episode.mp3  ',
+        '',
+    ])
+    assert added == 3
+    assert queue.ingest(['https://youtu.be/def456']) == 0
+
+    leases = queue.claim('worker', limit=10)
+    assert [(lease['url'], lease['language']) for lease in leases] == [
+        ('https://www.youtube.com/watch?v=abc123', 'en'),
+        ('https://www.youtube.com/watch?v=def456', 'tr'),
+        ('https://example.com/episode.mp3', None),
+    ]
+    assert [lease['key'] for lease in leases[:2]] == ['youtube:abc123', 'youtube:def456']
+
+
+def test_no_item_is_claimed_twice(db_path):
+    WorkQueue(db_path).ingest(f"https://example.com/{i}.mp3" for i in range(200))
+    claimed = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        # A connection of its own, as a separate process or host would have
+        queue = WorkQueue(db_path)
+        while True:
+            leases = queue.claim(worker_id, limit=3)
+            if not leases:
+                break
+            with lock:
+                claimed.extend(lease['key'] for lease in leases)
+        queue.close()
+
+    threads = [threading.Thread(target=worker, args=(f"worker-{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    assert len(claimed) == 200
+    assert len(set(claimed)) == 200
+
+
+def test_expired_lease_is_reclaimed(db_path):
+    queue = WorkQueue(db_path, lease_seconds=0.05)
+    queue.ingest(['https://example.com/a.mp3'])
+    assert len(queue.claim('crashed')) == 1
+    assert queue.claim('other') == []
+    assert queue.reclaim() == 0
+
+    time.sleep(0.1)
+    assert queue.reclaim() == 1
+    assert queue.summary() == {'queued': 1}
+    leases = queue.claim('other')
+    assert leases[0]['attempts'] == 2
+
+
+def test_heartbeat_keeps_a_lease(db_path):
+    queue = WorkQueue(db_path, lease_seconds=0.2)
+    queue.ingest(['https://example.com/a.mp3'])
+    queue.claim('busy')
+    for _ in range(3):
+        time.sleep(0.1)
+        assert queue.heartbeat('busy') == 1
+    assert queue.reclaim() == 0
+    assert queue.claim('other') == []
+
+
+def test_max_attempts_fails_the_item(db_path):
+    queue = WorkQueue(db_path, lease_seconds=0.05, max_attempts=2)
+    queue.ingest(['https://example.com/a.mp3', 'https://example.com/b.mp3'])
+
+    a, b = queue.claim('worker', limit=2)
+    # One is given up by its worker, the other's lease runs out
+    assert queue.fail(a['key'], 'worker', "download failed")
+    time.sleep(0.1)
+    assert queue.reclaim() == 1
+    assert queue.summary() == {'queued': 2}
+
+    a, b = queue.claim('worker', limit=2)
+    assert (a['attempts'], b['attempts']) == (2, 2)
+    assert queue.fail(a['key'], 'worker', "download failed")
+    time.sleep(0.1)
+    assert queue.reclaim() == 1
+    assert queue.summary() == {'failed': 2}
+    assert queue.claim('worker') == []
+    assert queue.outstanding() == 0
+
+
+def test_late_worker_cannot_finish_a_moved_lease(db_path):
+    queue = WorkQueue(db_path, lease_seconds=0.05)
+    queue.ingest(['https://example.com/a.mp3'])
+    (slow,) = queue.claim('slow')
+    time.sleep(0.1)
+    (fast,) = queue.claim('fast')
+    assert fast['key'] == slow['key']
+
+    assert not queue.complete(slow['key'], 'slow', {'outputs': []})
+    assert not queue.fail(slow['key'], 'slow', "too late")
+    assert queue.complete(fast['key'], 'fast', {'outputs': ['a.txt']})
+    assert queue.summary() == {'done': 1}
+    # Finished work stays finished
+    assert not queue.fail(fast['key'], 'fast', "after the fact")
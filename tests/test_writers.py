@@ -0,0 +1,60 @@
+import json
+import pytest
+import writers
+
+
+def _baseline_save_json(transcript, output_file):
+    """The JSON output as save_json wrote it before the single-pass writer"""
+    json_data = {
+        "text": transcript.get("text", ""),
+        "segments": []
+    }
+    for segment in transcript.get("segments", []):
+        json_data["segments"].append({
+            "id": segment.get("id"),
+            "start": segment.get("start"),
+            "end": segment.get("end"),
+            "text": segment.get("text", "").strip()
+        })
+    with open(output_file, 'w', encoding='utf-8') as file:
+        json.dump(json_data, file, ensure_ascii=False, indent=2)
+
+
+TRANSCRIPTS = [
+    {'text': '', 'segments': []},
+    {'text': ' Merhaba dünya. "Ekonomi"\nşöyle', 'segments': [
+        {'id': 0, 'start': 0.0, 'end': 2.5, 'text': ' Merhaba dünya.'},
+        {'id': 1, 'start': 2.5, 'end': 7.04, 'text': ' "Ekonomi"\nşöyle ', 'tokens': [1, 2]},
+        {'id': 2, 'start': 7.04, 'end': 9, 'text': ''},
+    ]},
+]
+
+
+@pytest.mark.parametrize('transcript', TRANSCRIPTS)
+def test_json_matches_save_json(tmp_path, transcript):
+    expected = tmp_path / 'expected.json'
+    _baseline_save_json(transcript, expected)
+
+    paths = writers.write_transcript(transcript['segments'], str(tmp_path / 'episode.mp3'), ['json'],
+                                     text=transcript['text']).paths
+
+    assert paths['json'] == str(tmp_path / 'episode_transcript.json')
+    with open(paths['json'], 'rb') as written, open(expected, 'rb') as baseline:
+        assert written.read() == baseline.read()
+
+
+def test_json_without_text_up_front(tmp_path):
+    transcript = TRANSCRIPTS[1]
+    paths = writers.write_transcript(transcript['segments'], str(tmp_path / 'episode.mp3'), ['json']).paths
+    with open(paths['json'], encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['text'] == ''.join(segment['text'] for segment in transcript['segments'])
+    assert [segment['text'] for segment in data['segments']] == ['Merhaba dünya.', '"Ekonomi"\nşöyle', '']
+
+
+def test_abort_leaves_nothing(tmp_path):
+    with pytest.raises(ValueError):
+        with writers.TranscriptWriter(str(tmp_path / 'episode.mp3'), ['json', 'srt']) as writer:
+            writer.write_segment(TRANSCRIPTS[1]['segments'][0])
+            raise ValueError
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,355 @@
+"""Compact columnar binary format for stored transcripts.
+
+    python transcript_store.py pack ./video/            # write a .tstore next to every transcript JSON
+    python transcript_store.py unpack episode.tstore    # and back to JSON
+
+A store holds the same data as a transcript JSON file, either a bare list of
+segments (merged_transcript.json) or a {"text", "segments", ...} object (save_json),
+in columns:
+
+- start/end as float32 when every value survives the round trip, else float64
+- speaker as int32 codes into a dictionary of names (-1 for null)
+- text as one UTF-8 blob with offsets
+- any other segment keys as compact JSON, one blob with offsets
+- a per-segment bitmask of which standard keys the segment had
+
+Files are memory-mapped and segments are only decoded when they are accessed, so an
+archive can be opened and aggregated over without building a dict per segment.
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+import numpy as np
+from writers import OUTPUT_SUFFIXES
+from utils import json_default, set_default_mode
+
+MAGIC = b'TSTORE'
+VERSION = 1
+STORE_SUFFIX = '.tstore'
+# Canonical results kept by the transcriber, apart from stores packed from JSON outputs
+RESULT_SUFFIX = '.result' + STORE_SUFFIX
+
+# Bits of the presence column: which standard keys a segment has
+_START, _END, _TEXT, _SPEAKER, _ID = 1, 2, 4, 8, 16
+
+_PREFIX = struct.Struct('<6sHI')
+_ALIGN = 8
+
+
+def result_file_for(audio_file):
+    """Where the canonical result of transcribing an audio file is kept: episode.mp3 -> episode.result.tstore"""
+    return os.path.splitext(audio_file)[0] + RESULT_SUFFIX
+
+
+def store_file_for(json_path):
+    """episode_transcript.json -> episode.tstore; any other name.json -> name.tstore"""
+    suffix = OUTPUT_SUFFIXES['json']
+    base = json_path[:-len(suffix)] if json_path.endswith(suffix) else os.path.splitext(json_path)[0]
+    return base + STORE_SUFFIX
+
+
+def _fits_float32(values):
+    """Whether float32 keeps every value exactly as it would be written to JSON"""
+    return all(float(str(np.float32(value))) == value for value in values)
+
+
+def _blob(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b''.join(encoded)
+
+
+def encode(transcript):
+    """Store bytes for a transcript in either JSON shape"""
+    if isinstance(transcript, list):
+        shape, segments, meta = 'list', transcript, {}
+    else:
+        shape = 'dict'
+        segments = transcript.get('segments', [])
+        meta = {key: value for key, value in transcript.items() if key != 'segments'}
+
+    count = len(segments)
+    present = np.zeros(count, dtype='u1')
+    starts = np.full(count, np.nan)
+    ends = np.full(count, np.nan)
+    ids = np.zeros(count, dtype='<i8')
+    codes = np.full(count, -1, dtype='<i4')
+    speakers = {}
+    texts = []
+    extras = []
+    for i, segment in enumerate(segments):
+        extra = {}
+        for key, value in segment.items():
+            # Only values the column reproduces exactly go in it; anything else (an int
+            # start, a non-string text) is kept as-is with the extras
+            if key in ('start', 'end') and (value is None or type(value) is float):
+                (starts if key == 'start' else ends)[i] = np.nan if value is None else value
+                present[i] |= _START if key == 'start' else _END
+            elif key == 'text' and type(value) is str:
+                present[i] |= _TEXT
+            elif key == 'speaker' and (value is None or type(value) is str):
+                if value is not None:
+                    codes[i] = speakers.setdefault(value, len(speakers))
+                present[i] |= _SPEAKER
+            elif key == 'id' and type(value) is int and -(1 << 63) <= value < (1 << 63):
+                ids[i] = value
+                present[i] |= _ID
+            else:
+                extra[key] = value
+        texts.append(segment['text'] if present[i] & _TEXT else '')
+        extras.append(json.dumps(extra, ensure_ascii=False, separators=(',', ':'), default=json_default)
+                      if extra else '')
+
+    times = [value for value in np.concatenate([starts, ends]).tolist() if value == value]
+    time_dtype = '<f4' if _fits_float32(times) else '<f8'
+    text_offsets, text_blob = _blob(texts)
+    # Fixed-width columns come first and the blobs last, so analytics over times and
+    # speakers only fault in the front of the file
+    columns = {
+        'present': present,
+        'start': starts.astype(time_dtype),
+        'end': ends.astype(time_dtype),
+    }
+    if (present & _ID).any():
+        columns['id'] = ids
+    if speakers:
+        columns['speaker'] = codes
+    columns['text_offsets'] = text_offsets
+    if any(extras):
+        extra_offsets, extra_blob = _blob(extras)
+        columns['extra_offsets'] = extra_offsets
+    columns['text'] = np.frombuffer(text_blob, dtype='u1')
+    if any(extras):
+        columns['extra'] = np.frombuffer(extra_blob, dtype='u1')
+    if meta:
+        encoded_meta = json.dumps(meta, ensure_ascii=False, default=json_default).encode('utf-8')
+        columns['meta'] = np.frombuffer(encoded_meta, dtype='u1')
+
+    # Column offsets depend on the header's length, so lay out relative offsets first
+    layout = {}
+    position = 0
+    for name, array in columns.items():
+        layout[name] = [position, array.dtype.str, len(array)]
+        position += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = {
+        # 'list', 'dict', or 'dict-' for a dict without a segments key
+        'shape': shape if shape == 'list' or 'segments' in transcript else 'dict-',
+        'count': count,
+        'speakers': list(speakers),
+        'columns': layout,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_bytes += b' ' * (-(_PREFIX.size + len(header_bytes)) % _ALIGN)
+    parts = [_PREFIX.pack(MAGIC, VERSION, len(header_bytes)), header_bytes]
+    for array in columns.values():
+        data = array.tobytes()
+        parts.append(data + b'\0' * (-len(data) % _ALIGN))
+    return b''.join(parts)
+
+
+def write_store(transcript, path):
+    """Write a transcript (either JSON shape) to `path` atomically; returns the path"""
+    data = encode(transcript)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f".{os.path.basename(path)}.",
+                                    suffix='.tmp')
+    set_default_mode(fd)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+class TranscriptStore:
+    """Read-only, memory-mapped view of a stored transcript.
+
+    `starts`, `ends` and `speaker_codes` are NumPy arrays over the mapped file for
+    analytics; indexing or iterating yields the original segment dicts, decoded
+    one at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.getsize(path) < _PREFIX.size:
+            raise ValueError(f"{path} is not a transcript store")
+        self._map = np.memmap(path, dtype='u1', mode='r')
+        magic, version, header_size = _PREFIX.unpack(self._map[:_PREFIX.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a transcript store")
+        if version > VERSION:
+            raise ValueError(f"{path} was written by a newer version (format {version})")
+        header = json.loads(self._map[_PREFIX.size:_PREFIX.size + header_size].tobytes())
+        self.shape = header['shape']
+        self.count = header['count']
+        self.speakers = header['speakers']
+        base = _PREFIX.size + header_size
+        self._columns = {}
+        for name, (offset, dtype, length) in header['columns'].items():
+            dtype = np.dtype(dtype)
+            self._columns[name] = self._map[base + offset:base + offset + length * dtype.itemsize].view(dtype)
+        self._fits_float32 = self._columns['start'].dtype.itemsize == 4
+        self._meta = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._columns = {}
+        self._map = None
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def starts(self):
+        return self._columns['start']
+
+    @property
+    def ends(self):
+        return self._columns['end']
+
+    @property
+    def speaker_codes(self):
+        """int32 index into `speakers` per segment, -1 where there is none"""
+        if 'speaker' in self._columns:
+            return self._columns['speaker']
+        return np.full(self.count, -1, dtype='<i4')
+
+    @property
+    def meta(self):
+        """Top-level keys other than segments (text, language, ...) of a dict-shaped transcript"""
+        if self._meta is None:
+            column = self._columns.get('meta')
+            self._meta = json.loads(column.tobytes()) if column is not None else {}
+        return self._meta
+
+    def text(self, index):
+        offsets = self._columns['text_offsets']
+        return self._columns['text'][offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+    def _time(self, value):
+        if value != value:
+            return None
+        # float32 was only chosen if this gives back exactly the value that was stored
+        return float(str(value)) if self._fits_float32 else float(value)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        present = int(self._columns['present'][index])
+        segment = {}
+        if present & _ID:
+            segment['id'] = int(self._columns['id'][index])
+        if present & _START:
+            segment['start'] = self._time(self._columns['start'][index])
+        if present & _END:
+            segment['end'] = self._time(self._columns['end'][index])
+        if present & _TEXT:
+            segment['text'] = self.text(index)
+        if present & _SPEAKER:
+            code = int(self._columns['speaker'][index]) if 'speaker' in self._columns else -1
+            segment['speaker'] = self.speakers[code] if code >= 0 else None
+        if 'extra' in self._columns:
+            offsets = self._columns['extra_offsets']
+            raw = self._columns['extra'][offsets[index]:offsets[index + 1]].tobytes()
+            if raw:
+                segment.update(json.loads(raw))
+        return segment
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def to_json(self):
+        """The transcript in the JSON shape it was stored from"""
+        segments = list(self)
+        if self.shape == 'list':
+            return segments
+        if self.shape == 'dict-':
+            return dict(self.meta)
+        return dict(self.meta, segments=segments)
+
+
+def load(path):
+    """A stored transcript as the JSON object it was stored from"""
+    with TranscriptStore(path) as store:
+        return store.to_json()
+
+
+def from_json(json_path, store_path=None):
+    """Convert a transcript JSON file; returns the store's path"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        transcript = json.load(f)
+    return write_store(transcript, store_path or store_file_for(json_path))
+
+
+def to_json(store_path, json_path=None):
+    """Convert a store back to indented JSON; returns the JSON file's path"""
+    json_path = json_path or os.path.splitext(store_path)[0] + OUTPUT_SUFFIXES['json']
+    data = json.dumps(load(store_path), ensure_ascii=False, indent=2)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path) or '.', suffix='.tmp')
+    set_default_mode(fd)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, json_path)
+    return json_path
+
+
+def _expand(paths, suffix):
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                for name in sorted(names):
+                    # Canonical results are the transcriber's, not copies of an output to convert
+                    if name.endswith(RESULT_SUFFIX):
+                        continue
+                    if name.endswith(suffix) and not name.startswith('.'):
+                        yield os.path.join(directory, name)
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['pack', 'unpack'])
+    parser.add_argument('paths', nargs='+', help="files, or directories to convert everything below")
+    parser.add_argument('--check', action='store_true', help="after packing, verify the store loads back equal")
+    args = parser.parse_args()
+
+    converted = failed = 0
+    suffix = '.json' if args.command == 'pack' else STORE_SUFFIX
+    for path in _expand(args.paths, suffix):
+        try:
+            if args.command == 'pack':
+                target = from_json(path)
+                if args.check:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        if json.load(f) != load(target):
+                            raise ValueError("stored transcript differs from the JSON")
+            else:
+                target = to_json(path)
+        except (OSError, ValueError) as e:
+            print(f"Error: {path}: {str(e)}")
+            failed += 1
+            continue
+        print(f"{path} -> {target}")
+        converted += 1
+    print(f"Converted {converted} files, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,72 +1,247 @@
-import os
-import json
-import mlx_whisper
-from utils import format_timedelta
-from datetime import timedelta
+import time
+import audio as audio_utils
+import chunking
+import streaming
+import transcript_store
+import vad as speech_gate
+import writers
+import profiling
 from interface import UserInterface
+from backends import get_backend
+from progress import ProgressTracker
+from metrics import REGISTRY
+
+# What each output format is called in progress messages
+FORMAT_LABELS = {
+    'txt': "Transcript",
+    'srt': "SRT subtitles",
+    'json': "JSON transcript",
+    'ndjson': "NDJSON segments",
+    'vtt': "WebVTT subtitles",
+}
 
 class Transcriber:
-    def __init__(self):
+    def __init__(self, backend=None, cache=None, audio_store=None, realtime_factors=None, metrics=None,
+                 search_index=None):
         self.ui = UserInterface()
+        self.metrics = metrics or REGISTRY
+        self.backend = backend or get_backend()
+        self.cache = cache
+        self.audio_store = audio_store
+        self.realtime_factors = realtime_factors
+        self.search_index = search_index
+
+    def expected_realtime_factor(self):
+        """Compute seconds per audio second to plan with: persisted, else measured this run"""
+        if self.realtime_factors:
+            factor = self.realtime_factors.get(self.backend.cache_id)
+            if factor is not None:
+                return factor
+        return self.backend.realtime_factor
+
+    def load_audio(self, audio_file):
+        """Decoded waveform for a file, from the decoded-audio store when one is configured"""
+        source = 'store' if self.audio_store else 'ffmpeg'
+        with self.metrics.histogram('decode_seconds', "ffmpeg decode time per file").time(source=source), \
+                profiling.stage('decode', audio_file):
+            if self.audio_store:
+                return self.audio_store.load(audio_file)
+            return audio_utils.load_audio(audio_file)
 
-    def transcribe_audio(self, audio_file, language="tr"):
+    def _failed(self, stage, error):
+        self.metrics.counter('failures_total', "Failures by stage and cause").inc(
+            stage=stage, cause=type(error).__name__)
+
+    def transcribe_audio(self, audio_file, language="tr", audio=None, chunk_workers=None, vad=False,
+                         progress=None, **decode_options):
+        """Transcribe a file; `progress` receives progress.ProgressTracker events as segments finish"""
+        with profiling.stage('transcribe', audio_file):
+            return self._transcribe_audio(audio_file, language, audio, chunk_workers, vad, progress,
+                                          decode_options)
+
+    def _transcribe_audio(self, audio_file, language, audio, chunk_workers, vad, progress, decode_options):
+        cache_key = None
+        if self.cache:
+            try:
+                options = dict(decode_options, chunked=bool(chunk_workers), vad=vad)
+                cache_key = self.cache.key(audio_file, self.backend.cache_id, language, options)
+                cached = self.cache.get(cache_key)
+                self.metrics.counter('cache_requests_total', "Transcription cache lookups").inc(
+                    result='hit' if cached else 'miss')
+                if cached:
+                    self.ui.display_progress(f"Using cached transcription for {audio_file}")
+                    return cached
+            except Exception as e:
+                self.ui.display_error(f"Transcription cache unavailable: {str(e)}")
+        if audio is None and (self.audio_store or audio_utils.is_pcm(audio_file)):
+            # Decoded PCM (downloaded as such or from the store) feeds the model with no ffmpeg pass
+            audio = self.load_audio(audio_file)
         try:
-            # Get transcription with specified language (passed via decode_options)
-            output = mlx_whisper.transcribe(
-                audio_file, 
-                path_or_hf_repo="./models/models--mlx-community--whisper-large-v2-mlx",
-                language=language  # This gets passed to decode_options
-            )
+            if vad:
+                output = self._transcribe_speech(audio_file, audio, language, chunk_workers, decode_options,
+                                                 progress)
+            else:
+                # A pre-decoded waveform (e.g. from the batch pipeline) skips the ffmpeg decode
+                output = self._run_backend(audio_file if audio is None else audio, language, chunk_workers,
+                                           decode_options, progress)
             if not output:
+                self.metrics.counter('failures_total', "Failures by stage and cause").inc(
+                    stage='transcribe', cause='no_output')
                 return None
-            return output
         except Exception as e:
+            self._failed('transcribe', e)
             self.ui.display_error(f"An error occurred while transcribing: {str(e)}")
             return None
+        if cache_key:
+            try:
+                self.cache.put(cache_key, output)
+            except Exception as e:
+                self.ui.display_error(f"Failed to cache transcription: {str(e)}")
+        return output
 
-    def save_transcript(self, transcript, filename):
-        output_file = f"{os.path.splitext(filename)[0]}_transcript.txt"
+    def _run_backend(self, audio_input, language, chunk_workers, decode_options, progress):
+        """Run the model over a path or waveform, reporting progress and timing it.
+
+        Each finished run is folded into the persisted realtime factor for the backend.
+        """
+        if chunk_workers and isinstance(audio_input, str):
+            audio_input = self.load_audio(audio_input)
+        duration = None
+        if not isinstance(audio_input, str):
+            duration = audio_utils.audio_duration(audio_input)
+        elif progress or self.realtime_factors:
+            duration = audio_utils.probe_duration(audio_input)
+        tracker = None
+        if progress:
+            tracker = ProgressTracker(duration or 0.0, progress, self.expected_realtime_factor())
+        on_segment = tracker.update if tracker else None
+        start = time.time()
+        if chunk_workers:
+            self.ui.display_progress(f"Transcribing {duration:.0f}s of audio "
+                                     f"in parallel chunks ({chunk_workers} workers)...")
+            output = chunking.transcribe_chunked(self.backend, audio_input, language, chunk_workers,
+                                                 progress=on_segment, **decode_options)
+            if output:
+                self.backend.record(duration, time.time() - start)
+        else:
+            output = self.backend.transcribe(audio_input, language, progress=on_segment, **decode_options)
+        if output:
+            elapsed = time.time() - start
+            self.metrics.histogram('model_seconds', "Model compute time per transcription").observe(
+                elapsed, backend=self.backend.name)
+            if duration:
+                self.metrics.counter('audio_seconds_total', "Seconds of audio transcribed").inc(
+                    duration, backend=self.backend.name)
+            if self.realtime_factors and duration:
+                self.realtime_factors.update(self.backend.cache_id, duration, elapsed)
+            if tracker:
+                tracker.finish()
+        return output
+
+    def _transcribe_speech(self, audio_file, audio, language, chunk_workers, decode_options, progress):
+        # Only speech regions reach the model; music and silence are cut out beforehand
+        waveform = self.load_audio(audio_file) if audio is None else audio
+        speech, timeline = speech_gate.gate(waveform)
+        self.ui.display_progress(f"Voice activity: {timeline.speech_seconds:.0f}s of speech, "
+                                 f"skipping {timeline.skipped_seconds:.0f}s of music/silence")
+        if not timeline.regions:
+            output = {'text': '', 'segments': [], 'language': language}
+        else:
+            # Progress counts seconds of speech, the audio the model actually has to get through
+            output = self._run_backend(speech, language, chunk_workers, decode_options, progress)
+        return speech_gate.remap_result(output, timeline) if output else None
+
+    def stream_outputs(self, audio_file, filename, formats, language="tr", window_seconds=30.0, progress=None,
+                       **decode_options):
+        """Transcribe a file window by window straight into its output files.
+
+        Audio comes from an ffmpeg pipe and each segment is written as soon as its
+        window is done, so memory stays flat however long the recording is. Returns
+        {'language', 'duration', 'segments', 'outputs'}, or None on failure; the
+        transcript itself is only in the files. The cache is not used.
+        """
+        duration = audio_utils.probe_duration(audio_file)
+        tracker = None
+        if progress:
+            tracker = ProgressTracker(duration or 0.0, progress, self.expected_realtime_factor())
+        stage = 'transcribe'
+        start = time.time()
         try:
-            with open(output_file, 'w', encoding='utf-8') as file:
-                for segment in transcript['segments']:
-                    file.write(f"{segment['text'].strip()}\n")
-            self.ui.display_success(f"Transcript saved to {output_file}")
+            with profiling.stage('transcribe', audio_file):
+                writer = writers.TranscriptWriter(filename, formats, metrics=self.metrics)
+                with writer:
+                    segments = streaming.transcribe_stream(
+                        self.backend, audio_utils.stream_audio(audio_file), language, window_seconds,
+                        progress=tracker.update if tracker else None, **decode_options)
+                    for segment in segments:
+                        writer.write_segment(segment)
+                    # Anything raised from here on is the writer's
+                    stage = 'write'
         except Exception as e:
-            self.ui.display_error(f"An error occurred while saving the transcript: {str(e)}")
+            self._failed(stage, e)
+            action = 'saving outputs' if stage == 'write' else 'transcribing'
+            self.ui.display_error(f"An error occurred while {action}: {str(e)}")
+            return None
+        elapsed = time.time() - start
+        self.metrics.histogram('model_seconds', "Model compute time per transcription").observe(
+            elapsed, backend=self.backend.name)
+        if duration:
+            self.metrics.counter('audio_seconds_total', "Seconds of audio transcribed").inc(
+                duration, backend=self.backend.name)
+            if self.realtime_factors:
+                self.realtime_factors.update(self.backend.cache_id, duration, elapsed)
+        if tracker:
+            tracker.finish()
+        for fmt, path in writer.paths.items():
+            self.ui.display_success(f"{FORMAT_LABELS[fmt]} saved to {path}")
+        self._index(writer.paths)
+        return {'language': language, 'duration': duration, 'segments': writer.count, 'outputs': writer.paths}
 
-    def save_srt(self, segments, filename):
-        output_file = f"{os.path.splitext(filename)[0]}.srt"
+    def save_outputs(self, transcript, filename, formats, contents=None):
+        """Write all requested formats in one pass; returns {format: path} of what was saved.
+
+        Pass a dict as `contents` to also receive each file's text, e.g. for download buttons.
+        """
         try:
-            with open(output_file, 'w', encoding='utf-8') as file:
-                for i, segment in enumerate(segments, start=1):
-                    start_time = timedelta(seconds=segment['start'])
-                    end_time = timedelta(seconds=segment['end'])
-                    file.write(f"{i}\n")
-                    file.write(f"{format_timedelta(start_time)} --> {format_timedelta(end_time)}\n")
-                    file.write(f"{segment['text'].strip()}\n\n")
-            self.ui.display_success(f"SRT subtitles saved to {output_file}")
+            with profiling.stage('write', f"{filename}.{'-'.join(formats)}"):
+                writer = writers.write_transcript(transcript.get('segments', []), filename, formats,
+                                                  text=transcript.get('text', ''),
+                                                  keep_contents=contents is not None, metrics=self.metrics)
         except Exception as e:
-            self.ui.display_error(f"An error occurred while saving the SRT file: {str(e)}")
-    
-    def save_json(self, transcript, filename):
-        output_file = f"{os.path.splitext(filename)[0]}_transcript.json"
+            self._failed('write', e)
+            self.ui.display_error(f"An error occurred while saving {', '.join(formats)} output: {str(e)}")
+            return {}
+        for fmt, path in writer.paths.items():
+            self.ui.display_success(f"{FORMAT_LABELS[fmt]} saved to {path}")
+        self._keep_result(transcript, filename)
+        self._index(writer.paths)
+        if contents is not None:
+            contents.update(writer.contents)
+        return writer.paths
+
+    def _keep_result(self, transcript, filename):
+        # The full result is kept next to the audio so any format can be re-exported
+        # later (reexport.py) without running the model again
         try:
-            json_data = {
-                "text": transcript.get("text", ""),
-                "segments": []
-            }
-            
-            for segment in transcript.get("segments", []):
-                json_data["segments"].append({
-                    "id": segment.get("id"),
-                    "start": segment.get("start"),
-                    "end": segment.get("end"),
-                    "text": segment.get("text", "").strip()
-                })
-            
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(json_data, file, ensure_ascii=False, indent=2)
-            
-            self.ui.display_success(f"JSON transcript saved to {output_file}")
+            transcript_store.write_store(transcript, transcript_store.result_file_for(filename))
         except Exception as e:
-            self.ui.display_error(f"An error occurred while saving the JSON file: {str(e)}")
+            self._failed('store', e)
+            self.ui.display_error(f"Failed to keep the transcription result: {str(e)}")
+
+    def _index(self, paths):
+        # A failed index update never fails the transcription; the next run catches up
+        if self.search_index and 'json' in paths:
+            try:
+                self.search_index.index_file(paths['json'])
+            except Exception as e:
+                self._failed('index', e)
+                self.ui.display_error(f"Failed to update the search index: {str(e)}")
+
+    def save_transcript(self, transcript, filename):
+        return self.save_outputs(transcript, filename, ['txt']).get('txt')
+
+    def save_srt(self, segments, filename):
+        return self.save_outputs({'segments': segments}, filename, ['srt']).get('srt')
+
+    def save_json(self, transcript, filename):
+        return self.save_outputs(transcript, filename, ['json']).get('json')
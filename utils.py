@@ -1,5 +1,74 @@
+import hashlib
+import os
+import threading
+
+# Content hashes by (path, size, mtime) so one process hashes each file only once
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def _read_umask():
+    # The umask can only be read by setting it, so it is read once, before any threads start
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+def set_default_mode(fd):
+    """Give a file made by tempfile.mkstemp (always 0600) the mode open() would have given it"""
+    if hasattr(os, 'fchmod'):
+        os.fchmod(fd, 0o666 & ~_UMASK)
+
+
+def json_default(value):
+    """`default=` for json.dump: model outputs can carry NumPy scalars and arrays"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
 def format_timedelta(td):
-    hours, remainder = divmod(td.seconds, 3600)
+    # td.seconds alone wraps every 24 hours; fold the days back into the hour count
+    hours, remainder = divmod(td.days * 86400 + td.seconds, 3600)
     minutes, seconds = divmod(remainder, 60)
     milliseconds = td.microseconds // 1000
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
\ No newline at end of file
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks so large audio never sits in memory"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    with _hash_lock:
+        _hash_memo[memo_key] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def evict_lru(directory, max_bytes, suffix=''):
+    """Delete least recently used files (by mtime) until the directory fits in max_bytes"""
+    entries = []
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(suffix):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+    return total
@@ -0,0 +1,164 @@
+import bisect
+import numpy as np
+import audio
+
+FRAME_SECONDS = 0.02
+# Band that carries most speech energy
+SPEECH_BAND = (100.0, 4000.0)
+# Syllable rate range in Hz; speech energy is modulated here, music and tones much less
+SYLLABLE_RATE = (2.0, 8.0)
+
+
+def frame_features(waveform, frame_seconds=FRAME_SECONDS, block_seconds=60.0, sr=audio.SAMPLE_RATE):
+    """Per-frame RMS energy, speech-band energy ratio and spectral flatness.
+
+    Works through the recording in blocks so the spectra of a multi-hour file never
+    have to be held at once.
+    """
+    frame = int(frame_seconds * sr)
+    freqs = np.fft.rfftfreq(frame, 1.0 / sr)
+    band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    window = np.hanning(frame).astype(np.float32)
+    block = int(block_seconds / frame_seconds) * frame
+    energy, ratio, flatness = [], [], []
+    for start in range(0, len(waveform) - frame + 1, block):
+        chunk = np.asarray(waveform[start:start + block], dtype=np.float32)
+        count = len(chunk) // frame
+        frames = chunk[:count * frame].reshape(count, frame)
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2 + 1e-12
+        energy.append(np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame))
+        ratio.append(power[:, band].sum(axis=1) / power.sum(axis=1))
+        flatness.append(np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1))
+    if not energy:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty, empty
+    return np.concatenate(energy), np.concatenate(ratio), np.concatenate(flatness)
+
+
+def _runs(mask):
+    """(start, end) frame index pairs of consecutive True runs"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def modulation_ratio(energy, frame_seconds=FRAME_SECONDS, window_seconds=1.5, hop_seconds=0.5):
+    """Per-frame share of log-energy fluctuation at syllable rates, over sliding windows"""
+    window = int(window_seconds / frame_seconds)
+    hop = int(hop_seconds / frame_seconds)
+    ratio = np.ones(len(energy), dtype=np.float32)
+    if len(energy) < window:
+        return ratio
+    envelopes = np.lib.stride_tricks.sliding_window_view(np.log(energy + 1e-6), window)[::hop]
+    spectrum = np.abs(np.fft.rfft(envelopes - envelopes.mean(axis=1, keepdims=True), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(window, frame_seconds)
+    syllabic = spectrum[:, (freqs >= SYLLABLE_RATE[0]) & (freqs <= SYLLABLE_RATE[1])].sum(axis=1)
+    scores = syllabic / (spectrum[:, freqs > 0.5].sum(axis=1) + 1e-12)
+    # Each frame takes the score of the window centred nearest to it
+    centres = np.arange(len(scores)) * hop + window // 2
+    nearest = np.clip(np.searchsorted(centres, np.arange(len(energy))), 0, len(scores) - 1)
+    ratio[:] = scores[nearest]
+    return ratio
+
+
+def detect_speech(waveform, frame_seconds=FRAME_SECONDS, threshold_db=12.0, min_ratio=0.5,
+                  max_flatness=0.4, min_modulation=0.15, min_speech=0.3, max_gap=0.5, padding=0.2,
+                  sr=audio.SAMPLE_RATE):
+    """Sample ranges of a waveform that contain speech.
+
+    A frame is a speech candidate when its energy is `threshold_db` above the noise
+    floor, most of it lies in the speech band, the spectrum is not noise-flat and the
+    surrounding energy envelope moves at syllable rate (sustained music and tones do
+    not). Candidate runs closer than `max_gap` are merged, runs shorter than
+    `min_speech` are dropped and the rest are padded by `padding` seconds.
+    """
+    energy, ratio, flatness = frame_features(waveform, frame_seconds, sr=sr)
+    if len(energy) == 0:
+        return []
+    floor = np.percentile(energy, 10) + 1e-6
+    candidate = ((20 * np.log10(energy / floor + 1e-12) > threshold_db)
+                 & (ratio > min_ratio)
+                 & (flatness < max_flatness)
+                 & (modulation_ratio(energy, frame_seconds) >= min_modulation))
+
+    # Bridge short pauses between words
+    gap_frames = int(max_gap / frame_seconds)
+    for start, end in _runs(~candidate):
+        if start > 0 and end < len(candidate) and end - start <= gap_frames:
+            candidate[start:end] = True
+
+    frame = int(frame_seconds * sr)
+    pad = int(padding * sr)
+    regions = []
+    for start, end in _runs(candidate):
+        if (end - start) * frame_seconds < min_speech:
+            continue
+        begin = max(int(start) * frame - pad, 0)
+        finish = min(int(end) * frame + pad, len(waveform))
+        if regions and begin <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], finish)
+        else:
+            regions.append((begin, finish))
+    return regions
+
+
+class SpeechTimeline:
+    """Maps times on the gated (speech-only) waveform back to the original recording"""
+
+    def __init__(self, regions, total_samples, sr=audio.SAMPLE_RATE):
+        self.regions = regions
+        self.sr = sr
+        self.total_seconds = total_samples / sr
+        self._gated_starts = []
+        position = 0
+        for start, end in regions:
+            self._gated_starts.append(position / sr)
+            position += end - start
+        self.speech_seconds = position / sr
+
+    @property
+    def skipped_seconds(self):
+        return self.total_seconds - self.speech_seconds
+
+    def to_original(self, t, at_end=False):
+        """Original time of gated time t; `at_end` keeps an end time inside its region"""
+        if not self.regions:
+            return t
+        if at_end:
+            index = bisect.bisect_left(self._gated_starts, t) - 1
+        else:
+            index = bisect.bisect_right(self._gated_starts, t) - 1
+        index = max(index, 0)
+        start, end = self.regions[index]
+        original = start / self.sr + (t - self._gated_starts[index])
+        return min(original, end / self.sr)
+
+    def summary(self):
+        return {
+            'total_seconds': round(self.total_seconds, 3),
+            'speech_seconds': round(self.speech_seconds, 3),
+            'skipped_seconds': round(self.skipped_seconds, 3),
+            'regions': len(self.regions),
+        }
+
+
+def gate(waveform, **options):
+    """Speech-only waveform and the timeline that maps it back to the original"""
+    regions = detect_speech(waveform, **options)
+    timeline = SpeechTimeline(regions, len(waveform))
+    if not regions:
+        return np.zeros(0, dtype=np.float32), timeline
+    speech = np.concatenate([np.asarray(waveform[start:end], dtype=np.float32) for start, end in regions])
+    return speech, timeline
+
+
+def remap_result(result, timeline):
+    """Move a result transcribed from gated audio back onto the original timeline"""
+    for segment in result.get('segments', []):
+        start = round(timeline.to_original(segment['start']), 3)
+        if 'seek' in segment:
+            segment['seek'] += int(round((start - segment['start']) * 100))
+        segment['start'] = start
+        segment['end'] = round(timeline.to_original(segment['end'], at_end=True), 3)
+    result['vad'] = timeline.summary()
+    return result
@@ -0,0 +1,218 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from audio_downloader import extract_video_id
+
+QUEUE_FILENAME = '.transcribe_queue.sqlite'
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def work_key(url):
+    """Items are deduplicated by YouTube video id, falling back to the URL itself"""
+    video_id = extract_video_id(url)
+    return f"youtube:{video_id}" if video_id else url.strip()
+
+
+class WorkQueue:
+    """Shared backlog of URLs that any number of worker processes or hosts drain together.
+
+    Workers claim items under a time-limited lease and extend it with heartbeats while
+    they work. An item whose lease runs out (its worker crashed or lost its disk) is
+    handed to the next worker that asks, until it has been attempted `max_attempts`
+    times. Claims run in an immediate transaction, so two workers never hold the same
+    item.
+
+    The queue is one SQLite file. Hosts sharing it over a network filesystem need one
+    with working file locks; the default rollback journal is used instead of WAL,
+    which needs shared memory and only works on a single machine.
+    """
+
+    def __init__(self, db_path, lease_seconds=600, max_attempts=3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS work (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    language TEXT,
+                    status TEXT NOT NULL,
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    result TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS work_status ON work (status, lease_expires)")
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(work)")}
+            if 'language' not in columns:
+                # Queues from before items carried a language; theirs is the workers' default
+                self._conn.execute("ALTER TABLE work ADD COLUMN language TEXT")
+
+    @classmethod
+    def for_output_dir(cls, output_path, **kwargs):
+        os.makedirs(output_path, exist_ok=True)
+        return cls(os.path.join(output_path, QUEUE_FILENAME), **kwargs)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self, func, *args):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(*args)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def ingest(self, urls, batch_size=500):
+        """Add URLs from any iterable, skipping ones whose video is already queued; returns the count added.
+
+        Items are URLs or (URL, language) pairs; a language of None leaves the choice
+        to the worker.
+        """
+        added = 0
+        batch = []
+
+        def insert(rows):
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO work (key, url, language, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            return self._conn.total_changes - before
+
+        for url in urls:
+            url, language = url if isinstance(url, tuple) else (url, None)
+            url = url.strip()
+            if url:
+                batch.append((work_key(url), url, language or None, QUEUED, time.time()))
+            if len(batch) >= batch_size:
+                added += self._transaction(insert, batch)
+                batch = []
+        if batch:
+            added += self._transaction(insert, batch)
+        return added
+
+    def claim(self, worker_id, limit=1):
+        """Lease up to `limit` queued or expired items; returns a list of {key, url, language, attempts}"""
+        def take():
+            now = time.time()
+            rows = self._conn.execute(
+                "SELECT key, url, language, attempts FROM work "
+                "WHERE (status = ? OR (status = ? AND lease_expires < ?)) AND attempts < ? "
+                "ORDER BY rowid LIMIT ?",
+                (QUEUED, LEASED, now, self.max_attempts, limit)).fetchall()
+            for row in rows:
+                self._conn.execute(
+                    "UPDATE work SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE key = ?",
+                    (LEASED, worker_id, now + self.lease_seconds, now, row['key']))
+            return [dict(row, attempts=row['attempts'] + 1) for row in rows]
+
+        return self._transaction(take)
+
+    def heartbeat(self, worker_id):
+        """Extend every lease this worker holds; returns how many it still holds"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE work SET lease_expires = ?, updated_at = ? WHERE worker = ? AND status = ?",
+                (now + self.lease_seconds, now, worker_id, LEASED))
+            return cursor.rowcount
+
+    def complete(self, key, worker_id, result=None):
+        """Mark an item done; False if the lease had already passed to another worker"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE work SET status = ?, result = ?, error = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE key = ? AND worker = ? AND status = ?",
+                (DONE, json.dumps(result) if result is not None else None, time.time(), key, worker_id,
+                 LEASED))
+            return cursor.rowcount == 1
+
+    def fail(self, key, worker_id, error):
+        """Release a failed item for another attempt, or fail it for good after max_attempts"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE work SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, error = ?, "
+                "lease_expires = NULL, updated_at = ? WHERE key = ? AND worker = ? AND status = ?",
+                (self.max_attempts, QUEUED, FAILED, error, time.time(), key, worker_id, LEASED))
+            return cursor.rowcount == 1
+
+    def reclaim(self):
+        """Return items with expired leases to the queue (or fail them); returns how many"""
+        def release():
+            now = time.time()
+            cursor = self._conn.execute(
+                "UPDATE work SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, "
+                "error = COALESCE(error, 'lease expired'), worker = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_expires < ?",
+                (self.max_attempts, QUEUED, FAILED, now, LEASED, now))
+            return cursor.rowcount
+
+        return self._transaction(release)
+
+    def outstanding(self):
+        """Items that are queued or leased, i.e. not finished either way"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM work WHERE status IN (?, ?)",
+                                      (QUEUED, LEASED)).fetchone()[0]
+
+    def claims(self, worker_id, poll_seconds=2.0):
+        """Lease items one at a time for as long as the queue has work.
+
+        While other workers still hold leases this waits for them to finish or
+        expire instead of stopping, so no item is left behind by a crashed worker.
+        """
+        while True:
+            leases = self.claim(worker_id)
+            if leases:
+                yield leases[0]
+                continue
+            self.reclaim()
+            if not self.outstanding():
+                return
+            time.sleep(poll_seconds)
+
+    def keep_alive(self, worker_id, interval=None):
+        """Start a daemon thread heartbeating this worker's leases; returns its stop Event"""
+        interval = interval or self.lease_seconds / 3
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    self.heartbeat(worker_id)
+                except sqlite3.Error:
+                    # A busy or briefly unreachable database; the next beat tries again
+                    pass
+
+        threading.Thread(target=beat, name='queue-heartbeat', daemon=True).start()
+        return stop
+
+    def summary(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM work GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
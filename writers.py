@@ -0,0 +1,217 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from utils import format_timedelta, json_default, set_default_mode
+from metrics import REGISTRY
+
+# Suffix each output format appends to the audio file's base name
+OUTPUT_SUFFIXES = {
+    'txt': '_transcript.txt',
+    'srt': '.srt',
+    'json': '_transcript.json',
+    'ndjson': '_transcript.ndjson',
+    'vtt': '.vtt',
+}
+
+# Segment text is spooled to disk once the running transcript text grows past this
+_TEXT_SPOOL_BYTES = 1 << 20
+
+
+def output_file_for(filename, fmt):
+    return f"{os.path.splitext(filename)[0]}{OUTPUT_SUFFIXES[fmt]}"
+
+
+def json_segment(segment):
+    data = {
+        "id": segment.get("id"),
+        "start": segment.get("start"),
+        "end": segment.get("end"),
+        "text": segment.get("text", "").strip()
+    }
+    # Only speaker-attributed transcripts carry the field, null for music and silence
+    if "speaker" in segment:
+        data["speaker"] = segment["speaker"]
+    return data
+
+
+def display_text(segment):
+    """Segment text for the plain-text formats, prefixed with its speaker if it has one"""
+    text = segment.get('text', '').strip()
+    return f"{segment['speaker']}: {text}" if segment.get('speaker') else text
+
+
+class TranscriptWriter:
+    """Writes every requested output format in a single pass over the segments.
+
+    Segments are written as they arrive, each format to a temporary file next to its
+    destination, and all files are renamed into place together on commit, so readers
+    never see a half-written transcript. Only the running transcript text for the JSON
+    "text" field is buffered, and it spills to disk once it gets large.
+
+    If the full transcript text is known up front it is written first, matching the
+    layout save_json always produced; otherwise it is appended after the segments.
+    """
+
+    def __init__(self, filename, formats, text=None, keep_contents=False, metrics=None):
+        unknown = [fmt for fmt in formats if fmt not in OUTPUT_SUFFIXES]
+        if unknown:
+            raise ValueError(f"Unknown output format(s): {', '.join(unknown)}")
+        self.formats = list(formats)
+        self.paths = {fmt: output_file_for(filename, fmt) for fmt in self.formats}
+        self.contents = {} if keep_contents else None
+        self.count = 0
+        self.metrics = metrics or REGISTRY
+        # Time spent inside the writer, excluding waits for the next segment
+        self._busy_seconds = 0.0
+        self._text = text
+        self._spool = None
+        self._files = {}
+        self._tmp_paths = {}
+        try:
+            for fmt, path in self.paths.items():
+                directory = os.path.dirname(path) or '.'
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.",
+                                                suffix='.tmp')
+                self._tmp_paths[fmt] = tmp_path
+                set_default_mode(fd)
+                self._files[fmt] = _Tee(os.fdopen(fd, 'w', encoding='utf-8'), keep_contents)
+            if 'vtt' in self._files:
+                self._files['vtt'].write("WEBVTT\n\n")
+            if 'json' in self._files:
+                self._files['json'].write('{\n')
+                if text is not None:
+                    self._files['json'].write(f'  "text": {json.dumps(text, ensure_ascii=False)},\n')
+                else:
+                    self._spool = tempfile.SpooledTemporaryFile(max_size=_TEXT_SPOOL_BYTES, mode='w+',
+                                                                encoding='utf-8')
+                self._files['json'].write('  "segments": [')
+        except Exception:
+            self.abort()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def write_segment(self, segment):
+        start = time.perf_counter()
+        self._write_segment(segment)
+        self._busy_seconds += time.perf_counter() - start
+
+    def _write_segment(self, segment):
+        self.count += 1
+        text = segment.get('text', '')
+        if 'txt' in self._files:
+            self._files['txt'].write(f"{display_text(segment)}\n")
+        if 'srt' in self._files:
+            start_time = timedelta(seconds=segment['start'])
+            end_time = timedelta(seconds=segment['end'])
+            self._files['srt'].write(f"{self.count}\n")
+            self._files['srt'].write(f"{format_timedelta(start_time)} --> {format_timedelta(end_time)}\n")
+            self._files['srt'].write(f"{display_text(segment)}\n\n")
+        if 'vtt' in self._files:
+            # WebVTT cues are SRT's with a dot before the milliseconds and no cue number
+            start_time = format_timedelta(timedelta(seconds=segment['start'])).replace(',', '.')
+            end_time = format_timedelta(timedelta(seconds=segment['end'])).replace(',', '.')
+            self._files['vtt'].write(f"{start_time} --> {end_time}\n{display_text(segment)}\n\n")
+        if 'json' in self._files or 'ndjson' in self._files:
+            data = json_segment(segment)
+            if 'json' in self._files:
+                separator = ',' if self.count > 1 else ''
+                body = json.dumps(data, ensure_ascii=False, indent=2, default=json_default).replace('\n', '\n    ')
+                self._files['json'].write(f"{separator}\n    {body}")
+            if 'ndjson' in self._files:
+                self._files['ndjson'].write(json.dumps(data, ensure_ascii=False, default=json_default) + '\n')
+        if self._spool:
+            # JSON string escaping works character by character, so escaped pieces concatenate
+            self._spool.write(json.dumps(text, ensure_ascii=False)[1:-1])
+
+    def write_segments(self, segments):
+        for segment in segments:
+            self.write_segment(segment)
+        return self
+
+    def commit(self):
+        """Finish every file and move it into place; returns {format: path}"""
+        start = time.perf_counter()
+        try:
+            if 'json' in self._files:
+                json_file = self._files['json']
+                json_file.write('\n  ]' if self.count else ']')
+                if self._spool:
+                    json_file.write(',\n  "text": "')
+                    self._spool.seek(0)
+                    shutil.copyfileobj(self._spool, json_file)
+                    json_file.write('"')
+                json_file.write('\n}')
+            for fmt, file in self._files.items():
+                file.close()
+                if self.contents is not None:
+                    self.contents[fmt] = file.getvalue()
+            sizes = {fmt: os.path.getsize(tmp_path) for fmt, tmp_path in self._tmp_paths.items()}
+            for fmt, tmp_path in self._tmp_paths.items():
+                os.replace(tmp_path, self.paths[fmt])
+            self._tmp_paths = {}
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            if self._spool:
+                self._spool.close()
+        segments_written = self.metrics.counter('segments_written_total', "Segments written per output format")
+        output_bytes = self.metrics.counter('output_bytes_total', "Bytes written per output format")
+        for fmt, size in sizes.items():
+            segments_written.inc(self.count, format=fmt)
+            output_bytes.inc(size, format=fmt)
+        self._busy_seconds += time.perf_counter() - start
+        self.metrics.histogram('write_seconds', "Time spent writing the outputs of one transcript").observe(
+            self._busy_seconds)
+        return dict(self.paths)
+
+    def abort(self):
+        for file in self._files.values():
+            file.close()
+        for tmp_path in self._tmp_paths.values():
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+        self._tmp_paths = {}
+        if self._spool:
+            self._spool.close()
+
+
+class _Tee:
+    """File wrapper that can also keep what was written, for download buttons"""
+
+    def __init__(self, file, keep):
+        self.file = file
+        self.buffer = io.StringIO() if keep else None
+
+    def write(self, data):
+        self.file.write(data)
+        if self.buffer is not None:
+            self.buffer.write(data)
+
+    def close(self):
+        self.file.close()
+
+    def getvalue(self):
+        return self.buffer.getvalue() if self.buffer is not None else None
+
+
+def write_transcript(segments, filename, formats, text=None, keep_contents=False, metrics=None):
+    """Write segments to every requested format in one pass; returns the writer"""
+    writer = TranscriptWriter(filename, formats, text=text, keep_contents=keep_contents, metrics=metrics)
+    with writer:
+        writer.write_segments(segments)
+    return writer